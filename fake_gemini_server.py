@@ -0,0 +1,116 @@
+# fake_gemini_server.py
+"""
+Local stand-in for the Gemini generateContent endpoint (stdlib only).
+
+Answers every call after a configurable latency with a canned response, so
+the async HTTP client can be load-tested without quota or cost:
+
+    python fake_gemini_server.py --port 8765 --latency 2.0 --rate-limit 0.01
+    RE_GEMINI_API_BASE=http://127.0.0.1:8765 python run.py
+
+JSON calls get {"business_rules": []}; text calls get a short Markdown stub.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+
+_ROUTE = re.compile(r"^/v1beta/models/[^/:]+:generateContent")
+
+
+def _reply(body: dict) -> dict:
+    config = body.get("generationConfig") or {}
+    texts = [p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", [])]
+    texts += [p.get("text", "") for p in (body.get("systemInstruction") or {}).get("parts", [])]
+    if config.get("responseMimeType") == "text/plain":
+        text = "## Summary\n\nStand-in response from fake_gemini_server.py.\n"
+    else:
+        text = json.dumps({"business_rules": []})
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        "usageMetadata": {
+            "promptTokenCount": sum(len(t) for t in texts) // 4,
+            "candidatesTokenCount": len(text) // 4,
+        },
+    }
+
+
+class FakeGemini:
+    def __init__(self, latency: float, jitter: float, rate_limit: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.in_flight = 0
+        self.peak = 0
+        self.served = 0
+        self.connections = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            # One connection serves many requests (keep-alive)
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                raw = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self._respond(method, path, raw)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, path: str, raw: bytes):
+        if method != "POST" or not _ROUTE.match(path):
+            return "404 Not Found", {"error": {"code": 404, "message": f"No route for {method} {path}"}}
+
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        finally:
+            self.in_flight -= 1
+
+        if random.random() < self.rate_limit:
+            return "429 Too Many Requests", {"error": {
+                "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded. Please retry in 1.0s."}}
+        self.served += 1
+        return "200 OK", _reply(json.loads(raw or b"{}"))
+
+    async def report(self, every: float = 5.0):
+        while True:
+            await asyncio.sleep(every)
+            print(f"served={self.served} in_flight={self.in_flight} peak={self.peak} connections={self.connections}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini generateContent API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- seconds added to the latency")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of calls answered with 429")
+    args = parser.parse_args()
+
+    fake = FakeGemini(args.latency, args.jitter, args.rate_limit)
+    server = await asyncio.start_server(fake.handle, args.host, args.port, backlog=1024)
+    print(f"Fake Gemini listening on http://{args.host}:{args.port} (latency {args.latency}s)")
+    async with server:
+        await asyncio.gather(server.serve_forever(), fake.report())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
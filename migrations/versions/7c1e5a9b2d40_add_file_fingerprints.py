@@ -0,0 +1,44 @@
+"""Add file fingerprints for incremental analysis
+
+Revision ID: 7c1e5a9b2d40
+Revises: 0ee0bdbc0311
+Create Date: 2026-10-16 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e5a9b2d40'
+down_revision: Union[str, Sequence[str], None] = '0ee0bdbc0311'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('file_fingerprints',
+    sa.Column('project_id', sa.String(), nullable=False),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('content_hash', sa.String(), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('mtime_ns', sa.BigInteger(), nullable=True),
+    sa.Column('language', sa.String(), nullable=True),
+    sa.Column('analysis_version', sa.String(), nullable=True),
+    sa.Column('run_id', sa.UUID(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.ForeignKeyConstraint(['run_id'], ['analysis_runs.run_id'], ),
+    sa.PrimaryKeyConstraint('project_id', 'file_path')
+    )
+    # Carrying rules forward selects by (run_id, file_path)
+    op.create_index('ix_business_rules_run_id_file_path', 'business_rules', ['run_id', 'file_path'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_business_rules_run_id_file_path', table_name='business_rules')
+    op.drop_table('file_fingerprints')
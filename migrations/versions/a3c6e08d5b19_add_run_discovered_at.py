@@ -0,0 +1,29 @@
+"""Add discovered_at to analysis runs
+
+Revision ID: a3c6e08d5b19
+Revises: f19b8e5c2a74
+Create Date: 2026-10-16 23:41:05.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c6e08d5b19'
+down_revision: Union[str, Sequence[str], None] = 'f19b8e5c2a74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Left NULL for existing runs: their work items may be partial, so they are not resumable
+    op.add_column('analysis_runs', sa.Column('discovered_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('analysis_runs', 'discovered_at')
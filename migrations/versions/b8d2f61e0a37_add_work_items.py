@@ -0,0 +1,46 @@
+"""Add work items for checkpoint and resume
+
+Revision ID: b8d2f61e0a37
+Revises: 7c1e5a9b2d40
+Create Date: 2026-10-16 21:04:12.518930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d2f61e0a37'
+down_revision: Union[str, Sequence[str], None] = '7c1e5a9b2d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('work_items',
+    sa.Column('run_id', sa.UUID(), nullable=False),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('project_id', sa.String(), nullable=True),
+    sa.Column('language', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('chunks_total', sa.Integer(), nullable=True),
+    sa.Column('chunks_done', sa.Integer(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('fingerprint', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.ForeignKeyConstraint(['run_id'], ['analysis_runs.run_id'], ),
+    sa.PrimaryKeyConstraint('run_id', 'file_path')
+    )
+    op.create_index(op.f('ix_work_items_status'), 'work_items', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_work_items_status'), table_name='work_items')
+    op.drop_table('work_items')
@@ -0,0 +1,39 @@
+"""Add HNSW indexes on rule and summary embeddings
+
+Revision ID: e4a7c3d91f62
+Revises: b8d2f61e0a37
+Create Date: 2026-10-16 21:38:05.114202
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c3d91f62'
+down_revision: Union[str, Sequence[str], None] = 'b8d2f61e0a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # HNSW needs pgvector >= 0.5.0. Cosine ops match cosine_distance() in the repositories.
+    # CONCURRENTLY cannot run inside a transaction, hence the autocommit block.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_business_rules_embedding_hnsw "
+            "ON business_rules USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_code_summaries_embedding_hnsw "
+            "ON code_summaries USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_code_summaries_embedding_hnsw")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_business_rules_embedding_hnsw")
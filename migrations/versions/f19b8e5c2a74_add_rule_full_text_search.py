@@ -0,0 +1,52 @@
+"""Add full-text search column and indexes on business rules
+
+Revision ID: f19b8e5c2a74
+Revises: e4a7c3d91f62
+Create Date: 2026-10-16 22:10:47.630518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19b8e5c2a74'
+down_revision: Union[str, Sequence[str], None] = 'e4a7c3d91f62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keep in sync with src.db.models.RULE_SEARCH_DOCUMENT
+RULE_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(code_snippet, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Stored generated column: Postgres keeps it current on every INSERT/UPDATE
+    op.add_column('business_rules', sa.Column(
+        'search_vector', postgresql.TSVECTOR(), sa.Computed(RULE_SEARCH_DOCUMENT, persisted=True), nullable=True
+    ))
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_business_rules_search_vector "
+            "ON business_rules USING gin (search_vector)"
+        )
+        # Serves file-prefix filters (LIKE 'prefix%') regardless of the database collation
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_business_rules_file_path_prefix "
+            "ON business_rules (file_path text_pattern_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_business_rules_file_path_prefix")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_business_rules_search_vector")
+    op.drop_column('business_rules', 'search_vector')
@@ -1,13 +1,84 @@
 # run.py
+import argparse
 import asyncio
+import json
+from dataclasses import asdict
 from src.logging_config import logger
-from src.orchestrator import run_analysis
+from src.config import settings
+from src.db.config import SessionLocal
+from src.embedding_stage import EmbeddingStage
+from src.rule_search import RuleSearch
+from src.orchestrator import run_analysis, resume_analysis
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Reverse Engineering pipeline")
+    parser.add_argument("--index-workers", type=int, default=None,
+                        help="Worker processes for Phase 2 indexing (0 = one per CPU, 1 = serial)")
+    parser.add_argument("--mode", choices=["phases", "pipeline"], default=None,
+                        help="'phases' (default) runs each phase to completion; 'pipeline' streams files through all stages")
+    commands = parser.add_subparsers(dest="command")
+    resume = commands.add_parser("resume", help="Resume an interrupted run: re-queue unfinished files, then write its report")
+    resume.add_argument("--run-id", required=True, help="AnalysisRun id printed in the 'Started Run' log line")
+    commands.add_parser("embed", help="Backfill missing rule/summary embeddings without running an analysis")
+    search = commands.add_parser("search", help="Full-text search over extracted business rules")
+    search.add_argument("query", help='Web-search syntax, e.g. discount, "free shipping", eligibility -test')
+    search.add_argument("--project", help="Only rules of this project id")
+    search.add_argument("--run-id", help="Only rules of this run")
+    search.add_argument("--file-prefix", help="Only rules whose file path starts with this prefix")
+    search.add_argument("--page", type=int, default=1)
+    search.add_argument("--page-size", type=int, default=20)
+    search.add_argument("--json", action="store_true", help="Print the page as JSON")
+    return parser.parse_args()
+
+async def backfill_embeddings():
+    db_session = SessionLocal()
+    try:
+        counts = await EmbeddingStage(db_session).run()
+        logger.info(f"Embedding backfill done: {counts}")
+    finally:
+        db_session.close()
+
+def search_rules(args):
+    db_session = SessionLocal()
+    try:
+        result = RuleSearch(db_session).search(
+            args.query, project_id=args.project, run_id=args.run_id, file_prefix=args.file_prefix,
+            page=args.page, page_size=args.page_size
+        )
+    finally:
+        db_session.close()
+
+    if args.json:
+        print(json.dumps(asdict(result), indent=2))
+        return
+    for i, hit in enumerate(result.hits, start=(result.page - 1) * result.page_size + 1):
+        print(f"{i:>4}. [{hit.rank:.3f}] {hit.title}")
+        print(f"      {hit.file_path}  (run {hit.run_id})")
+        if hit.snippet:
+            print(f"      {hit.snippet}")
+    if not result.hits:
+        print("No matching rules.")
+    elif result.has_more:
+        print(f"-- more results: --page {result.page + 1}")
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.index_workers is not None:
+        settings.index_workers = args.index_workers
+    if args.mode is not None:
+        settings.orchestrator_mode = args.mode
+
     try:
-        asyncio.run(run_analysis())
+        if args.command == "resume":
+            asyncio.run(resume_analysis(args.run_id))
+        elif args.command == "embed":
+            asyncio.run(backfill_embeddings())
+        elif args.command == "search":
+            search_rules(args)
+        else:
+            asyncio.run(run_analysis())
     except KeyboardInterrupt:
-        logger.info("Shutdown requested by user")
+        logger.info("Shutdown requested by user (resume later with `python run.py resume --run-id <id>`)")
     except Exception as e:
         logger.critical(f"Platform crashed: {e}")
         raise
\ No newline at end of file
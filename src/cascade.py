@@ -0,0 +1,85 @@
+# src/cascade.py
+import json
+import statistics
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from loguru import logger
+
+FAST = "fast"
+MAIN = "main"
+
+
+def escalation_reason(raw: str, mode: str, min_confidence: float) -> Optional[str]:
+    """
+    Why a fast-tier extraction must be redone by the main model (None: keep it).
+
+    "draft" keeps any parseable answer whose rules all report at least
+    `min_confidence` (an empty answer means "no business logic").
+    "classify" only trusts the fast model's "none": chunks where it found
+    rules are always re-extracted.
+    """
+    try:
+        data = json.loads(raw)
+    except (TypeError, json.JSONDecodeError):
+        return "unparseable"
+
+    if isinstance(data, dict):
+        rules = data.get("business_rules", [])
+    elif isinstance(data, list):
+        rules = [r for item in data if isinstance(item, dict) for r in item.get("business_rules", [])]
+    else:
+        return "unparseable"
+    if not isinstance(rules, list):
+        return "unparseable"
+
+    if not rules:
+        return None
+    if mode == "classify":
+        return "positive"
+    for rule in rules:
+        confidence = rule.get("confidence") if isinstance(rule, dict) else None
+        try:
+            if float(confidence) < min_confidence:
+                return "low_confidence"
+        except (TypeError, ValueError):
+            return "low_confidence"  # Missing or non-numeric confidence is not a high one
+    return None
+
+
+@dataclass
+class TierStats:
+    latencies: List[float] = field(default_factory=list)  # Seconds per successful extraction call (cache hits excluded)
+
+    def summary(self) -> str:
+        if not self.latencies:
+            return "0 calls"
+        n = len(self.latencies)
+        p50 = statistics.median(self.latencies)
+        p95 = statistics.quantiles(self.latencies, n=20)[-1] if n >= 2 else self.latencies[0]
+        return f"{n} calls, p50 {p50:.1f}s, p95 {p95:.1f}s, {sum(self.latencies):.0f}s total"
+
+
+@dataclass
+class CascadeStats:
+    tiers: Dict[str, TierStats] = field(default_factory=lambda: {FAST: TierStats(), MAIN: TierStats()})
+    drafts: int = 0  # Extractions started on the fast tier
+    escalations: Counter = field(default_factory=Counter)  # reason -> count
+
+    def record_call(self, tier: str, seconds: float):
+        self.tiers[tier].latencies.append(seconds)
+
+    @property
+    def escalation_rate(self) -> float:
+        return sum(self.escalations.values()) / self.drafts if self.drafts else 0.0
+
+    def log(self):
+        if self.drafts:
+            reasons = ", ".join(f"{k} {v}" for k, v in self.escalations.most_common()) or "none"
+            logger.info(
+                f"Model cascade: {self.drafts} extractions drafted, "
+                f"{self.escalation_rate:.0%} escalated ({reasons})"
+            )
+        for tier, stats in self.tiers.items():
+            if stats.latencies:
+                logger.info(f"LLM tier {tier}: {stats.summary()}")
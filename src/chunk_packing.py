@@ -0,0 +1,164 @@
+# src/chunk_packing.py
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+from loguru import logger
+
+from src.chunking import CodeChunk
+from src.token_budget import plan_estimator
+
+
+def estimate_chunk_tokens(chunk: CodeChunk) -> int:
+    return plan_estimator.count(chunk.code)
+
+
+@dataclass
+class PackedChunk:
+    chunk_id: str  # Stable within a pack, e.g. "C3"; echoed back by the model on each rule
+    file_path: str
+    chunk: CodeChunk
+    context: str = ""  # Graph context of the owning file
+
+    @property
+    def header(self) -> str:
+        return self.chunk.code[:self.chunk.body_offset].strip()
+
+    @property
+    def body(self) -> str:
+        return self.chunk.code[self.chunk.body_offset:]
+
+
+@dataclass
+class ChunkPack:
+    items: List[PackedChunk] = field(default_factory=list)
+    tokens: int = 0
+
+    def files(self) -> List[dict]:
+        """Items grouped by file (in first-seen order) so shared headers/context are rendered once."""
+        groups: Dict[str, dict] = {}
+        for item in self.items:
+            group = groups.setdefault(item.file_path, {
+                "file_path": item.file_path, "header": item.header, "context": item.context, "chunks": []
+            })
+            group["chunks"].append(item)
+        return list(groups.values())
+
+    def split_rules(self, rules: list) -> Dict[str, list]:
+        """
+        Routes rules back to their source chunk by chunk_id, falling back to the
+        chunk whose line range contains line_start. Unattributable rules go to
+        the first chunk so nothing is dropped.
+        """
+        by_id = {item.chunk_id: [] for item in self.items}
+        for rule in rules:
+            if not isinstance(rule, dict):
+                continue
+            target = str(rule.pop("chunk_id", "")).strip()
+            if target not in by_id:
+                target = self._by_line(rule) or self.items[0].chunk_id
+            by_id[target].append(rule)
+        return by_id
+
+    def _by_line(self, rule: dict) -> Optional[str]:
+        line = rule.get("line_start")
+        if not isinstance(line, int):
+            return None
+        matches = [i for i in self.items if i.chunk.start_line <= line <= i.chunk.end_line]
+        return matches[0].chunk_id if len(matches) == 1 else None
+
+
+class ChunkPacker:
+    """Greedy packer: consecutive small chunks are grouped until the token budget is reached."""
+
+    def __init__(self, token_budget: int, small_chunk_tokens: int):
+        self.token_budget = token_budget
+        self.small_chunk_tokens = small_chunk_tokens
+
+    def is_small(self, chunk: CodeChunk) -> bool:
+        return estimate_chunk_tokens(chunk) <= self.small_chunk_tokens
+
+    def pack(self, file_path: str, chunks: List[CodeChunk], context: str = "") -> List[ChunkPack]:
+        packs = []
+        current = ChunkPack()
+        for chunk in chunks:
+            cost = estimate_chunk_tokens(chunk)
+            if current.items and current.tokens + cost > self.token_budget:
+                packs.append(current)
+                current = ChunkPack()
+            current.items.append(PackedChunk(f"C{len(current.items) + 1}", file_path, chunk, context))
+            current.tokens += cost
+        if current.items:
+            packs.append(current)
+        return packs
+
+
+class CrossFilePacker:
+    """
+    Packs small chunks from different files of the same project into shared calls.
+
+    Files submit chunks concurrently and await their own rules. A pending pack
+    is flushed as soon as it reaches the token budget, or after `linger_seconds`
+    when no further chunks arrive. `run_pack` is called as run_pack(group_key, pack).
+    """
+
+    def __init__(self, packer: ChunkPacker, run_pack: Callable[[Hashable, ChunkPack], Awaitable[Dict[str, list]]],
+                 linger_seconds: float = 0.5):
+        self.packer = packer
+        self.run_pack = run_pack
+        self.linger_seconds = linger_seconds
+        self._pending: Dict[Hashable, ChunkPack] = {}
+        self._futures: Dict[Hashable, Dict[str, asyncio.Future]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._runs: set = set()  # Strong refs: the loop only keeps weak ones to tasks
+
+    async def submit(self, group_key: Hashable, file_path: str, chunk: CodeChunk, context: str) -> list:
+        loop = asyncio.get_running_loop()
+        pack = self._pending.get(group_key)
+        cost = estimate_chunk_tokens(chunk)
+        if pack is not None and pack.tokens + cost > self.packer.token_budget:
+            self._flush(group_key)
+            pack = None
+        if pack is None:
+            pack = self._pending[group_key] = ChunkPack()
+            self._futures[group_key] = {}
+
+        item = PackedChunk(f"C{len(pack.items) + 1}", file_path, chunk, context)
+        pack.items.append(item)
+        pack.tokens += cost
+        future = self._futures[group_key][item.chunk_id] = loop.create_future()
+
+        # (Re)arm the linger timer for this group
+        if group_key in self._timers:
+            self._timers[group_key].cancel()
+        self._timers[group_key] = loop.call_later(self.linger_seconds, self._flush, group_key)
+
+        return await future
+
+    def _flush(self, group_key: Hashable):
+        pack = self._pending.pop(group_key, None)
+        futures = self._futures.pop(group_key, {})
+        timer = self._timers.pop(group_key, None)
+        if timer:
+            timer.cancel()
+        if pack and pack.items:
+            task = asyncio.ensure_future(self._run(group_key, pack, futures))
+            self._runs.add(task)
+            task.add_done_callback(self._runs.discard)
+
+    async def _run(self, group_key: Hashable, pack: ChunkPack, futures: Dict[str, asyncio.Future]):
+        try:
+            results = await self.run_pack(group_key, pack)
+        except Exception as e:
+            logger.warning(f"Packed call for {len(pack.items)} chunks failed: {e}")
+            for f in futures.values():
+                if not f.done():
+                    f.set_exception(e)
+            return
+        except BaseException:
+            # Cancelled (e.g. at shutdown): don't leave the submitters waiting forever
+            for f in futures.values():
+                f.cancel()
+            raise
+        for chunk_id, f in futures.items():
+            if not f.done():
+                f.set_result(results.get(chunk_id, []))
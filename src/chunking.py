@@ -1,7 +1,14 @@
-import tree_sitter
-from tree_sitter_language_pack import get_language, get_parser
 from dataclasses import dataclass
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Tuple
+from src.parser_registry import parser_registry
+from src.source_buffer import SourceBuffer
+from src.config import settings
+from src.token_budget import plan_estimator
+from src.triage import score_node
+
+# Byte-size pre-check before decoding a node: anything longer is treated as over the token limit
+_MAX_CHARS_PER_TOKEN = 12
+_SLICE_CHARS_PER_TOKEN = 4
 
 @dataclass
 class CodeChunk:
@@ -10,6 +17,8 @@ class CodeChunk:
     end_line: int
     name: str
     type: str  # 'class', 'function', 'method'
+    body_offset: int = 0  # code[:body_offset] is the shared import/package header, code[body_offset:] the node
+    triage_score: int | None = None  # Business-logic signals in the node's AST (None: not parsed, e.g. slices)
 
 class UniversalChunker:
     # Configuration: Which AST nodes constitute a "chunk" in each language?
@@ -41,42 +50,18 @@ class UniversalChunker:
         }
     }
 
-    def __init__(self, source_code: str, language_id: str = "python", max_chars: int = 15000):
-        self.source = source_code
-        self.source_bytes = source_code.encode("utf8")  # Store bytes for safe slicing
-        self.max_chars = max_chars
+    def __init__(self, source_code: str | SourceBuffer, language_id: str = "python", max_tokens: int | None = None):
+        # Work on bytes for safe slicing; a SourceBuffer (mmap) avoids a second full copy
+        self.buffer = source_code if isinstance(source_code, SourceBuffer) else SourceBuffer.from_text(source_code)
+        self.source_bytes = self.buffer.data
+        self.max_tokens = max_tokens or settings.chunk_max_tokens
         self.language_id = self._normalize_lang_id(language_id)
+        self.tree = None  # Set by chunk(); reused by outline()
         
-        try:
-            self.parser = get_parser(self.language_id)
-            self.lang_def = get_language(self.language_id)
-            self.config = self.LANGUAGE_CONFIG.get(self.language_id)
-        except Exception as e:
-            # Fallback: Try manual import for specific languages
-            try:
-                if self.language_id == "c_sharp":
-                    import tree_sitter_c_sharp
-                    # Direct approach matching recent tree-sitter:
-                    lang_capsule = tree_sitter_c_sharp.language()
-                    self.lang_def = tree_sitter.Language(lang_capsule)
-                    self.parser = tree_sitter.Parser(self.lang_def)
-                    self.config = self.LANGUAGE_CONFIG.get(self.language_id)
-                elif self.language_id == "javascript":
-                    try:
-                        import tree_sitter_javascript
-                        self.lang_def = tree_sitter_javascript.language()
-                    except ImportError:
-                        # Try js alias if needed, though usually it's tree_sitter_javascript
-                        pass
-                    
-                    self.parser = tree_sitter.Parser()
-                    self.parser.set_language(self.lang_def)
-                    self.config = self.LANGUAGE_CONFIG.get(self.language_id)
-                else:
-                    raise e
-            except Exception as fallback_error:
-                print(f"Warning: Could not load parser for {language_id} (Fallback also failed): {fallback_error}")
-                self.config = None
+        # Grammars and parsers are loaded once per process/thread by the registry
+        self.parser = parser_registry.get_parser(self.language_id)
+        self.lang_def = parser_registry.get_language(self.language_id)
+        self.config = self.LANGUAGE_CONFIG.get(self.language_id) if self.parser else None
 
     def _normalize_lang_id(self, lang: str) -> str:
         # Map common names to tree-sitter identifiers
@@ -88,8 +73,8 @@ class UniversalChunker:
         if not self.config:
             return self._fallback_slicing()
 
-        tree = self.parser.parse(self.source_bytes)
-        root_node = tree.root_node
+        self.tree = self.parser.parse(self.source_bytes)
+        root_node = self.tree.root_node
 
         # 1. Extract Global Context (Imports/Package defs)
         context_str = self._extract_context(root_node)
@@ -103,55 +88,89 @@ class UniversalChunker:
 
         return chunks
 
+    def outline(self) -> Tuple[List[str], List[str]]:
+        """
+        Walks the tree parsed by chunk() once and returns (definitions, import statements),
+        so the static indexer can reuse this parse instead of re-parsing the file.
+        Definitions are the first line of every class/function/method node.
+        """
+        if not self.config or self.tree is None:
+            return [], []
+
+        definitions, imports = [], []
+        stack = [(self.tree.root_node, False)]
+        while stack:
+            node, in_body = stack.pop()
+            if node.type in self.config["split_nodes"]:
+                header = self._text(node.start_byte, min(node.end_byte, node.start_byte + 400)).split("\n", 1)[0]
+                header = header.strip().rstrip("{:").strip()
+                if len(header) >= 100: # heuristic to avoid noise: keep just the signature head
+                    header = header.split("(", 1)[0][:100] + "(...)"
+                definitions.append(header)
+                in_body = True
+            elif node.type in self.config["context_nodes"] and not in_body:
+                # Only module-level context; e.g. JS `const` inside functions is not an import
+                imports.append(self._text(node.start_byte, node.end_byte))
+            stack.extend((child, in_body) for child in reversed(node.children))
+        return definitions, imports
+
     def _extract_context(self, root) -> str:
         """Extracts imports and package definitions."""
         context_parts = []
         for child in root.children:
             if child.type in self.config["context_nodes"]:
                 # Safe byte slicing
-                text = self.source_bytes[child.start_byte : child.end_byte].decode("utf8")
-                context_parts.append(text)
+                context_parts.append(self._text(child.start_byte, child.end_byte))
         return "\n".join(context_parts)
 
     def _traverse(self, node, chunks: List[CodeChunk], context_header: str):
         """Recursively finds chunks."""
         if node.type in self.config["split_nodes"]:
-            # SAFE SLICING: Do not use node.text
-            node_text = self.source_bytes[node.start_byte : node.end_byte].decode("utf8")
-            
-            # Identify the name of the function/class
-            name_node = node.child_by_field_name(self.config["name_field"])
-            if name_node:
-                chunk_name = self.source_bytes[name_node.start_byte : name_node.end_byte].decode("utf8")
-            else:
-                chunk_name = "anonymous"
-
-            if len(node_text) < self.max_chars:
+            # Size check on byte offsets first: hopelessly oversized nodes are never decoded
+            node_text = None
+            if node.end_byte - node.start_byte < self.max_tokens * _MAX_CHARS_PER_TOKEN:
+                # SAFE SLICING: Do not use node.text
+                node_text = self._text(node.start_byte, node.end_byte)
+            if node_text is not None and plan_estimator.count(node_text) <= self.max_tokens:
+                # Identify the name of the function/class
+                name_node = node.child_by_field_name(self.config["name_field"])
+                if name_node:
+                    chunk_name = self._text(name_node.start_byte, name_node.end_byte)
+                else:
+                    chunk_name = "anonymous"
+
                 chunks.append(CodeChunk(
                     code=f"{context_header}\n\n{node_text}",
                     start_line=node.start_point.row + 1,
                     end_line=node.end_point.row + 1,
                     name=chunk_name,
-                    type=node.type
+                    type=node.type,
+                    body_offset=len(context_header) + 2,
+                    triage_score=score_node(node, self._text).score
                 ))
                 return
 
         for child in node.children:
             self._traverse(child, chunks, context_header)
 
+    def _text(self, start: int, end: int) -> str:
+        return self.buffer.text(start, end)
+
     def _fallback_slicing(self) -> List[CodeChunk]:
-        """Naive string slicer for unsupported languages."""
+        """Naive byte-window slicer for unsupported languages (line numbers via the buffer's line index)."""
         chunks = []
         start = 0
         overlap = 500
-        while start < len(self.source):
-            end = min(start + self.max_chars, len(self.source))
+        window = max(self.max_tokens * _SLICE_CHARS_PER_TOKEN, overlap * 2)
+        size = len(self.buffer)
+        while start < size:
+            end = min(start + window, size)
             chunks.append(CodeChunk(
-                code=self.source[start:end],
-                start_line=1 + self.source[:start].count('\n'),
-                end_line=1 + self.source[:end].count('\n'),
+                code=self._text(start, end),
+                start_line=self.buffer.line_of(start),
+                end_line=self.buffer.line_of(end),
                 name=f"part_{len(chunks)}",
                 type="slice"
             ))
-            start += (self.max_chars - overlap)
+            start += (window - overlap)
         return chunks
\ No newline at end of file
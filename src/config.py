@@ -9,12 +9,39 @@ class Settings(BaseSettings):
     repo_root: Path = Path("/srv/repos")
     codebase_config: Path = Path("config/codebases.yaml")
     prompts_dir: Path = Path("config/prompts")
+    parse_artifact_dir: Path = Path(".cache/parse_artifacts")  # Chunk plans keyed by content hash
+    parse_artifact_max_mb: int = 1024  # Plan cache size cap, least recently used dropped first (0 = unlimited)
+    parse_artifact_max_age_days: int = 30  # Plans unused for this long are dropped (0 = keep)
 
     # LLM
-    llm_provider: Literal["gemini", "anthropic", "openai", "ollama"] = "gemini"
+    llm_provider: Literal["gemini", "ollama"] = "gemini"
     model_name: str = "gemini-2.5-pro" 
     temperature: float = 0.0
     max_tokens: int = 8192
+    # "http": native async REST client on a pooled keep-alive connection pool;
+    # "sdk": google-generativeai, one worker thread per call
+    llm_transport: Literal["http", "sdk"] = "http"
+    gemini_api_base: str = "https://generativelanguage.googleapis.com"  # Point at fake_gemini_server.py for load tests
+    llm_http_max_connections: int = 128  # Calls in flight on the HTTP transport (pool size)
+    llm_request_timeout_seconds: float = 120.0  # Per-call timeout (retried like any other failure)
+    # Several backends / API keys behind one router (see config/llm_backends.yaml; no backends = single client)
+    llm_backends_config: Path = Path("config/llm_backends.yaml")
+    llm_backend_cooldown_seconds: float = 60.0  # How long a throttled backend is skipped when the API gives no delay
+    ollama_base_url: str = "http://localhost:11434"
+    ollama_model: str = "llama3.1:8b"
+
+    # LLM Quota (proactive token-bucket limiter, 0 disables a budget)
+    llm_requests_per_minute: int = 150
+    llm_tokens_per_minute: int = 2_000_000
+
+    # Model Cascade: a fast model answers extraction prompts first; only uncertain ones go to model_name
+    # "draft" keeps fast answers whose rules all meet cascade_min_confidence (or that found none);
+    # "classify" keeps only "no rules" answers and re-extracts every chunk where rules were found
+    cascade_mode: Literal["off", "draft", "classify"] = "off"
+    cascade_model_name: str = "gemini-2.5-flash"
+    cascade_min_confidence: float = 0.8
+    cascade_requests_per_minute: int = 1000  # Fast-model quota (Gemini limits each model separately)
+    cascade_tokens_per_minute: int = 4_000_000
     
     # API Keys & Gemini Specifics
     # FIX: Renamed to match the standard GOOGLE_API_KEY variable
@@ -27,13 +54,69 @@ class Settings(BaseSettings):
     kb_db_user: str = "postgres"
     kb_db_host: str = "localhost"
     kb_db_port: int = 5432
+    async_db_enabled: bool = True  # Phase 3 writes go through asyncpg (one session per file) instead of blocking the loop
+    async_db_pool_size: int = 20
 
     # Project Configuration
     project_id: str = "default-project"
     project_name: str = "Default Analysis Project"
 
+    # LLM Response Cache (content-addressed, persists across runs)
+    llm_cache_enabled: bool = True
+    llm_cache_path: Path = Path(".cache/llm_responses.sqlite")
+    llm_cache_max_mb: int = 2048
+    llm_cache_max_age_days: int = 30
+
+    # Chunk Packing: several small chunks share one LLM call
+    # "file" packs within a file (deterministic prompts, cache friendly);
+    # "project" also packs across concurrently analyzed files of a project
+    chunk_packing: Literal["off", "file", "project"] = "off"  # Opt-in: changes prompts and results (see README)
+    pack_token_budget: int = 6000  # Max code tokens per packed prompt
+    pack_small_chunk_tokens: int = 800  # Chunks at or below this size are eligible for packing
+    pack_linger_seconds: float = 0.5  # "project" mode: how long a partial pack waits for more chunks
+
+    # Triage: chunks without business-logic signals in their AST (getters, setters, DTOs, delegations)
+    # "skip" never sends them to the LLM; "batch" packs them into shared calls whatever their size
+    triage_mode: Literal["off", "skip", "batch"] = "off"  # Opt-in: the score is a heuristic (see README)
+    triage_threshold: int = 1  # Chunks scoring below this are trivial (branch/throw/persistence call = 2, operator = 1)
+
+    # Rule Persistence (write-behind: results are bulk-loaded in batches)
+    rule_sink_flush_rows: int = 5000  # Flush once this many rules are buffered
+    rule_sink_flush_seconds: float = 2.0  # ...or at least this often
+    rule_sink_max_pending_rows: int = 50_000  # Producers wait while this many rows are buffered or being written
+
+    # Embeddings (rules + graph summaries; dimension is fixed by the columns, EMBEDDING_DIM)
+    embeddings_enabled: bool = True  # Backfill missing embeddings after analysis
+    embedding_provider: Literal["hashing", "gemini"] = "hashing"  # "hashing" is local/offline
+    embedding_batch_size: int = 1000  # Rows read, embedded and written per batch
+    gemini_embedding_model: str = "models/text-embedding-004"
+
+    # Prompt Budget (token-based; lowest-priority context is trimmed first)
+    prompt_token_budget: int = 24_000  # Max input tokens per extraction prompt (0 = unlimited)
+    chunk_max_tokens: int = 3_500  # AST nodes above this are split into their children
+    token_estimate_scale: float = 1.0  # Initial estimator calibration; refined from provider token counts
+
+    # Reporting (Phase 4)
+    # "auto" uses one prompt when the run fits report_section_tokens, else map-reduce
+    report_mode: Literal["auto", "single", "map_reduce"] = "auto"
+    report_section_tokens: int = 30_000  # Input budget per map/reduce prompt
+    report_map_concurrency: int = 8  # Sections being summarized at once (LLM slots still apply)
+    report_module_edges: int = 50  # Directory-level dependency edges shown to the final prompt
+    report_concurrent_projects: int = 3  # Runs whose reports are generated at once
+
     # Processing
-    max_concurrent_jobs: int = 5
+    # "phases" runs discovery/indexing/analysis/reporting one after another;
+    # "pipeline" streams files through bounded queues (flat memory, early results)
+    orchestrator_mode: Literal["phases", "pipeline"] = "phases"
+    pipeline_queue_size: int = 100  # Max files waiting between two pipeline stages
+    max_concurrent_jobs: int = 5  # Concurrent LLM calls (chunks from all files share this limit)
+    max_concurrent_files: int = 20  # Files being chunked/analyzed at once
+    index_workers: int = 0  # Phase 2 worker processes (0 = one per CPU, 1 = serial)
+    index_batch_size: int = 200  # Files per worker task; results stream back per batch
+    graph_batch_size: int = 1000  # Rows per set-based upsert when writing the dependency graph
+    context_hops: int = 1  # Dependency hops included in a file's graph context (2 = transitive)
+    context_token_budget: int = 2000  # Max tokens of dependency summaries injected per file
+    incremental_analysis: bool = True  # Skip files whose content, language, prompt and model are unchanged
     file_extensions: tuple[str, ...] = (".py", ".cs", ".js", ".ts", ".java")
     exclude_dirs: set[str] = {
         ".git", "venv", ".venv", "node_modules", "__pycache__",
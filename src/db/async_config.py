@@ -0,0 +1,19 @@
+from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from src.config import settings
+from src.db.config import DATABASE_URL
+
+# Same database as the sync engine, through asyncpg. Imported only when
+# settings.async_db_enabled is set, so asyncpg stays optional otherwise.
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=settings.async_db_pool_size, max_overflow=0)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+
+@asynccontextmanager
+async def unit_of_work():
+    """One session and one transaction: commits on success, rolls back on error."""
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            yield session
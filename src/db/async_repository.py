@@ -0,0 +1,91 @@
+import uuid
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.db.models import FileDependency, CodeSummary, AnalysisRun, WorkItem
+from src.db.repository import RULE_COPY_COLUMNS, fingerprint_upsert, mark_done_statement, param_safe_chunks
+
+# Async counterparts of the src/db/repository.py methods used on the
+# Phase 3 hot path (rule sink, work-item checkpoints, pipeline context
+# loading), so DB round trips overlap with LLM calls instead of blocking
+# the event loop. Only what those callers use lives here. Methods never
+# commit: the caller owns the transaction (see src/db/async_config.unit_of_work).
+
+
+class AsyncBusinessRuleRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def update_run_status(self, run_id: str, status: str):
+        await self.db.execute(update(AnalysisRun).where(AnalysisRun.run_id == run_id).values(status=status))
+
+    async def copy_rules(self, rows: list[dict]):
+        """Bulk-loads rule rows (RULE_COPY_COLUMNS keys) with asyncpg's binary COPY, inside the session's transaction."""
+        if not rows:
+            return
+        connection = await self.db.connection()
+        raw = await connection.get_raw_connection()
+        records = [
+            tuple(uuid.UUID(str(r[c])) if c in ("rule_id", "run_id") else r[c] for c in RULE_COPY_COLUMNS)
+            for r in rows
+        ]
+        await raw.driver_connection.copy_records_to_table(
+            "business_rules", records=records, columns=list(RULE_COPY_COLUMNS)
+        )
+
+
+class AsyncGraphRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_internal_edges(self, file_paths: list[str]) -> list[tuple[str, str]]:
+        """(source, target) file-to-file edges leaving file_paths; external edges are skipped."""
+        if not file_paths:
+            return []
+        result = await self.db.execute(
+            select(FileDependency.source_file, FileDependency.target_file)
+            .where(FileDependency.source_file.in_(file_paths), FileDependency.relation_type != "external")
+        )
+        return [tuple(r) for r in result]
+
+    async def get_summaries_for_files(self, file_paths: list[str]) -> list[tuple[str, str]]:
+        if not file_paths:
+            return []
+        result = await self.db.execute(
+            select(CodeSummary.file_path, CodeSummary.summary).where(CodeSummary.file_path.in_(file_paths))
+        )
+        return [tuple(r) for r in result]
+
+
+class AsyncFingerprintRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def upsert_many(self, rows: list[dict]):
+        for chunk in param_safe_chunks(rows):
+            await self.db.execute(fingerprint_upsert(chunk))
+
+
+class AsyncWorkItemRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _update(self, run_id: str, file_path: str, **values):
+        await self.db.execute(
+            update(WorkItem)
+            .where(WorkItem.run_id == run_id, WorkItem.file_path == file_path)
+            .values(**values)
+        )
+
+    async def start(self, run_id: str, file_path: str, chunks_total: int):
+        await self._update(run_id, file_path, chunks_total=chunks_total, chunks_done=0, attempts=WorkItem.attempts + 1)
+
+    async def chunk_progress(self, run_id: str, file_path: str, chunks_done: int):
+        await self._update(run_id, file_path, chunks_done=chunks_done)
+
+    async def mark_failed(self, run_id: str, file_path: str, error: Optional[str]):
+        await self._update(run_id, file_path, status="FAILED", error=(error or "")[:2000])
+
+    async def mark_done_many(self, items: list[tuple[str, str]]):
+        if items:
+            await self.db.execute(mark_done_statement(), [{"b_run": run_id, "b_path": path} for run_id, path in items])
@@ -1,9 +1,12 @@
 import uuid
-from sqlalchemy import Column, String, Integer, ForeignKey, Text, Float, DateTime, func
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, Text, Float, DateTime, Computed, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from pgvector.sqlalchemy import Vector
 from src.db.config import Base
 
+# Dimension of every embedding column (and of their HNSW indexes)
+EMBEDDING_DIM = 768
+
 # 1. Project Model (Must exist for ForeignKey to work)
 class Project(Base):
     __tablename__ = "projects"
@@ -22,6 +25,14 @@ class AnalysisRun(Base):
     
     status = Column(String, default="IN_PROGRESS")
     created_at = Column(DateTime, default=func.now())
+    discovered_at = Column(DateTime)  # Set once every file has a work item; resume needs it
+
+# Weighted document: title (A) > description (B) > code (C)
+RULE_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(code_snippet, '')), 'C')"
+)
 
 # 3. Business Rule Model
 class BusinessRule(Base):
@@ -32,7 +43,9 @@ class BusinessRule(Base):
     title = Column(String)
     description = Column(Text)
     code_snippet = Column(Text)
-    embedding = Column(Vector(768)) 
+    embedding = Column(Vector(EMBEDDING_DIM)) 
+    # Full-text search document, maintained by Postgres (GIN-indexed)
+    search_vector = Column(TSVECTOR, Computed(RULE_SEARCH_DOCUMENT, persisted=True))
 
 # 4. Graph Edge Model
 class FileDependency(Base):
@@ -46,4 +59,32 @@ class CodeSummary(Base):
     __tablename__ = "code_summaries"
     file_path = Column(String, primary_key=True)
     summary = Column(Text) 
-    embedding = Column(Vector(768))
\ No newline at end of file
+    embedding = Column(Vector(EMBEDDING_DIM))
+
+# 6. File Fingerprint (Incremental Analysis)
+class FileFingerprint(Base):
+    __tablename__ = "file_fingerprints"
+    project_id = Column(String, ForeignKey("projects.id"), primary_key=True)
+    file_path = Column(String, primary_key=True)
+    content_hash = Column(String)
+    size = Column(BigInteger)
+    mtime_ns = Column(BigInteger)
+    language = Column(String)
+    analysis_version = Column(String)  # Prompt template + model the rules were produced with
+    run_id = Column(UUID(as_uuid=True), ForeignKey("analysis_runs.run_id"))  # Run holding the current rules
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+# 7. Work Item (Checkpoint / Resume)
+class WorkItem(Base):
+    __tablename__ = "work_items"
+    run_id = Column(UUID(as_uuid=True), ForeignKey("analysis_runs.run_id"), primary_key=True)
+    file_path = Column(String, primary_key=True)
+    project_id = Column(String, ForeignKey("projects.id"))
+    language = Column(String)
+    status = Column(String, default="PENDING", index=True)  # PENDING | DONE | FAILED | CARRIED
+    chunks_total = Column(Integer)
+    chunks_done = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    error = Column(Text)
+    fingerprint = Column(JSONB)  # Written to file_fingerprints once the file is DONE
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -1,6 +1,45 @@
+import io
 from sqlalchemy.orm import Session
-from sqlalchemy import select, text
-from src.db.models import BusinessRule, FileDependency, CodeSummary, AnalysisRun, Project
+from loguru import logger
+from sqlalchemy import select, text, update, func, case, bindparam, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from src.db.models import BusinessRule, FileDependency, CodeSummary, AnalysisRun, Project, FileFingerprint, WorkItem
+
+# Columns written by the bulk (COPY) rule load, in order
+RULE_COPY_COLUMNS = ("rule_id", "run_id", "file_path", "title", "description", "code_snippet")
+
+# Postgres rejects statements with more bind parameters than this
+MAX_BIND_PARAMS = 65_535
+
+
+
+def _copy_field(value) -> str:
+    """Encodes one value for COPY's text format."""
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def param_safe_chunks(rows: list[dict]) -> list[list[dict]]:
+    """
+    Splits multi-row VALUES rows into statements that stay under MAX_BIND_PARAMS
+    whatever the configured batch size (headroom is left for ON CONFLICT clauses).
+    """
+    per_statement = max(1, (MAX_BIND_PARAMS - 100) // max(1, len(rows[0]))) if rows else 1
+    return [rows[i:i + per_statement] for i in range(0, len(rows), per_statement)]
+
+
+def run_files_subquery(run_id: str):
+    """
+    Every file of a run, as a subquery to join against instead of a literal IN list:
+    its work items (analyzed and carried forward) plus files with rules
+    (runs recorded before work items existed).
+    """
+    return union(
+        select(WorkItem.file_path.label("file_path")).where(WorkItem.run_id == run_id),
+        select(BusinessRule.file_path.label("file_path")).where(BusinessRule.run_id == run_id),
+    ).subquery("run_files")
+
 
 class BusinessRuleRepository:
     def __init__(self, db: Session):
@@ -20,6 +59,13 @@ class BusinessRuleRepository:
             run.status = status
             self.db.commit()
 
+    def mark_discovered(self, run_id: str):
+        """Records that every file of the run has its work item (PENDING or CARRIED)."""
+        self.db.query(AnalysisRun).filter(AnalysisRun.run_id == run_id).update(
+            {AnalysisRun.discovered_at: func.now()}, synchronize_session=False
+        )
+        self.db.commit()
+
     def bulk_insert_rules(self, rules_data: list[dict], run_id: str):
         objects = []
         for r in rules_data:
@@ -38,18 +84,159 @@ class BusinessRuleRepository:
             self.db.add_all(objects)
             self.db.commit()
 
+    def copy_rules(self, rows: list[dict]):
+        """
+        Bulk-loads rule rows (RULE_COPY_COLUMNS keys) with COPY FROM STDIN.
+        Does not commit: the caller commits the rules together with their checkpoints.
+        Embeddings are left NULL for the embedding stage.
+        """
+        if not rows:
+            return
+        buf = io.StringIO()
+        for r in rows:
+            buf.write("\t".join(_copy_field(r[c]) for c in RULE_COPY_COLUMNS))
+            buf.write("\n")
+        buf.seek(0)
+        cursor = self.db.connection().connection.cursor()
+        cursor.copy_expert(f"COPY business_rules ({', '.join(RULE_COPY_COLUMNS)}) FROM STDIN", buf)
+
+    def carry_forward_rules(self, from_run_id: str, to_run_id: str, file_paths: list[str]) -> int:
+        """
+        Copies the rules of unchanged files from a previous run into the new run
+        with a single set-based INSERT ... SELECT (no ORM round trip).
+        """
+        if not file_paths:
+            return 0
+        result = self.db.execute(
+            text("""
+                INSERT INTO business_rules (rule_id, run_id, file_path, title, description, code_snippet, embedding)
+                SELECT gen_random_uuid(), :to_run, file_path, title, description, code_snippet, embedding
+                FROM business_rules
+                WHERE run_id = :from_run AND file_path = ANY(:paths)
+            """),
+            {"to_run": str(to_run_id), "from_run": str(from_run_id), "paths": list(file_paths)}
+        )
+        self.db.commit()
+        return result.rowcount
+
+    def delete_rules_for_files(self, run_id: str, file_paths: list[str]) -> int:
+        """Removes a run's rules for the given files (e.g. partial writes before a crash)."""
+        if not file_paths:
+            return 0
+        deleted = self.db.query(BusinessRule)\
+            .filter(BusinessRule.run_id == run_id, BusinessRule.file_path.in_(file_paths))\
+            .delete(synchronize_session=False)
+        self.db.commit()
+        return deleted
+
+    def get_rules_missing_embeddings(self, limit: int, after=None) -> list[tuple]:
+        """(rule_id, text) pairs of rules without an embedding, in rule_id order after `after`."""
+        q = self.db.query(BusinessRule.rule_id, BusinessRule.title, BusinessRule.description)\
+            .filter(BusinessRule.embedding.is_(None))
+        if after is not None:
+            q = q.filter(BusinessRule.rule_id > after)
+        rows = q.order_by(BusinessRule.rule_id).limit(limit).all()
+        return [(r.rule_id, f"{r.title or ''}\n{r.description or ''}") for r in rows]
+
+    def set_rule_embeddings(self, pairs: list[tuple]):
+        """Writes (rule_id, vector) pairs in one executemany UPDATE."""
+        if not pairs:
+            return
+        table = BusinessRule.__table__
+        self.db.execute(
+            update(table).where(table.c.rule_id == bindparam("b_id")).values(embedding=bindparam("b_embedding")),
+            [{"b_id": rid, "b_embedding": vec} for rid, vec in pairs]
+        )
+        self.db.commit()
+
+    def find_similar_rules(self, vector, limit: int = 10, run_id: str | None = None) -> list[tuple]:
+        """
+        Nearest rules by cosine distance, as (BusinessRule, distance). Served by
+        the HNSW index; filtering by run_id happens on the candidates it returns.
+        """
+        distance = BusinessRule.embedding.cosine_distance(vector)
+        q = self.db.query(BusinessRule, distance.label("distance"))
+        if run_id:
+            q = q.filter(BusinessRule.run_id == run_id)
+        return q.order_by(distance).limit(limit).all()
+
+    def search_rules(self, query: str, project_id: str | None = None, run_id: str | None = None,
+                     file_prefix: str | None = None, limit: int = 20, offset: int = 0) -> list:
+        """
+        Full-text search over title/description/code (GIN index on search_vector).
+        Matches are ranked in SQL and only the requested page is returned, with
+        a highlighted description snippet computed for those rows alone.
+        Rows: (rule_id, run_id, project_id, file_path, title, snippet, rank).
+        """
+        tsquery = func.websearch_to_tsquery("english", query)
+        rank = func.ts_rank_cd(BusinessRule.search_vector, tsquery)
+
+        page = select(BusinessRule.rule_id, rank.label("rank"))\
+            .where(BusinessRule.search_vector.op("@@")(tsquery))
+        if run_id:
+            page = page.where(BusinessRule.run_id == run_id)
+        if project_id:
+            page = page.join(AnalysisRun, AnalysisRun.run_id == BusinessRule.run_id)\
+                .where(AnalysisRun.project_id == project_id)
+        if file_prefix:
+            # Literal 'prefix%' pattern so the text_pattern_ops index applies
+            escaped = file_prefix.replace("/", "//").replace("%", "/%").replace("_", "/_")
+            page = page.where(BusinessRule.file_path.like(escaped + "%", escape="/"))
+        page = page.order_by(rank.desc(), BusinessRule.rule_id).limit(limit).offset(offset).subquery()
+
+        snippet = func.ts_headline(
+            "english", func.coalesce(BusinessRule.description, ""), tsquery,
+            "StartSel=**, StopSel=**, MaxWords=35, MinWords=15"
+        )
+        stmt = select(
+            BusinessRule.rule_id, BusinessRule.run_id, AnalysisRun.project_id, BusinessRule.file_path,
+            BusinessRule.title, snippet.label("snippet"), page.c.rank
+        ).join(page, page.c.rule_id == BusinessRule.rule_id)\
+            .outerjoin(AnalysisRun, AnalysisRun.run_id == BusinessRule.run_id)\
+            .order_by(page.c.rank.desc(), BusinessRule.rule_id)
+        return self.db.execute(stmt).all()
+
+    def iter_rules_for_report(self, run_id: str, batch_size: int = 5000):
+        """Streams (file_path, title, description) of a run, ordered by file_path in byte order."""
+        yield from self.db.query(BusinessRule.file_path, BusinessRule.title, BusinessRule.description)\
+            .filter(BusinessRule.run_id == run_id)\
+            .order_by(BusinessRule.file_path.collate("C"))\
+            .yield_per(batch_size)
+
+    def report_size(self, run_id: str) -> tuple[int, int]:
+        """(rule count, characters of title + description) for a run, computed in SQL."""
+        count, chars = self.db.query(
+            func.count(BusinessRule.rule_id),
+            func.coalesce(func.sum(
+                func.coalesce(func.length(BusinessRule.title), 0) + func.coalesce(func.length(BusinessRule.description), 0)
+            ), 0)
+        ).filter(BusinessRule.run_id == run_id).one()
+        return int(count), int(chars)
+
     def get_all_rules(self, run_id: str):
         return self.db.query(BusinessRule).filter(BusinessRule.run_id == run_id).all()
 
     def get_file_paths_for_run(self, run_id: str) -> list[str]:
         """
         Returns a list of distinct file paths associated with a specific run.
-        Used to filter CodeSummary and FileDependency tables which lack run_id.
+        Prefer iter_file_paths_for_run / run_files_subquery for large runs.
         """
-        results = self.db.query(BusinessRule.file_path)\
-            .filter(BusinessRule.run_id == run_id)\
-            .distinct().all()
-        return [r[0] for r in results]
+        return list(self.iter_file_paths_for_run(run_id))
+
+    def iter_file_paths_for_run(self, run_id: str, batch_size: int = 5000):
+        """Streams the run's file paths in byte order (same order as iter_rules_for_report)."""
+        run_files = run_files_subquery(run_id)
+        for row in self.db.query(run_files.c.file_path)\
+                .order_by(run_files.c.file_path.collate("C"))\
+                .yield_per(batch_size):
+            yield row[0]
+
+    def file_stats_for_run(self, run_id: str) -> tuple[int, str | None, str | None]:
+        """(file count, first path, last path in byte order) of a run, computed in SQL."""
+        run_files = run_files_subquery(run_id)
+        path = run_files.c.file_path.collate("C")
+        count, first, last = self.db.query(func.count(), func.min(path), func.max(path)).select_from(run_files).one()
+        return int(count), first, last
 
 class GraphRepository:
     def __init__(self, db: Session):
@@ -94,9 +281,348 @@ class GraphRepository:
             
         return "\n\n".join(context_parts)
 
+    def iter_internal_edges(self, file_paths: list[str], batch_size: int = 5000):
+        """
+        Streams (source, target) file-to-file edges for the given sources,
+        querying in bounded IN batches. External edges are skipped.
+        """
+        for i in range(0, len(file_paths), batch_size):
+            batch = file_paths[i:i + batch_size]
+            yield from self.db.query(FileDependency.source_file, FileDependency.target_file)\
+                .filter(FileDependency.source_file.in_(batch))\
+                .filter(FileDependency.relation_type != "external")\
+                .yield_per(batch_size)
+
+    def iter_summaries(self, file_paths: list[str], batch_size: int = 5000):
+        """Streams (file_path, summary) pairs for the given files in bounded IN batches."""
+        for i in range(0, len(file_paths), batch_size):
+            batch = file_paths[i:i + batch_size]
+            yield from self.db.query(CodeSummary.file_path, CodeSummary.summary)\
+                .filter(CodeSummary.file_path.in_(batch))\
+                .yield_per(batch_size)
+
+    def get_summaries_missing_embeddings(self, limit: int, after: str | None = None) -> list[tuple]:
+        """(file_path, summary) pairs of graph nodes without an embedding, in path order after `after`."""
+        q = self.db.query(CodeSummary.file_path, CodeSummary.summary).filter(CodeSummary.embedding.is_(None))
+        if after is not None:
+            q = q.filter(CodeSummary.file_path > after)
+        return [tuple(r) for r in q.order_by(CodeSummary.file_path).limit(limit).all()]
+
+    def set_summary_embeddings(self, pairs: list[tuple]):
+        """Writes (file_path, vector) pairs in one executemany UPDATE."""
+        if not pairs:
+            return
+        table = CodeSummary.__table__
+        self.db.execute(
+            update(table).where(table.c.file_path == bindparam("b_path")).values(embedding=bindparam("b_embedding")),
+            [{"b_path": path, "b_embedding": vec} for path, vec in pairs]
+        )
+        self.db.commit()
+
+    def find_similar_files(self, vector, limit: int = 10) -> list[tuple]:
+        """Nearest graph nodes by cosine distance, as (file_path, summary, distance)."""
+        distance = CodeSummary.embedding.cosine_distance(vector)
+        return self.db.query(CodeSummary.file_path, CodeSummary.summary, distance.label("distance"))\
+            .order_by(distance).limit(limit).all()
+
+    def iter_summaries_for_run(self, run_id: str, batch_size: int = 5000):
+        """Streams (file_path, summary) for every file of a run, scoped by join rather than a path list."""
+        run_files = run_files_subquery(run_id)
+        yield from self.db.query(CodeSummary.file_path, CodeSummary.summary)\
+            .join(run_files, run_files.c.file_path == CodeSummary.file_path)\
+            .yield_per(batch_size)
+
+    def iter_dependencies_for_run(self, run_id: str, internal_only: bool = False, limit: int | None = None,
+                                  batch_size: int = 5000):
+        """Streams (source_file, target_file, relation_type) for edges leaving the run's files."""
+        run_files = run_files_subquery(run_id)
+        q = self.db.query(FileDependency.source_file, FileDependency.target_file, FileDependency.relation_type)\
+            .join(run_files, run_files.c.file_path == FileDependency.source_file)
+        if internal_only:
+            q = q.filter(FileDependency.relation_type != "external")
+        if limit is not None:
+            q = q.limit(limit)
+        yield from q.yield_per(batch_size)
+
     def get_summaries_for_files(self, file_paths: list[str]):
-        return self.db.query(CodeSummary).filter(CodeSummary.file_path.in_(file_paths)).all()
+        """(file_path, summary) rows for an explicit file list, queried in bounded IN batches."""
+        return list(self.iter_summaries(file_paths))
 
-    def get_dependencies_for_files(self, file_paths: list[str]):
+    def get_dependencies_for_files(self, file_paths: list[str], limit: int = 200, batch_size: int = 5000):
         # Get edges where the source is in the active file list
-        return self.db.query(FileDependency).filter(FileDependency.source_file.in_(file_paths)).limit(200).all()
\ No newline at end of file
+        rows = []
+        for i in range(0, len(file_paths), batch_size):
+            rows += self.db.query(FileDependency.source_file, FileDependency.target_file, FileDependency.relation_type)\
+                .filter(FileDependency.source_file.in_(file_paths[i:i + batch_size]))\
+                .limit(limit - len(rows)).all()
+            if len(rows) >= limit:
+                break
+        return rows
+
+class GraphBatchWriter:
+    """
+    Buffers graph nodes (summaries) and edges (dependencies) and writes them
+    with set-based INSERT ... ON CONFLICT statements, one transaction per batch.
+    Use as a context manager so the tail of the buffer is flushed on exit.
+
+    With auto_flush=False the owner flushes instead, e.g. with take() on the
+    event loop, write() on a DB thread and release() once it is committed.
+    """
+
+    def __init__(self, db: Session, batch_size: int = 1000, auto_flush: bool = True):
+        self.db = db
+        self.batch_size = batch_size
+        self.auto_flush = auto_flush
+        # Keyed so duplicates inside one batch collapse (ON CONFLICT cannot touch a row twice)
+        self._nodes: dict[str, dict] = {}
+        self._edges: dict[tuple[str, str], str] = {}
+        self._in_flight: list[tuple[dict, dict]] = []  # Taken, not yet committed; still seen by pending_*()
+        self.nodes_written = 0
+        self.edges_written = 0
+
+    def add_summary(self, file_path: str, summary: str, embedding=None):
+        self._nodes[file_path] = {"file_path": file_path, "summary": summary, "embedding": embedding}
+        if self.auto_flush and len(self._nodes) >= self.batch_size:
+            self.flush_nodes()
+
+    def add_dependency(self, source: str, target: str, type: str = "import"):
+        self._edges.setdefault((source, target), type)
+        if self.auto_flush and len(self._edges) >= self.batch_size:
+            self.flush_edges()
+
+    def flush_nodes(self):
+        nodes, self._nodes = self._nodes, {}
+        self._write_nodes(nodes)
+
+    def _write_nodes(self, nodes: dict[str, dict]):
+        if not nodes:
+            return
+        rows = list(nodes.values())
+        statements = []
+        for chunk in param_safe_chunks(rows):
+            stmt = pg_insert(CodeSummary).values(chunk)
+            statements.append(stmt.on_conflict_do_update(
+                index_elements=[CodeSummary.file_path],
+                set_={
+                    "summary": stmt.excluded.summary,
+                    # Keep an existing embedding unless a new one is given, but drop it
+                    # when the summary text changed (the embedding stage recomputes it)
+                    "embedding": case(
+                        (CodeSummary.summary == stmt.excluded.summary,
+                         func.coalesce(stmt.excluded.embedding, CodeSummary.embedding)),
+                        else_=stmt.excluded.embedding,
+                    ),
+                }
+            ))
+        self._execute(statements, f"{len(rows)} summaries")
+        self.nodes_written += len(rows)
+
+    def flush_edges(self):
+        edges, self._edges = self._edges, {}
+        self._write_edges(edges)
+
+    def _write_edges(self, edges: dict[tuple[str, str], str]):
+        if not edges:
+            return
+        rows = [{"source_file": s, "target_file": t, "relation_type": rel} for (s, t), rel in edges.items()]
+        statements = [
+            pg_insert(FileDependency).values(chunk).on_conflict_do_nothing(
+                index_elements=[FileDependency.source_file, FileDependency.target_file]
+            )
+            for chunk in param_safe_chunks(rows)
+        ]
+        self._execute(statements, f"{len(rows)} dependencies")
+        self.edges_written += len(rows)
+
+    @property
+    def pending(self) -> int:
+        return len(self._nodes) + len(self._edges)
+
+    def pending_edges(self, sources: list[str]) -> list[tuple[str, str]]:
+        """Buffered or in-flight (source, target) file-to-file edges leaving `sources`; external edges are skipped."""
+        wanted = set(sources)
+        return [
+            (s, t)
+            for edges in [e for _, e in self._in_flight] + [self._edges]
+            for (s, t), rel in edges.items() if s in wanted and rel != "external"
+        ]
+
+    def pending_summaries(self, file_paths: list[str]) -> list[tuple[str, str]]:
+        """Buffered or in-flight (file_path, summary) pairs for the given files, newest last."""
+        return [
+            (p, nodes[p]["summary"])
+            for nodes in [n for n, _ in self._in_flight] + [self._nodes]
+            for p in file_paths if p in nodes
+        ]
+
+    def flush(self):
+        # Nodes first so edges never reference summaries that are not yet visible
+        self.flush_nodes()
+        self.flush_edges()
+
+    def take(self) -> tuple[dict, dict]:
+        """Empties both buffers into a batch for write(); pending_*() keep seeing it until release()."""
+        batch = (self._nodes, self._edges)
+        self._nodes, self._edges = {}, {}
+        self._in_flight.append(batch)
+        return batch
+
+    def write(self, batch: tuple[dict, dict]):
+        """Writes a taken batch. Touches no buffer, so it can run on another thread than add_*()."""
+        nodes, edges = batch
+        self._write_nodes(nodes)
+        self._write_edges(edges)
+
+    def release(self, batch: tuple[dict, dict]):
+        self._in_flight = [b for b in self._in_flight if b is not batch]
+
+    def _execute(self, statements: list, what: str):
+        # One transaction per batch, however many statements it takes
+        try:
+            for stmt in statements:
+                self.db.execute(stmt)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            logger.error(f"Graph batch write failed ({what})")
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+
+class FingerprintRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_for_project(self, project_id: str) -> dict[str, FileFingerprint]:
+        rows = self.db.query(FileFingerprint).filter(FileFingerprint.project_id == project_id).all()
+        return {r.file_path: r for r in rows}
+
+    def upsert_many(self, rows: list[dict], commit: bool = True):
+        """Upserts (project_id, file_path, run_id, **fingerprint) rows, in as few statements as the parameter cap allows."""
+        if not rows:
+            return
+        for chunk in param_safe_chunks(rows):
+            self.db.execute(fingerprint_upsert(chunk))
+        if commit:
+            self.db.commit()
+
+    def move_to_run(self, project_id: str, file_paths: list[str], run_id: str):
+        """Points carried-forward files at the run that now holds their rules."""
+        if not file_paths:
+            return
+        self.db.execute(
+            update(FileFingerprint)
+            .where(FileFingerprint.project_id == project_id, FileFingerprint.file_path.in_(file_paths))
+            .values(run_id=run_id)
+        )
+        self.db.commit()
+
+    def delete_paths(self, project_id: str, file_paths: list[str]):
+        """Removes fingerprints of files that no longer exist in the repository."""
+        if not file_paths:
+            return
+        self.db.query(FileFingerprint)\
+            .filter(FileFingerprint.project_id == project_id, FileFingerprint.file_path.in_(file_paths))\
+            .delete(synchronize_session=False)
+        self.db.commit()
+
+
+def fingerprint_upsert(rows: list[dict]):
+    """INSERT ... ON CONFLICT DO UPDATE for fingerprint rows (all rows must share the same keys)."""
+    stmt = pg_insert(FileFingerprint).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[FileFingerprint.project_id, FileFingerprint.file_path],
+        set_={k: stmt.excluded[k] for k in rows[0] if k not in ("project_id", "file_path")}
+    )
+
+
+def mark_done_statement():
+    table = WorkItem.__table__
+    return update(table)\
+        .where(table.c.run_id == bindparam("b_run"), table.c.file_path == bindparam("b_path"))\
+        .values(status="DONE", error=None)
+
+
+class WorkItemRepository:
+    """
+    Per-file checkpoint rows of a run. A file is DONE only once its rules are
+    stored, so a crashed run can be resumed by re-queuing PENDING/FAILED items.
+    """
+    UNFINISHED = ("PENDING", "FAILED")
+    COLUMNS = ("run_id", "file_path", "project_id", "language", "status", "fingerprint")
+
+    def __init__(self, db: Session, batch_size: int = 1000):
+        self.db = db
+        self.batch_size = batch_size
+
+    def add_items(self, rows: list[dict]):
+        """Inserts work items (run_id, file_path, project_id, language, status, fingerprint); existing rows are kept."""
+        # Multi-row VALUES needs the same keys in every row
+        rows = [{**{k: r.get(k) for k in self.COLUMNS}, "status": r.get("status") or "PENDING"} for r in rows]
+        for i in range(0, len(rows), self.batch_size):
+            stmt = pg_insert(WorkItem).values(rows[i:i + self.batch_size]).on_conflict_do_nothing(
+                index_elements=[WorkItem.run_id, WorkItem.file_path]
+            )
+            self.db.execute(stmt)
+        self.db.commit()
+
+    def _update(self, run_id: str, file_path: str, **values):
+        self.db.execute(
+            update(WorkItem)
+            .where(WorkItem.run_id == run_id, WorkItem.file_path == file_path)
+            .values(**values)
+        )
+        self.db.commit()
+
+    def start(self, run_id: str, file_path: str, chunks_total: int):
+        self._update(run_id, file_path, chunks_total=chunks_total, chunks_done=0, attempts=WorkItem.attempts + 1)
+
+    def chunk_progress(self, run_id: str, file_path: str, chunks_done: int):
+        self._update(run_id, file_path, chunks_done=chunks_done)
+
+    def progress_callback(self, run_id: str, file_path: str):
+        """on_progress hook for RepoMCPServer; checkpoint write failures never fail the analysis."""
+        def on_progress(chunks_done: int, chunks_total: int):
+            try:
+                if chunks_done == 0:
+                    self.start(run_id, file_path, chunks_total)
+                else:
+                    self.chunk_progress(run_id, file_path, chunks_done)
+            except Exception as e:
+                self.db.rollback()
+                logger.warning(f"Could not checkpoint progress for {file_path}: {e}")
+        return on_progress
+
+    def mark_done(self, run_id: str, file_path: str):
+        self._update(run_id, file_path, status="DONE", error=None)
+
+    def mark_failed(self, run_id: str, file_path: str, error: str):
+        self._update(run_id, file_path, status="FAILED", error=(error or "")[:2000])
+
+    def mark_done_many(self, items: list[tuple[str, str]], commit: bool = True):
+        """Marks (run_id, file_path) items DONE in one executemany UPDATE."""
+        if not items:
+            return
+        self.db.execute(mark_done_statement(), [{"b_run": run_id, "b_path": path} for run_id, path in items])
+        if commit:
+            self.db.commit()
+
+    def get_unfinished(self, run_id: str) -> list[WorkItem]:
+        return self.db.query(WorkItem)\
+            .filter(WorkItem.run_id == run_id, WorkItem.status.in_(self.UNFINISHED))\
+            .all()
+
+    def get_file_paths(self, run_id: str) -> list[str]:
+        """Every file of the run (analyzed or carried forward), for scoping the report."""
+        return [r[0] for r in self.db.query(WorkItem.file_path).filter(WorkItem.run_id == run_id)]
+
+    def status_counts(self, run_id: str) -> dict[str, int]:
+        rows = self.db.query(WorkItem.status, func.count())\
+            .filter(WorkItem.run_id == run_id)\
+            .group_by(WorkItem.status).all()
+        return dict(rows)
@@ -0,0 +1,57 @@
+# src/embedding_stage.py
+import time
+from loguru import logger
+
+from src.config import settings
+from src.db.repository import BusinessRuleRepository, GraphRepository
+from src.embeddings import Embedder, get_embedder
+
+
+class EmbeddingStage:
+    """
+    Backfills missing embeddings for business rules and graph summaries.
+
+    Runs after analysis rather than inside it: rows are read in large batches
+    (keyset-paginated on the primary key), embedded in one vectorised call per
+    batch on a worker thread, and written back with a single executemany UPDATE.
+    Anything left NULL (e.g. after a crash) is picked up by the next run.
+    """
+
+    def __init__(self, db_session, embedder: Embedder | None = None, batch_size: int | None = None):
+        self.db = db_session
+        self.rule_repo = BusinessRuleRepository(db_session)
+        self.graph_repo = GraphRepository(db_session)
+        self.embedder = embedder or get_embedder()
+        self.batch_size = batch_size or settings.embedding_batch_size
+
+    async def run(self) -> dict:
+        return {
+            "rules": await self._backfill(
+                "rules", self.rule_repo.get_rules_missing_embeddings, self.rule_repo.set_rule_embeddings),
+            "summaries": await self._backfill(
+                "summaries", self.graph_repo.get_summaries_missing_embeddings, self.graph_repo.set_summary_embeddings),
+        }
+
+    async def _backfill(self, what: str, fetch, write) -> int:
+        start = time.perf_counter()
+        done = 0
+        after = None
+        while True:
+            rows = fetch(self.batch_size, after)
+            if not rows:
+                break
+            after = rows[-1][0]
+
+            vectors = await self.embedder.embed_async([text for _, text in rows])
+            try:
+                write([(key, vec) for (key, _), vec in zip(rows, vectors)])
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Embedding write failed for a batch of {len(rows)} {what}: {e}")
+                continue
+            done += len(rows)
+
+        if done:
+            elapsed = time.perf_counter() - start
+            logger.info(f"Embedded {done} {what} in {elapsed:.1f}s ({done / max(elapsed, 1e-9):,.0f}/s)")
+        return done
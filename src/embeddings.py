@@ -0,0 +1,108 @@
+# src/embeddings.py
+import asyncio
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List
+import numpy as np
+from loguru import logger
+
+from src.config import settings
+from src.db.models import EMBEDDING_DIM
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+class Embedder(ABC):
+    """Turns texts into unit-length float32 vectors of `dim` dimensions (one row per text)."""
+    dim: int
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        pass
+
+    async def embed_async(self, texts: List[str]) -> np.ndarray:
+        # Embedding is CPU- or network-bound; keep it off the event loop
+        return await asyncio.to_thread(self.embed, texts)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased sub-words: `getOrderTotal` and `get_order_total` both give get/order/total."""
+    tokens = []
+    for ident in _IDENTIFIER.findall(text):
+        for part in ident.split("_"):
+            tokens.extend(p.lower() for p in _CAMEL.findall(part))
+    return tokens
+
+
+@lru_cache(maxsize=1_000_000)
+def _hash_feature(feature: str) -> int:
+    # Stable across processes (unlike hash()), so stored vectors stay comparable
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingEmbedder(Embedder):
+    """
+    Fully local embedder: signed feature hashing of sub-word unigrams and
+    bigrams, sublinear term frequency, L2 normalisation.
+
+    Needs no model download or network access. It captures lexical overlap
+    (shared identifiers and domain words), not paraphrase.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        rows, hashes = [], []
+        for i, text in enumerate(texts):
+            tokens = tokenize(text or "")
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            hashes.extend(_hash_feature(f) for f in features)
+            rows.extend([i] * len(features))
+
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if hashes:
+            h = np.array(hashes, dtype=np.uint64)
+            cols = (h % np.uint64(self.dim)).astype(np.int64)
+            signs = np.where((h >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+            np.add.at(out, (np.array(rows, dtype=np.int64), cols), signs)
+
+        out = np.sign(out) * np.log1p(np.abs(out))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1.0, norms)
+
+
+class GeminiEmbedder(Embedder):
+    """Gemini embedding API (network, paid). Batches up to 100 texts per request."""
+    MAX_BATCH = 100
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        import google.generativeai as genai
+        genai.configure(api_key=settings.google_api_key)
+        self.genai = genai
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), self.MAX_BATCH):
+            result = self.genai.embed_content(
+                model=settings.gemini_embedding_model,
+                content=[t or " " for t in texts[i:i + self.MAX_BATCH]],
+                task_type="retrieval_document",
+                output_dimensionality=self.dim,
+            )
+            vectors.extend(result["embedding"])
+        out = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1.0, norms)
+
+
+def get_embedder() -> Embedder:
+    if settings.embedding_provider == "gemini":
+        logger.info(f"Embeddings: Gemini ({settings.gemini_embedding_model}, {EMBEDDING_DIM} dims)")
+        return GeminiEmbedder(EMBEDDING_DIM)
+    logger.info(f"Embeddings: local feature hashing ({EMBEDDING_DIM} dims)")
+    return HashingEmbedder(EMBEDDING_DIM)
@@ -0,0 +1,151 @@
+# src/graph_snapshot.py
+from array import array
+from collections import defaultdict
+from typing import Awaitable, Callable, Iterable
+from loguru import logger
+
+from src.config import settings
+from src.db.repository import GraphBatchWriter, GraphRepository
+from src.token_budget import plan_estimator
+
+
+class GraphSnapshot:
+    """
+    Read-only, in-process copy of a run's dependency graph and file summaries.
+
+    Loaded once after Phase 2 so Phase 3 context lookups are dictionary hits
+    instead of one JOIN query per file. File paths are interned to integer ids
+    and adjacency is stored as compact int arrays.
+    """
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._paths: list[str] = []
+        self._adjacency: dict[int, array] = {}
+        self._summaries: dict[int, str] = {}
+
+    @classmethod
+    def load(cls, graph_repo: GraphRepository, file_paths: Iterable[str]) -> "GraphSnapshot":
+        snapshot = cls()
+        files = list(dict.fromkeys(file_paths))
+        for f in files:
+            snapshot._intern(f)
+
+        edges = defaultdict(list)
+        edge_count = 0
+        for source, target in graph_repo.iter_internal_edges(files):
+            edges[snapshot._intern(source)].append(snapshot._intern(target))
+            edge_count += 1
+        snapshot._adjacency = {src: array("i", sorted(set(dst))) for src, dst in edges.items()}
+
+        for file_path, summary in graph_repo.iter_summaries(snapshot._paths):
+            if summary:
+                snapshot._summaries[snapshot._ids[file_path]] = summary
+
+        logger.info(
+            f"Graph snapshot loaded: {len(snapshot._paths)} nodes, {edge_count} edges, "
+            f"{len(snapshot._summaries)} summaries"
+        )
+        return snapshot
+
+    @classmethod
+    async def load_neighbourhood(cls, fetch_edges: Callable[[list[str]], Awaitable[Iterable[tuple[str, str]]]],
+                                 fetch_summaries: Callable[[list[str]], Awaitable[Iterable[tuple[str, str]]]],
+                                 file_path: str, hops: int | None = None,
+                                 pending: GraphBatchWriter | None = None) -> "GraphSnapshot":
+        """
+        Loads only the part of the graph within `hops` of file_path (one edge
+        lookup per hop). Used by the streaming pipeline, where the graph is still
+        being written while files are analyzed: nodes and edges still buffered
+        in `pending` are merged in, so nothing has to be flushed early.
+
+        fetch_edges(files) returns stored (source, target) file-to-file edges
+        leaving `files`; fetch_summaries(files) returns (file_path, summary)
+        pairs. Callers adapt GraphRepository or AsyncGraphRepository to these.
+        """
+        hops = settings.context_hops if hops is None else hops
+        snapshot = cls()
+        snapshot._intern(file_path)
+
+        edges = defaultdict(list)
+        frontier = [file_path]
+        for _ in range(hops):
+            nxt = []
+            rows = list(await fetch_edges(frontier))
+            if pending:
+                rows += pending.pending_edges(frontier)
+            for source, target in rows:
+                if target not in snapshot._ids:
+                    nxt.append(target)
+                edges[snapshot._intern(source)].append(snapshot._intern(target))
+            frontier = list(dict.fromkeys(nxt))
+            if not frontier:
+                break
+        snapshot._adjacency = {src: array("i", sorted(set(dst))) for src, dst in edges.items()}
+
+        summaries = dict(await fetch_summaries(snapshot._paths[1:]))
+        if pending:
+            summaries.update(pending.pending_summaries(snapshot._paths[1:]))
+        for path, summary in summaries.items():
+            if summary:
+                snapshot._summaries[snapshot._ids[path]] = summary
+        return snapshot
+
+    def _intern(self, path: str) -> int:
+        idx = self._ids.get(path)
+        if idx is None:
+            idx = len(self._paths)
+            self._ids[path] = idx
+            self._paths.append(path)
+        return idx
+
+    def neighbours(self, file_path: str, hops: int = 1) -> list[list[str]]:
+        """Files reachable from file_path, grouped by distance (index 0 = direct imports)."""
+        start = self._ids.get(file_path)
+        if start is None:
+            return []
+
+        seen = {start}
+        frontier = [start]
+        levels = []
+        for _ in range(hops):
+            nxt = []
+            for node in frontier:
+                for dep in self._adjacency.get(node, ()):
+                    if dep not in seen:
+                        seen.add(dep)
+                        nxt.append(dep)
+            if not nxt:
+                break
+            levels.append([self._paths[i] for i in nxt])
+            frontier = nxt
+        return levels
+
+    def get_context(self, file_path: str, hops: int | None = None, token_budget: int | None = None) -> str:
+        """
+        Drop-in replacement for GraphRepository.get_smart_context.
+        Direct dependencies come first; further hops are added only while the
+        token budget allows.
+        """
+        hops = settings.context_hops if hops is None else hops
+        token_budget = settings.context_token_budget if token_budget is None else token_budget
+
+        headers = ["### Explicit Dependencies (Graph)", "### Transitive Dependencies (Graph)"]
+        parts = []
+        used = 0
+        for depth, level in enumerate(self.neighbours(file_path, hops)):
+            header_added = False
+            for path in level:
+                summary = self._summaries.get(self._ids[path])
+                if not summary:
+                    continue
+                cost = plan_estimator.count(summary)
+                if token_budget and used + cost > token_budget:
+                    return "\n\n".join(parts)
+                if not header_added:
+                    parts.append(headers[min(depth, 1)])
+                    header_added = True
+                parts.append(summary)
+                used += cost
+
+        return "\n\n".join(parts)
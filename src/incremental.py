@@ -0,0 +1,149 @@
+# src/incremental.py
+import hashlib
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from loguru import logger
+
+from src.config import settings
+from src.db.repository import FingerprintRepository
+from src.parse_artifacts import PLAN_VERSION
+
+_HASH_BLOCK = 1024 * 1024
+
+
+def compute_analysis_version() -> str:
+    """
+    Identifies the 'recipe' used to produce rules: the extraction prompt
+    templates (single chunk and packed), the packing settings that decide
+    which chunks go through the packed prompt, the chunking rules and the
+    prompt token budget (they decide chunk boundaries and how much context
+    survives trimming), and the model. Changing any of them invalidates
+    every fingerprint.
+    Triage skips or packs trivial chunks and the model cascade keeps some
+    fast-model answers, so their settings are part of the recipe too.
+    """
+    h = hashlib.sha256()
+    h.update(settings.model_name.encode("utf-8"))
+    if settings.chunk_packing != "off" or settings.triage_mode == "batch":
+        # Triage's "batch" mode packs with the same budgets
+        packing = f"packing:{settings.chunk_packing}:{settings.pack_token_budget}:{settings.pack_small_chunk_tokens}"
+        h.update(packing.encode("utf-8"))
+    chunking = (f"chunking:{PLAN_VERSION}:{settings.chunk_max_tokens}:{settings.token_estimate_scale}:"
+                f"{settings.prompt_token_budget}")
+    h.update(chunking.encode("utf-8"))
+    if settings.triage_mode != "off":
+        h.update(f"triage:{settings.triage_mode}:{settings.triage_threshold}".encode("utf-8"))
+    if settings.cascade_mode != "off":
+        cascade = f"cascade:{settings.cascade_mode}:{settings.cascade_model_name}:{settings.cascade_min_confidence}"
+        h.update(cascade.encode("utf-8"))
+    for name in ("extract_business_rules.j2", "extract_business_rules_batch.j2"):
+        try:
+            h.update((settings.prompts_dir / name).read_bytes())
+        except OSError:
+            pass
+    return h.hexdigest()[:16]
+
+
+def hash_file(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def refresh_row(project_id: str, file_path: str, fingerprint: dict, run_id: str) -> dict:
+    """Fingerprint row for FingerprintRepository.upsert_many."""
+    return {"project_id": project_id, "file_path": file_path, "run_id": run_id, **fingerprint}
+
+
+@dataclass
+class IncrementalPlan:
+    changed: list[str] = field(default_factory=list)
+    # prior run_id -> files whose rules can be copied from that run
+    unchanged: dict[str, list[str]] = field(default_factory=lambda: defaultdict(list))
+    # file_path -> fingerprint values to persist once the file is analyzed
+    pending: dict[str, dict] = field(default_factory=dict)
+    # fingerprint rows of touched-but-unmodified files, to upsert before carrying forward
+    refreshed: list[dict] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def unchanged_count(self) -> int:
+        return sum(len(v) for v in self.unchanged.values())
+
+
+class IncrementalPlanner:
+    """
+    Splits a project's files into changed/unchanged using the fingerprint table.
+    Size + mtime act as a fast path; content is only hashed when they differ.
+    """
+
+    def __init__(self, fingerprint_repo: FingerprintRepository):
+        self.repo = fingerprint_repo
+        self.analysis_version = compute_analysis_version()
+
+    def known(self, project_id: str) -> dict:
+        """Fingerprints recorded for the project (empty when incremental analysis is off)."""
+        return self.repo.get_for_project(project_id) if settings.incremental_analysis else {}
+
+    def classify(self, project_id: str, fpath: str, language: str, known: dict) -> tuple[str | None, dict | None]:
+        """
+        Decides one file without touching the database. Returns (prior run_id,
+        None) when its rules can be reused as is, (prior run_id, refreshed
+        fingerprint) when they can be reused but the stat fields changed, and
+        (None, fingerprint to persist once it is analyzed) otherwise.
+        Reads the whole file when size or mtime moved, so async callers
+        should run it on a worker thread.
+        """
+        try:
+            st = os.stat(fpath)
+        except OSError as e:
+            logger.warning(f"Cannot stat {fpath}: {e}")
+            return None, None
+
+        prev = known.get(fpath)
+        reusable = (
+            prev is not None
+            and prev.run_id is not None
+            and prev.language == language
+            and prev.analysis_version == self.analysis_version
+        )
+
+        # Fast path: identical size and mtime, no need to read the file
+        if reusable and prev.size == st.st_size and prev.mtime_ns == st.st_mtime_ns:
+            return str(prev.run_id), None
+
+        content_hash = hash_file(fpath)
+        fingerprint = {
+            "content_hash": content_hash,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "language": language,
+            "analysis_version": self.analysis_version,
+        }
+
+        if reusable and prev.content_hash == content_hash:
+            # Touched but not modified: reuse rules, the caller refreshes stat fields
+            return str(prev.run_id), fingerprint
+        return None, fingerprint
+
+    def plan(self, project_id: str, files: list[str], language: str) -> IncrementalPlan:
+        plan = IncrementalPlan()
+        known = self.known(project_id)
+
+        for fpath in files:
+            prev_run_id, fingerprint = self.classify(project_id, fpath, language, known)
+            if prev_run_id:
+                plan.unchanged[prev_run_id].append(fpath)
+                if fingerprint:
+                    plan.refreshed.append(refresh_row(project_id, fpath, fingerprint, prev_run_id))
+            else:
+                plan.changed.append(fpath)
+                if fingerprint:
+                    plan.pending[fpath] = fingerprint
+
+        live = set(files)
+        plan.removed = [p for p in known if p not in live]
+        return plan
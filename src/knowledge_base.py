@@ -1,37 +1,194 @@
-﻿from loguru import logger
+﻿import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from loguru import logger
+from src.config import settings
 from src.db.config import SessionLocal
-from src.db.repository import BusinessRuleRepository
+from src.db.repository import BusinessRuleRepository, FingerprintRepository, WorkItemRepository
+from src.db.async_repository import AsyncBusinessRuleRepository, AsyncFingerprintRepository, AsyncWorkItemRepository
+from src.rule_sink import PendingFile, RuleSink
 
 class KnowledgeBaseManager:
+    """
+    Phase 3 persistence: rules, fingerprints and work-item checkpoints.
+
+    Results go through a write-behind RuleSink: rules of many files are
+    bulk-loaded with COPY and their fingerprints and DONE checkpoints written
+    in the same transaction. With settings.async_db_enabled each batch runs
+    on its own async session, so DB latency overlaps with in-flight LLM
+    calls; otherwise the synchronous session below is used, only ever from
+    one dedicated thread so its I/O stays off the event loop.
+    Call close() at shutdown to flush the tail of the buffer.
+    """
+
     def __init__(self):
         self.session = SessionLocal()
         self.repo = BusinessRuleRepository(self.session)
+        self.fingerprint_repo = FingerprintRepository(self.session)
+        self.work_repo = WorkItemRepository(self.session)
+
+        self.unit_of_work = None
+        self._db_thread = None
+        if settings.async_db_enabled:
+            from src.db.async_config import unit_of_work
+            self.unit_of_work = unit_of_work
+        else:
+            # Sessions are not thread-safe: every sync DB call goes through this one thread, in order
+            self._db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-db")
+
+        self.sink = RuleSink(
+            self._write_batch, self._on_write_failed,
+            flush_rows=settings.rule_sink_flush_rows,
+            flush_interval=settings.rule_sink_flush_seconds,
+            max_pending_rows=settings.rule_sink_max_pending_rows,
+        )
 
-    # UPDATED SIGNATURE: Added run_id parameter
-    async def store_findings(self, result: dict, run_id: str):
+        # Latest unwritten progress per (run_id, file_path) and its writer task
+        self._progress: dict[tuple, tuple] = {}
+        self._progress_writers: dict[tuple, asyncio.Task] = {}
+
+    async def submit_result(self, result: dict, run_id: str, project_id: str,
+                            fingerprint: Optional[dict]) -> asyncio.Future:
         """
-        Parses the result from the Orchestrator/LLM and saves it to DB
-        linked to the specific run_id.
+        Queues a successful file result (rules, fingerprint, DONE checkpoint)
+        and returns a future that resolves to True once it is written, or False
+        after the work item was marked FAILED. Waits while the sink is full.
         """
         file_path = result.get("file_path")
-        findings = result.get("findings", {})
-        rules = findings.get("business_rules", [])
-        
-        if not rules:
-            return
+        await self._progress_written(run_id, file_path)
+        return await self.sink.submit(PendingFile(run_id, file_path, self._rules_of(result), project_id, fingerprint))
+
+    async def flush(self):
+        """Writes every result submitted so far."""
+        await self.sink.flush()
 
+    async def close(self):
+        """Flushes buffered results; call once analysis is finished."""
+        await self.sink.close()
+        self.sink.log_stats()
+
+    async def _write_batch(self, batch: List[PendingFile]):
+        rules = [
+            {
+                "rule_id": uuid.uuid4(),
+                "run_id": item.run_id,
+                "file_path": item.file_path,
+                "title": r.get("title", "Untitled"),
+                "description": r.get("description", ""),
+                "code_snippet": r.get("code_snippet", ""),
+            }
+            for item in batch for r in item.rules if isinstance(r, dict)
+        ]
+        # Last one wins; ON CONFLICT cannot touch the same row twice in one statement
+        fingerprints = list({
+            (item.project_id, item.file_path): {
+                "project_id": item.project_id, "file_path": item.file_path, "run_id": item.run_id, **item.fingerprint
+            }
+            for item in batch if item.fingerprint
+        }.values())
+        done = [(item.run_id, item.file_path) for item in batch]
+
+        if self.unit_of_work:
+            # One transaction: a file is never DONE without its rules
+            async with self.unit_of_work() as session:
+                await AsyncBusinessRuleRepository(session).copy_rules(rules)
+                await AsyncFingerprintRepository(session).upsert_many(fingerprints)
+                await AsyncWorkItemRepository(session).mark_done_many(done)
+        else:
+            await self._in_db_thread(self._write_batch_sync, rules, fingerprints, done)
+
+        saved = sum(1 for item in batch if item.rules)
+        logger.info(f"Saved {len(rules)} rules for {saved} files")
+
+    def _write_batch_sync(self, rules: list, fingerprints: list, done: list):
+        # Same guarantee on the sync session: one commit for all three writes
         try:
-            # Inject file_path into each rule before saving
-            for r in rules:
-                r["file_path"] = file_path
-            
-            # DIRECT SAVE: No more querying for the "latest" run
-            self.repo.bulk_insert_rules(rules, run_id)
-            logger.info(f"Saved {len(rules)} rules for {file_path}")
+            self.repo.copy_rules(rules)
+            self.fingerprint_repo.upsert_many(fingerprints, commit=False)
+            self.work_repo.mark_done_many(done, commit=False)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+    async def _in_db_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db_thread, fn, *args)
+
+    async def _on_write_failed(self, item: PendingFile):
+        await self.mark_failed(item.run_id, item.file_path, "Failed to save rules")
 
-        except Exception as e:
-            logger.error(f"Failed to save rules for {file_path}: {e}")
+    async def mark_failed(self, run_id: str, file_path: str, error: Optional[str]):
+        await self._progress_written(run_id, file_path)
+        if not self.unit_of_work:
+            await self._in_db_thread(self.work_repo.mark_failed, run_id, file_path, error)
+            return
+        async with self.unit_of_work() as session:
+            await AsyncWorkItemRepository(session).mark_failed(run_id, file_path, error)
+
+    async def update_run_status(self, run_id: str, status: str):
+        if not self.unit_of_work:
+            await self._in_db_thread(self.repo.update_run_status, run_id, status)
+            return
+        async with self.unit_of_work() as session:
+            await AsyncBusinessRuleRepository(session).update_run_status(run_id, status)
+
+    def progress_callback(self, run_id: str, file_path: str) -> Callable[[int, int], None]:
+        """
+        on_progress hook for RepoMCPServer. In async mode the write happens in a
+        background task; bursts of updates for one file collapse into the latest.
+        In sync mode it is queued on the DB thread (ahead of the file's later
+        DONE/FAILED write). Checkpoint write failures never fail the analysis.
+        """
+        if not self.unit_of_work:
+            write = self.work_repo.progress_callback(run_id, file_path)
+            return lambda chunks_done, chunks_total: self._db_thread.submit(write, chunks_done, chunks_total)
+
+        key = (run_id, file_path)
+
+        def on_progress(chunks_done: int, chunks_total: int):
+            pending = self._progress.get(key)
+            starting = chunks_done == 0 or (pending is not None and pending[2])
+            self._progress[key] = (chunks_done, chunks_total, starting)
+            if key not in self._progress_writers:
+                self._progress_writers[key] = asyncio.ensure_future(self._write_progress(key))
+        return on_progress
+
+    async def _write_progress(self, key: tuple):
+        run_id, file_path = key
+        while True:
+            state = self._progress.pop(key, None)
+            if state is None:
+                # No await between the empty check and this, so no update is missed
+                self._progress_writers.pop(key, None)
+                return
+            chunks_done, chunks_total, starting = state
+            try:
+                async with self.unit_of_work() as session:
+                    repo = AsyncWorkItemRepository(session)
+                    if starting:
+                        await repo.start(run_id, file_path, chunks_total)
+                    if chunks_done:
+                        await repo.chunk_progress(run_id, file_path, chunks_done)
+            except Exception as e:
+                logger.warning(f"Could not checkpoint progress for {file_path}: {e}")
+
+    async def _progress_written(self, run_id: str, file_path: str):
+        writer = self._progress_writers.get((run_id, file_path))
+        if writer:
+            await writer
+
+    @staticmethod
+    def _rules_of(result: dict) -> list:
+        file_path = result.get("file_path")
+        rules = result.get("findings", {}).get("business_rules", [])
+        # Inject file_path into each rule before saving
+        for r in rules:
+            r["file_path"] = file_path
+        return rules
 
     def __del__(self):
+        if getattr(self, '_db_thread', None):
+            self._db_thread.shutdown(wait=True)
         if hasattr(self, 'session'):
             self.session.close()
\ No newline at end of file
@@ -1,10 +1,22 @@
 ﻿from src.config import settings
 from src.llm.gemini import GeminiClient
+from src.llm.gemini_http import GeminiHTTPClient
+from src.llm.ollama import OllamaClient
+from src.llm.router import LLMRouter, load_backends
 from loguru import logger
 import os
 
-def get_llm_client():
+def get_llm_client(model_name: str | None = None):
+    """model_name overrides settings.model_name for Gemini (the cascade's fast tier)."""
+    # Several backends/API keys configured: route between them
+    backends = load_backends(settings.llm_backends_config, model_name)
+    if backends:
+        return LLMRouter(backends)
+
+    if settings.llm_provider == "ollama":
+        return OllamaClient()
     if not os.getenv("GOOGLE_API_KEY"):
         raise ValueError("Please set GOOGLE_API_KEY (get it from https://aistudio.google.com/app/apikey)")
-    logger.info("Gemini 2.5 Pro initialized successfully")
-    return GeminiClient()
+    if settings.llm_transport == "http":
+        return GeminiHTTPClient(model_name=model_name)
+    return GeminiClient(model_name=model_name)
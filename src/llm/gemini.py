@@ -3,9 +3,10 @@ import asyncio
 import google.generativeai as genai
 from loguru import logger
 from src.config import settings
+from src.token_budget import token_estimator
 
 class GeminiClient:
-    def __init__(self):
+    def __init__(self, model_name: str | None = None):
         try:
             #api_key = os.getenv("GOOGLE_API_KEY")
             api_key = settings.google_api_key
@@ -13,17 +14,18 @@ class GeminiClient:
                 raise ValueError("GOOGLE_API_KEY not set! Get it from: https://aistudio.google.com/app/apikey")
 
             genai.configure(api_key=api_key)
+            self.model_name = model_name or settings.model_name
 
             # CRITICAL: JSON mode + low temp MUST be set at model creation
             self.model = genai.GenerativeModel(
-                model_name=settings.model_name,  # respects config (gemini-3-pro-preview!)
+                model_name=self.model_name,  # respects config (gemini-3-pro-preview!)
                 generation_config=genai.types.GenerationConfig(
                     temperature=settings.temperature,  # 0.1 from config
                     max_output_tokens=settings.max_tokens,
                     response_mime_type="application/json",  # ← THIS IS REQUIRED!
                 )
             )
-            logger.info(f"Gemini initialized: {settings.model_name} | JSON mode: ON | Temp: {settings.temperature}")
+            logger.info(f"Gemini initialized: {self.model_name} | JSON mode: ON | Temp: {settings.temperature}")
         except Exception as e:
             logger.error(f"Gemini initialization failed: {e}")
             raise
@@ -48,6 +50,10 @@ class GeminiClient:
                 content,
                 generation_config=gen_config
             )
+            # Real prompt size from the provider keeps the local estimator calibrated
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                token_estimator.observe(content, getattr(usage, "prompt_token_count", 0))
             return response.text.strip()
 
         except Exception as e:
@@ -0,0 +1,112 @@
+# src/llm/gemini_http.py
+import asyncio
+import httpx
+from loguru import logger
+from src.config import settings
+from src.exceptions import LLMError
+from src.llm.base import LLMClient
+from src.token_budget import token_estimator
+
+
+class GeminiHTTPClient(LLMClient):
+    """
+    Native async Gemini client (generateContent REST endpoint over httpx).
+
+    Calls are plain coroutines on one pooled, keep-alive connection pool, so
+    hundreds can be in flight from a single process without tying up an OS
+    thread each (the SDK client runs every call in asyncio.to_thread).
+    In-flight calls are capped at llm_http_max_connections; each call gets
+    llm_request_timeout_seconds. gemini_api_base can point at a local
+    stand-in server (see fake_gemini_server.py).
+    """
+
+    def __init__(self, model_name: str | None = None, api_key: str | None = None, base_url: str | None = None,
+                 max_connections: int | None = None, timeout: float | None = None):
+        # Defaults come from settings; LLMRouter passes per-backend values
+        api_key = api_key or settings.google_api_key
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not set! Get it from: https://aistudio.google.com/app/apikey")
+
+        self.model_name = model_name or settings.model_name
+        self.base_url = base_url or settings.gemini_api_base
+        self.max_connections = max_connections or settings.llm_http_max_connections
+        self.timeout = timeout or settings.llm_request_timeout_seconds
+        self._headers = {"x-goog-api-key": api_key, "Content-Type": "application/json"}
+        self._path = f"/v1beta/models/{self.model_name}:generateContent"
+        self._client: httpx.AsyncClient | None = None
+        self._slots: asyncio.Semaphore | None = None
+        logger.info(
+            f"Gemini initialized: {self.model_name} | async HTTP ({self.base_url}) | "
+            f"{self.max_connections} connections | Temp: {settings.temperature}"
+        )
+
+    def _session(self) -> httpx.AsyncClient:
+        # Created lazily so the pool belongs to the event loop that uses it
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._headers,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 10.0)),
+            )
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._client
+
+    def _body(self, prompt: str, system: str | None, response_format) -> dict:
+        body = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "temperature": settings.temperature,
+                "maxOutputTokens": settings.max_tokens,
+                "responseMimeType": "text/plain" if response_format == "text" else "application/json",
+            },
+        }
+        if system:
+            body["systemInstruction"] = {"parts": [{"text": system}]}
+        return body
+
+    async def complete(self, prompt: str, system: str | None = None, response_format=None) -> str:
+        client = self._session()
+        try:
+            # Waiting for a slot is not part of the call's timeout
+            async with self._slots:
+                response = await client.post(self._path, json=self._body(prompt, system, response_format))
+        except httpx.TimeoutException as e:
+            logger.error(f"Gemini call timed out after {self.timeout:g}s")
+            raise LLMError(f"Gemini request timed out after {self.timeout:g}s ({type(e).__name__})") from e
+        except httpx.HTTPError as e:
+            logger.error(f"Gemini call failed: {e}")
+            raise LLMError(f"Gemini request failed: {type(e).__name__}: {e}") from e
+
+        if response.status_code != 200:
+            # Keeps the status and the server's message (retry_async reads "429" / "retry in Ns")
+            logger.error(f"Gemini call failed: HTTP {response.status_code}")
+            raise LLMError(f"Gemini HTTP {response.status_code}: {response.text[:500]}")
+
+        data = response.json()
+        usage = data.get("usageMetadata") or {}
+        if usage.get("promptTokenCount"):
+            # Real prompt size from the provider keeps the local estimator calibrated
+            token_estimator.observe([system, prompt], usage["promptTokenCount"])
+        return self._text(data).strip()
+
+    @staticmethod
+    def _text(data: dict) -> str:
+        candidates = data.get("candidates") or []
+        if not candidates:
+            reason = (data.get("promptFeedback") or {}).get("blockReason", "no candidates")
+            raise LLMError(f"Gemini returned no text ({reason})")
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        text = "".join(p.get("text", "") for p in parts)
+        if not text:
+            raise LLMError(f"Gemini returned no text (finishReason {candidates[0].get('finishReason')})")
+        return text
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
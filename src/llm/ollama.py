@@ -0,0 +1,70 @@
+# src/llm/ollama.py
+import httpx
+from loguru import logger
+from src.config import settings
+from src.exceptions import LLMError
+from src.llm.base import LLMClient
+
+
+class OllamaClient(LLMClient):
+    """
+    Local Ollama server (/api/chat, non-streaming), async over httpx.
+
+    No API key or quota: throughput is bounded by the local GPU, so callers
+    should keep its concurrency low (Ollama queues the rest itself).
+    """
+
+    def __init__(self, model_name: str | None = None, base_url: str | None = None,
+                 max_connections: int | None = None, timeout: float | None = None):
+        self.model_name = model_name or settings.ollama_model
+        self.base_url = base_url or settings.ollama_base_url
+        self.max_connections = max_connections or 8
+        self.timeout = timeout or settings.llm_request_timeout_seconds
+        self._client: httpx.AsyncClient | None = None
+        logger.info(f"Ollama initialized: {self.model_name} | {self.base_url} | Temp: {settings.temperature}")
+
+    def _session(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 10.0)),
+            )
+        return self._client
+
+    async def complete(self, prompt: str, system: str | None = None, response_format=None) -> str:
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        body = {
+            "model": self.model_name,
+            "messages": messages,
+            "stream": False,
+            "options": {"temperature": settings.temperature, "num_predict": settings.max_tokens},
+        }
+        if response_format != "text":
+            body["format"] = "json"
+
+        try:
+            response = await self._session().post("/api/chat", json=body)
+        except httpx.TimeoutException as e:
+            logger.error(f"Ollama call timed out after {self.timeout:g}s")
+            raise LLMError(f"Ollama request timed out after {self.timeout:g}s ({type(e).__name__})") from e
+        except httpx.HTTPError as e:
+            logger.error(f"Ollama call failed: {e}")
+            raise LLMError(f"Ollama request failed: {type(e).__name__}: {e}") from e
+
+        if response.status_code != 200:
+            logger.error(f"Ollama call failed: HTTP {response.status_code}")
+            raise LLMError(f"Ollama HTTP {response.status_code}: {response.text[:500]}")
+
+        text = (response.json().get("message") or {}).get("content", "")
+        if not text:
+            raise LLMError("Ollama returned no text")
+        return text.strip()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
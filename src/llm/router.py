@@ -0,0 +1,199 @@
+# src/llm/router.py
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+import yaml
+from loguru import logger
+from src.config import settings
+from src.exceptions import LLMError
+from src.llm.base import LLMClient
+from src.llm.gemini_http import GeminiHTTPClient
+from src.llm.ollama import OllamaClient
+from src.rate_limiter import RateLimiter
+from src.token_budget import token_estimator
+from src.utils import is_rate_limit_error, requested_retry_delay
+
+
+@dataclass
+class BackendStats:
+    calls: int = 0
+    failures: int = 0
+    throttled: int = 0
+    seconds: float = 0.0
+
+
+class Backend:
+    """One LLM endpoint + API key with its own concurrency slots and quota buckets."""
+
+    def __init__(self, name: str, client, weight: float = 1.0, max_concurrent: int = 8,
+                 requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.name = name
+        self.client = client
+        self.weight = max(weight, 0.01)
+        self.max_concurrent = max_concurrent
+        self.slots = asyncio.Semaphore(max_concurrent)
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.in_flight = 0  # Routed here, waiting for quota/slot or running
+        self.cooldown_until = 0.0
+        self.stats = BackendStats()
+
+    def rank(self, tokens: int) -> tuple:
+        """Sort key: backends that can start now first, then least loaded relative to weight."""
+        quota_wait = self.limiter.wait_estimate(tokens)
+        busy = quota_wait > 0 or self.in_flight >= self.max_concurrent
+        return busy, quota_wait, (self.in_flight + 1) / self.weight
+
+    @property
+    def cooling_down(self) -> bool:
+        return self.cooldown_until > time.monotonic()
+
+    def cool_down(self, seconds: float):
+        self.stats.throttled += 1
+        if not self.cooling_down:
+            logger.warning(f"LLM backend {self.name} throttled; routing around it for {seconds:.0f}s")
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+
+    async def complete(self, prompt: str, system: str | None, response_format, tokens: int) -> str:
+        # in_flight was taken by the router when it picked this backend
+        try:
+            await self.limiter.acquire(tokens)
+            async with self.slots:
+                if self.cooling_down:
+                    # Benched while this call was queued here: let the router move it
+                    raise LLMError(f"LLM backend {self.name} is cooling down after a 429")
+                start = time.perf_counter()
+                try:
+                    return await self.client.complete(prompt=prompt, system=system, response_format=response_format)
+                except Exception:
+                    self.stats.failures += 1
+                    raise
+                finally:
+                    self.stats.calls += 1
+                    self.stats.seconds += time.perf_counter() - start
+        finally:
+            self.in_flight -= 1
+
+
+class LLMRouter(LLMClient):
+    """
+    Spreads LLM calls over several backends (providers, API keys, local servers).
+
+    Each call goes to the backend that can start it soonest, by weighted
+    load: with equal latency, traffic splits in proportion to `weight`. Every
+    backend enforces its own concurrency and requests/tokens-per-minute
+    budget, so quota is per key rather than process-wide (`manages_quota`
+    tells RepoMCPServer to skip the global limiter). A throttled backend
+    (429 / quota exhausted) is benched for its requested retry delay and the
+    call fails over to the next backend. Any other error also fails over;
+    once every backend has failed the last error is raised, and the caller's
+    retry_async backs off as usual.
+    """
+    manages_quota = True
+
+    def __init__(self, backends: List[Backend]):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = backends
+        logger.info("LLM router: " + ", ".join(
+            f"{b.name} (weight {b.weight:g}, {b.max_concurrent} slots)" for b in backends))
+
+    @property
+    def model_name(self) -> str:
+        """Every model a call may be routed to; any of them can answer, so cached answers are keyed on all."""
+        return "|".join(sorted({b.client.model_name for b in self.backends}))
+
+    async def complete(self, prompt: str, system: str | None = None, response_format=None) -> str:
+        tokens = token_estimator.count_all([prompt, system])
+        tried = set()
+        last_exc = None
+        while len(tried) < len(self.backends):
+            backend = await self._pick(tokens, tried)
+            tried.add(backend)
+            try:
+                return await backend.complete(prompt, system, response_format, tokens)
+            except Exception as e:
+                last_exc = e
+                if is_rate_limit_error(e) and not backend.cooling_down:
+                    backend.cool_down(requested_retry_delay(e) or settings.llm_backend_cooldown_seconds)
+                if len(tried) < len(self.backends):
+                    logger.warning(f"LLM backend {backend.name} failed ({str(e)[:200]}); failing over")
+        raise last_exc
+
+    async def _pick(self, tokens: int, tried: set) -> Backend:
+        while True:
+            candidates = [b for b in self.backends if b not in tried]
+            now = time.monotonic()
+            ready = [b for b in candidates if not b.cooling_down]
+            if ready:
+                backend = min(ready, key=lambda b: b.rank(tokens))
+                backend.in_flight += 1  # Taken before any await, so concurrent picks see it
+                return backend
+            # Every remaining backend is benched: wait for the first to come back
+            await asyncio.sleep(min(b.cooldown_until for b in candidates) - now)
+
+    def log_stats(self):
+        for b in self.backends:
+            s = b.stats
+            avg = s.seconds / s.calls if s.calls else 0.0
+            logger.info(
+                f"LLM backend {b.name}: {s.calls} calls ({avg:.1f}s avg), "
+                f"{s.failures} failed, {s.throttled} throttled"
+            )
+
+    async def aclose(self):
+        for b in self.backends:
+            close = getattr(b.client, "aclose", None)
+            if close:
+                await close()
+
+
+def _build_client(spec: dict):
+    provider = spec.get("provider", "gemini")
+    common = {
+        "model_name": spec.get("model"),
+        "base_url": spec.get("base_url"),
+        "max_connections": spec.get("max_concurrent"),
+        "timeout": spec.get("timeout_seconds"),
+    }
+    if provider == "gemini":
+        # Keys stay in the environment; the YAML only names the variable
+        key_env = spec.get("api_key_env", "GOOGLE_API_KEY")
+        api_key = os.getenv(key_env)
+        if not api_key:
+            raise ValueError(f"LLM backend {spec.get('name')}: environment variable {key_env} is not set")
+        return GeminiHTTPClient(api_key=api_key, **common)
+    if provider == "ollama":
+        return OllamaClient(**common)
+    raise ValueError(f"LLM backend {spec.get('name')}: provider '{provider}' is not supported (gemini, ollama)")
+
+
+def load_backends(path: Path, model_name: str | None = None) -> List[Backend]:
+    """
+    Backends from config/llm_backends.yaml ([] when the file is missing or lists none).
+    model_name replaces the model of every Gemini backend (local backends keep theirs).
+    """
+    try:
+        with open(path) as f:
+            config_data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return []
+
+    backends = []
+    for i, spec in enumerate(config_data.get("backends") or []):
+        if not spec.get("enabled", True):
+            continue
+        spec.setdefault("name", f"{spec.get('provider', 'gemini')}-{i}")
+        if model_name and spec.get("provider", "gemini") == "gemini":
+            spec = {**spec, "model": model_name, "name": f"{spec['name']}/{model_name}"}
+        backends.append(Backend(
+            name=spec["name"],
+            client=_build_client(spec),
+            weight=float(spec.get("weight", 1.0)),
+            max_concurrent=int(spec.get("max_concurrent", 8)),
+            requests_per_minute=int(spec.get("requests_per_minute", 0)),
+            tokens_per_minute=int(spec.get("tokens_per_minute", 0)),
+        ))
+    return backends
@@ -0,0 +1,186 @@
+# src/llm_cache.py
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from loguru import logger
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LLMResponseCache:
+    """
+    Persistent, content-addressed cache for LLM responses.
+
+    Entries are keyed by a SHA-256 of everything that influences the answer
+    (model, temperature, system prompt, response format and the fully rendered
+    prompt, which already contains the code chunk and project context).
+    Backed by a single SQLite file so it survives between runs.
+
+    Lookups only read: LRU access times are buffered in memory and written
+    in one statement on the next put, eviction or flush() (or once
+    TOUCH_BATCH hits are pending). The *_async methods run the SQLite I/O
+    on a worker thread; a lock serialises use of the shared connection.
+    """
+
+    EVICT_EVERY_N_WRITES = 200
+    TOUCH_BATCH = 500
+
+    def __init__(self, path: Path, max_bytes: int, max_age_seconds: float):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.stats = CacheStats()
+        self._writes_since_evict = 0
+        self._touched: dict[str, float] = {}  # key -> last hit, not yet written
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, system: str | None = None,
+                 response_format: str | None = None, temperature: float | None = None) -> str:
+        h = hashlib.sha256()
+        for part in (model, str(temperature), system or "", str(response_format), prompt):
+            # Length-prefix each part so ("ab", "c") and ("a", "bc") never collide
+            encoded = part.encode("utf-8")
+            h.update(len(encoded).to_bytes(8, "little"))
+            h.update(encoded)
+        return h.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (self.max_age_seconds and now - row[1] > self.max_age_seconds):
+                self.stats.misses += 1
+                return None
+
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._write_touches()
+                self._conn.commit()
+            self.stats.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        with self._lock:
+            self._touched.pop(key, None)
+            self._write_touches()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self.stats.writes += 1
+
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= self.EVICT_EVERY_N_WRITES:
+                self._evict()
+
+    async def get_async(self, key: str) -> str | None:
+        return await asyncio.to_thread(self.get, key)
+
+    async def put_async(self, key: str, response: str):
+        await asyncio.to_thread(self.put, key, response)
+
+    def flush(self):
+        """Writes buffered access times."""
+        with self._lock:
+            if self._touched:
+                self._write_touches()
+                self._conn.commit()
+
+    def _write_touches(self):
+        # Caller holds the lock and commits
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def evict(self):
+        """
+        Drops expired entries, then least-recently-used entries until the
+        cache fits in max_bytes.
+        """
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        self._write_touches()  # LRU order must see the buffered hits
+        self._writes_since_evict = 0
+        removed = 0
+
+        # 1. Age-based eviction
+        if self.max_age_seconds:
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+            )
+            removed += cur.rowcount
+
+        # 2. Size-based eviction (LRU)
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if self.max_bytes and total > self.max_bytes:
+            excess = total - self.max_bytes
+            victims = []
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                victims.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            removed += len(victims)
+
+        self._conn.commit()
+        if removed:
+            self.stats.evictions += removed
+            logger.debug(f"LLM cache evicted {removed} entries")
+
+    def log_stats(self):
+        s = self.stats
+        logger.info(
+            f"LLM cache: {s.hits} hits / {s.misses} misses ({s.hit_rate:.1%} hit rate), "
+            f"{s.writes} writes, {s.evictions} evictions"
+        )
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
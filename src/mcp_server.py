@@ -1,6 +1,11 @@
 # src/mcp_server.py
+import asyncio
+import contextlib
 import json
 import math
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Optional
 from src.llm.factory import get_llm_client
 from src.repo_manager import RepoManager
 from src.prompts import render_prompt
@@ -8,72 +13,169 @@ from src.exceptions import ParseError, LLMError
 from src.utils import retry_async
 from loguru import logger
 from src.chunking import UniversalChunker
+from src.config import settings
+from src.llm_cache import LLMResponseCache
+from src.rate_limiter import rate_limiter, fast_rate_limiter
+from src.parse_artifacts import ParseArtifactStore
+from src.chunk_packing import ChunkPacker, ChunkPack, CrossFilePacker
+from src.token_budget import PromptBudget, PromptPart, token_estimator
+from src.triage import TriageStats, is_trivial
+from src.cascade import FAST, MAIN, CascadeStats, escalation_reason
 
 class RepoMCPServer:
-    def __init__(self, repo_manager: RepoManager):
+    def __init__(self, repo_manager: RepoManager, artifacts: ParseArtifactStore | None = None):
         self.repo_manager = repo_manager
+        self.artifacts = artifacts
         self.llm = get_llm_client()
 
+        # Model cascade: the fast tier answers extraction prompts first, the main model only escalations
+        self.fast_llm = get_llm_client(settings.cascade_model_name) if settings.cascade_mode != "off" else None
+        self.cascade_stats = CascadeStats()
+
+        # Global LLM concurrency limit. Shared by every chunk of every file so a
+        # single large file can fan out without exceeding max_concurrent_jobs.
+        # Not applied to a multi-backend router: its per-backend slots are the limit.
+        self.llm_slots = asyncio.Semaphore(settings.max_concurrent_jobs)
+
+        # Content-addressed response cache (skips calls we already paid for)
+        self.cache = None
+        if settings.llm_cache_enabled:
+            self.cache = LLMResponseCache(
+                settings.llm_cache_path,
+                max_bytes=settings.llm_cache_max_mb * 1024 * 1024,
+                max_age_seconds=settings.llm_cache_max_age_days * 86400,
+            )
+
+        # Small-chunk packing (one prompt for many getters/short methods)
+        self.packer = ChunkPacker(settings.pack_token_budget, settings.pack_small_chunk_tokens)
+        self.cross_file_packer = CrossFilePacker(self.packer, self._extract_group_pack, settings.pack_linger_seconds)
+        self.packing_stats = {"packed_chunks": 0, "packed_calls": 0}
+        self.triage_stats: Dict[str, TriageStats] = defaultdict(TriageStats)  # Per project
+
+        # Extraction prompts are fitted to this many input tokens (graph context goes first)
+        self.prompt_budget = PromptBudget(settings.prompt_token_budget)
+
+    SYSTEM_PROMPT = "You are an expert reverse engineer. Return ONLY valid JSON matching the schema."
+
     @retry_async(max_retries=3)
-    async def _call_llm_safe(self, prompt: str, system: str, response_format: str) -> str:
+    async def _call_llm_safe(self, prompt: str, system: str, response_format: str, tier: str = MAIN) -> str:
         """
         Executes LLM call with built-in retries for 429/RateLimits.
+        The concurrency slot is only held for the call itself, not for retry back-off.
+        tier=FAST sends it to the cascade's fast model (own quota).
         """
-        return await self.llm.complete(
-            prompt=prompt,
-            system=system,
-            response_format=response_format
-        )
+        llm = self.fast_llm if tier == FAST else self.llm
+        limiter = fast_rate_limiter if tier == FAST else rate_limiter
+
+        # Reserve quota up front instead of discovering it via 429s.
+        # A multi-backend router keeps a budget and concurrency slots per backend
+        # instead, so the global cap would only stop extra backends adding capacity.
+        routed = getattr(llm, "manages_quota", False)
+        if not routed:
+            await limiter.acquire(self.estimate_tokens(prompt, system))
+
+        async with contextlib.nullcontext() if routed else self.llm_slots:
+            return await llm.complete(
+                prompt=prompt,
+                system=system,
+                response_format=response_format
+            )
+
+    @staticmethod
+    def estimate_tokens(prompt: str, system: str | None = None) -> int:
+        return token_estimator.count_all([prompt, system])
+
+    async def _call_llm_cached(self, prompt: str, system: str, response_format: str, tier: str = MAIN) -> str:
+        """
+        Serves byte-identical requests from the on-disk cache, falling back to
+        _call_llm_safe. Only responses that parse are cached for JSON calls.
+        """
+        key = self._cache_key(prompt, system, response_format, tier)
+        if key:
+            cached = await self.cache.get_async(key)
+            if cached is not None:
+                return cached
+
+        raw = await self._call_llm_safe(prompt=prompt, system=system, response_format=response_format, tier=tier)
+        await self._cache_put(key, raw, response_format)
+        return raw
+
+    async def _call_llm_extraction(self, prompt: str, tier: str) -> str:
+        """
+        _call_llm_cached for an extraction prompt on one cascade tier. Calls that
+        reach the LLM and succeed are timed for that tier (retries included);
+        cache hits and failures are not.
+        """
+        key = self._cache_key(prompt, self.SYSTEM_PROMPT, "json", tier)
+        if key:
+            cached = await self.cache.get_async(key)
+            if cached is not None:
+                return cached
 
-    async def extract_business_rules_from_file(self, file_path: str, language: str = "python", context: str = "") -> dict:
+        start = time.perf_counter()
+        raw = await self._call_llm_safe(prompt=prompt, system=self.SYSTEM_PROMPT, response_format="json", tier=tier)
+        self.cascade_stats.record_call(tier, time.perf_counter() - start)
+        await self._cache_put(key, raw, "json")
+        return raw
+
+    def _cache_key(self, prompt: str, system: str, response_format: str, tier: str) -> Optional[str]:
+        if not self.cache:
+            return None
+        # The client's models, not settings.model_name: Ollama or a router may answer with others
+        llm = self.fast_llm if tier == FAST else self.llm
+        return LLMResponseCache.make_key(llm.model_name, prompt, system, response_format, settings.temperature)
+
+    async def _cache_put(self, key: Optional[str], raw: str, response_format: str):
+        if not key:
+            return
+        if response_format == "json":
+            try:
+                json.loads(raw)
+            except json.JSONDecodeError:
+                return  # Don't pin a bad answer in the cache
+        await self.cache.put_async(key, raw)
+
+    async def extract_business_rules_from_file(self, file_path: str, language: str = "python", context: str = "",
+                                               project_id: str | None = None,
+                                               on_progress: Optional[Callable[[int, int], None]] = None) -> dict:
         """
         Analyzes a file for business rules.
         Uses sliding window chunking for large files and injects global context.
+        Chunks are processed concurrently (bounded by llm_slots, or the router's per-backend slots) and reassembled in order;
+        small chunks are packed into shared calls according to settings.chunk_packing.
+        on_progress(chunks_done, chunks_total) is called once up front and after every LLM job.
         """
         try:
-            full_code = self.repo_manager.read_file(file_path)
-            
-            # Initialize Universal Chunker
-            chunker = UniversalChunker(full_code, language_id=language)
-            chunks = chunker.chunk()
-            
-            logger.info(f"Splitting {file_path} into {len(chunks)} chunks using {chunker.language_id} parser")
-
-            all_rules = []
-            
-            for i, code_chunk in enumerate(chunks):
-                # --- Fix D: Inject Global Context (project_structure) ---
-                prompt = render_prompt(
-                    "extract_business_rules", 
-                    language=language, 
-                    code=code_chunk, 
-                    project_structure=context
-                )
-
-                raw = await self._call_llm_safe(
-                    prompt=prompt,
-                    system="You are an expert reverse engineer. Return ONLY valid JSON matching the schema.",
-                    response_format="json"
-                )
+            # Reuse the chunk plan built during indexing when there is one
+            chunks = self.artifacts.load_chunks(file_path) if self.artifacts else None
+            if chunks is not None:
+                logger.info(f"Reusing parsed chunk plan for {file_path} ({len(chunks)} chunks)")
+            else:
+                with self.repo_manager.open_source(file_path) as source:
+                    # Initialize Universal Chunker
+                    chunker = UniversalChunker(source, language_id=language)
+                    chunks = chunker.chunk()
                 
-                # Parse results for this chunk
-                try:
-                    data = self._safe_parse_json(raw, f"{file_path} [chunk {i+1}]")
-                    
-                    # Handle list vs dict output normalization
-                    chunk_rules = []
-                    if isinstance(data, list):
-                        for item in data:
-                            if isinstance(item, dict):
-                                chunk_rules.extend(item.get("business_rules", []))
-                    elif isinstance(data, dict):
-                        chunk_rules = data.get("business_rules", [])
-                    
-                    all_rules.extend(chunk_rules)
-                    
-                except Exception as e:
-                    logger.error(f"Error parsing chunk {i+1} of {file_path}: {e}")
-                    # We continue to the next chunk rather than failing the whole file
+                logger.info(f"Splitting {file_path} into {len(chunks)} chunks using {chunker.language_id} parser")
+
+            # Each job covers some chunk indices and returns one rule list per index
+            jobs = self._plan_extraction_jobs(file_path, chunks, language, context, project_id)
+            if on_progress:
+                jobs = self._track_progress(jobs, len(chunks), on_progress)
+            results = await asyncio.gather(*[coro for _, coro in jobs], return_exceptions=True)
+
+            # Any failed LLM call fails the file (same as the serial behaviour),
+            # but only after sibling chunks have finished and been cached.
+            for r in results:
+                if isinstance(r, BaseException):
+                    raise r
+
+            per_chunk = [[] for _ in chunks]
+            for (indices, _), job_rules in zip(jobs, results):
+                for i, chunk_rules in zip(indices, job_rules):
+                    per_chunk[i] = chunk_rules
+
+            all_rules = [rule for chunk_rules in per_chunk for rule in chunk_rules]
 
             logger.info(f"Successfully extracted {len(all_rules)} rules total from {file_path}")
             
@@ -93,6 +195,200 @@ class RepoMCPServer:
             logger.exception(f"Unexpected error analyzing {file_path}: {e}")
             return {"file_path": file_path, "status": "error", "error": str(e)}
 
+    def _plan_extraction_jobs(self, file_path: str, chunks: list, language: str, context: str, project_id: str | None) -> list:
+        """
+        Splits a file's chunks into LLM jobs: large chunks get their own call,
+        small ones are packed (per file, or per project via the cross-file packer).
+        Trivial chunks (see src/triage.py) are skipped or packed per settings.triage_mode.
+        Returns [(chunk_indices, coroutine -> list of rule lists)]; skipped chunks are in no job.
+        """
+        async def single(i):
+            return [await self._extract_chunk(file_path, i, chunks[i], language, context)]
+
+        async def packed(pack: ChunkPack):
+            by_id = await self._extract_pack(pack, language)
+            return [by_id.get(item.chunk_id, []) for item in pack.items]
+
+        async def cross_file(i):
+            group = (project_id, language)
+            return [await self.cross_file_packer.submit(group, file_path, chunks[i], context)]
+
+        mode = settings.chunk_packing
+        to_cross_file = bool(mode == "project" and project_id)
+        small = {i for i, c in enumerate(chunks) if mode != "off" and self.packer.is_small(c)}
+        everything = list(range(len(chunks)))
+        baseline = self._group_chunks(file_path, chunks, context, everything, small, to_cross_file)
+
+        trivial = set()
+        if settings.triage_mode != "off":
+            trivial = {i for i, c in enumerate(chunks) if is_trivial(c, settings.triage_threshold)}
+        stats = self.triage_stats[project_id or "-"]
+        stats.chunks += len(chunks)
+        stats.trivial += len(trivial)
+
+        groups = baseline
+        if trivial and settings.triage_mode == "skip":
+            stats.skipped += len(trivial)
+            kept = [i for i in everything if i not in trivial]
+            groups = self._group_chunks(file_path, chunks, context, kept, small, to_cross_file)
+        elif trivial:
+            stats.batched += len(trivial - small)
+            groups = self._group_chunks(file_path, chunks, context, everything, small | trivial, to_cross_file)
+        stats.calls_without_triage += len(baseline)
+        stats.calls_planned += len(groups)
+
+        jobs = []
+        for indices, kind, pack in groups:
+            if kind == "pack":
+                jobs.append((indices, packed(pack)))
+            elif kind == "cross_file":
+                jobs.append((indices, cross_file(indices[0])))
+            else:
+                jobs.append((indices, single(indices[0])))
+        return jobs
+
+    def _group_chunks(self, file_path: str, chunks: list, context: str, indices: list, packable: set,
+                      to_cross_file: bool) -> list:
+        """Groups chunk indices into calls: [(indices, "single" | "pack" | "cross_file", pack)]."""
+        packed = [i for i in indices if i in packable]
+        groups = [([i], "single", None) for i in indices if i not in packable]
+
+        if to_cross_file:
+            groups += [([i], "cross_file", None) for i in packed]
+        elif packed:
+            offset = 0
+            for pack in self.packer.pack(file_path, [chunks[i] for i in packed], context):
+                group = packed[offset:offset + len(pack.items)]
+                offset += len(pack.items)
+                if len(group) == 1:
+                    # A pack of one is just a normal call (and shares its cache entry)
+                    groups.append((group, "single", None))
+                else:
+                    groups.append((group, "pack", pack))
+        return groups
+
+    @staticmethod
+    def _track_progress(jobs: list, total: int, on_progress: Callable[[int, int], None]) -> list:
+        # (0, total) is the start signal checkpoint hooks rely on; then chunks skipped by triage count as done
+        on_progress(0, total)
+        done = total - sum(len(indices) for indices, _ in jobs)
+        if done:
+            on_progress(done, total)
+
+        async def tracked(indices, coro):
+            nonlocal done
+            result = await coro
+            done += len(indices)
+            on_progress(done, total)
+            return result
+
+        return [(indices, tracked(indices, coro)) for indices, coro in jobs]
+
+    async def _extract_chunk(self, file_path: str, index: int, code_chunk, language: str, context: str) -> list:
+        """
+        Runs the extraction prompt for one chunk and returns its rules.
+        Graph context is trimmed before the import header, and both before the code itself.
+        """
+        if code_chunk.body_offset:
+            header, body = code_chunk.code[:code_chunk.body_offset].strip(), code_chunk.code[code_chunk.body_offset:]
+        else:
+            header, body = "", code_chunk.code
+
+        fixed = render_prompt("extract_business_rules", language=language, code="", project_structure="")
+        body, header, context = self.prompt_budget.fit([
+            PromptPart("code", body, priority=3),
+            PromptPart("imports", header, priority=2),
+            PromptPart("graph context", context, priority=1, separator="\n\n"),
+        ], reserved=token_estimator.count_all([fixed, self.SYSTEM_PROMPT]))
+        code = f"{header}\n\n{body}" if code_chunk.body_offset else body
+
+        # --- Fix D: Inject Global Context (project_structure) ---
+        prompt = render_prompt(
+            "extract_business_rules", 
+            language=language, 
+            code=code, 
+            project_structure=context
+        )
+
+        # Parse results for this chunk
+        return await self._extract_rules(prompt, f"{file_path} [chunk {index+1}]")
+
+    async def _extract_pack(self, pack: ChunkPack, language: str) -> dict:
+        """
+        Runs one prompt over several tagged chunks and routes the returned
+        rules back to their chunk IDs.
+        """
+        files = self._fit_pack_files(pack, language)
+        prompt = render_prompt("extract_business_rules_batch", language=language, files=files)
+        files = ", ".join(f["file_path"] for f in files)
+        rules = await self._extract_rules(prompt, f"{files} [pack of {len(pack.items)} chunks]")
+
+        self.packing_stats["packed_chunks"] += len(pack.items)
+        self.packing_stats["packed_calls"] += 1
+        return pack.split_rules(rules)
+
+    async def _extract_rules(self, prompt: str, label: str) -> list:
+        """
+        Runs an extraction prompt and returns its rules. With the cascade on, the
+        fast model answers first; the main model only redoes answers that
+        escalation_reason() rejects (a pack escalates as a whole).
+        """
+        if self.fast_llm is not None:
+            self.cascade_stats.drafts += 1
+            try:
+                draft = await self._call_llm_extraction(prompt, FAST)
+                reason = escalation_reason(draft, settings.cascade_mode, settings.cascade_min_confidence)
+            except Exception as e:
+                logger.warning(f"Fast model failed for {label}: {e}")
+                reason = "fast_error"
+            if reason is None:
+                return self._rules_from_response(draft, label)
+            self.cascade_stats.escalations[reason] += 1
+            logger.debug(f"Escalating {label} to {settings.model_name} ({reason})")
+
+        raw = await self._call_llm_extraction(prompt, MAIN)
+        return self._rules_from_response(raw, label)
+
+    def _fit_pack_files(self, pack: ChunkPack, language: str) -> list:
+        """
+        pack.files() with graph contexts (then import headers) trimmed to the prompt budget.
+        Chunk bodies are bounded by the packer and always kept.
+        """
+        files = pack.files()
+        bare = [{**f, "context": "", "header": ""} for f in files]
+        fixed = render_prompt("extract_business_rules_batch", language=language, files=bare)
+
+        parts = [PromptPart(f"imports of {f['file_path']}", f["header"], priority=2) for f in files]
+        parts += [PromptPart(f"graph context of {f['file_path']}", f["context"], priority=1, separator="\n\n")
+                  for f in files]
+        fitted = self.prompt_budget.fit(parts, reserved=token_estimator.count_all([fixed, self.SYSTEM_PROMPT]))
+
+        n = len(files)
+        return [{**f, "header": fitted[i], "context": fitted[n + i]} for i, f in enumerate(files)]
+
+    async def _extract_group_pack(self, group: tuple, pack: ChunkPack) -> dict:
+        _, language = group
+        return await self._extract_pack(pack, language)
+
+    def _rules_from_response(self, raw: str, label: str) -> list:
+        try:
+            data = self._safe_parse_json(raw, label)
+            
+            # Handle list vs dict output normalization
+            rules = []
+            if isinstance(data, list):
+                for item in data:
+                    if isinstance(item, dict):
+                        rules.extend(item.get("business_rules", []))
+            elif isinstance(data, dict):
+                rules = data.get("business_rules", [])
+            return rules
+            
+        except Exception as e:
+            logger.error(f"Error parsing {label}: {e}")
+            # We continue to the next chunk rather than failing the whole file
+            return []
+
     def _safe_parse_json(self, text: str, context: str) -> dict:
         try:
             return json.loads(text)
@@ -100,6 +396,10 @@ class RepoMCPServer:
             logger.warning(f"JSON parse failed for {context}: {e}\nRaw output:\n{text[:1000]}")
             return {"raw_output": text, "parse_error": str(e), "business_rules": []}
 
+    async def generate_text(self, prompt: str, system: str = "You are an expert technical writer.") -> str:
+        """Free-form Markdown generation (report sections); cached like extraction calls."""
+        return await self._call_llm_cached(prompt=prompt, system=system, response_format="text")
+
     async def generate_project_summary(self, context_data: dict) -> str:
         """
         Generates the final markdown report.
@@ -112,4 +412,11 @@ class RepoMCPServer:
             prompt=prompt,
             system="You are an expert technical writer.",
             response_format="text" # Return Raw Markdown
-        )
\ No newline at end of file
+        )
+
+    async def close(self):
+        """Releases the LLM clients' connection pools (HTTP transport)."""
+        for llm in (self.llm, self.fast_llm):
+            close = getattr(llm, "aclose", None)
+            if close:
+                await close()
@@ -0,0 +1,146 @@
+# src/module_index.py
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import PurePath
+from typing import Iterable, List
+
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs")
+
+
+@dataclass
+class ResolvedImport:
+    module: str
+    targets: List[str] = field(default_factory=list)
+    external: bool = False
+
+
+class ModuleIndex:
+    """
+    Per-project lookup from import strings to file paths, built once from the
+    discovered file list (no file reads).
+
+    Files are indexed by stem (module / class name) and by directory name, so
+    resolving an import is a dict hit plus a suffix check over the handful of
+    files sharing that name:
+      - Python dotted modules  `src.utils`          -> .../src/utils.py or .../src/utils/__init__.py
+      - Java classes/packages  `com.acme.Order(.*)` -> .../com/acme/Order.java or the files in .../com/acme/
+      - C# namespaces          `Shop.Core.Entities` -> the files in .../Core/Entities/
+      - JS relative paths      `../lib/api`         -> .../lib/api.js, .../lib/api/index.ts, ...
+    Anything that does not resolve to a project file is reported as external.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.normpath(root)
+        self._by_stem: dict[str, list[tuple[tuple[str, ...], str]]] = defaultdict(list)
+        self._by_dir: dict[str, list[tuple[str, ...]]] = defaultdict(list)
+        self._dir_files: dict[tuple[str, ...], list[str]] = defaultdict(list)
+        self._paths: dict[str, str] = {}  # normalized path -> path as discovered
+
+    @classmethod
+    def build(cls, root: str, files: Iterable[str]) -> "ModuleIndex":
+        index = cls(root)
+        for f in files:
+            index.add(f)
+        return index
+
+    def add(self, file_path: str):
+        norm = os.path.normpath(file_path)
+        self._paths[norm] = file_path
+
+        rel = PurePath(os.path.relpath(norm, self.root))
+        dir_parts = tuple(rel.parent.parts) if str(rel.parent) != "." else ()
+        stem = rel.stem
+
+        if stem == "__init__":
+            # A Python package is addressed by its directory name
+            if dir_parts:
+                self._by_stem[dir_parts[-1]].append((dir_parts, file_path))
+        else:
+            self._by_stem[stem].append((dir_parts + (stem,), file_path))
+
+        if dir_parts not in self._dir_files and dir_parts:
+            self._by_dir[dir_parts[-1]].append(dir_parts)
+        self._dir_files[dir_parts].append(file_path)
+
+    def resolve(self, module: str, source_file: str) -> ResolvedImport:
+        module = module.strip()
+        if module.endswith(".*"):
+            module = module[:-2]  # Java wildcard import: resolve the package
+        if not module:
+            return ResolvedImport(module, external=True)
+
+        # JS/TS: relative paths are project files, bare specifiers are packages
+        if source_file.lower().endswith(JS_EXTENSIONS):
+            targets = self._resolve_js(module, source_file)
+        elif module.startswith("."):
+            targets = self._resolve_python_relative(module, source_file)
+        else:
+            parts = tuple(p for p in module.split(".") if p)
+            targets = self._resolve_dotted(parts)
+            # Python imports name modules, never directories of files
+            if not targets and not source_file.lower().endswith(".py"):
+                targets = self._resolve_namespace(parts)
+
+        # A file importing its own namespace is internal, but yields no edge
+        external = not targets
+        targets = [t for t in targets if t != source_file]
+        return ResolvedImport(module, targets=targets, external=external)
+
+    # --- Resolution strategies ---
+
+    def _resolve_dotted(self, parts: tuple[str, ...]) -> list[str]:
+        """Module or class: the file whose path ends with the dotted name."""
+        matches = [f for path, f in self._by_stem.get(parts[-1], ()) if path[-len(parts):] == parts]
+        if matches:
+            return self._closest(matches)
+        # `from pkg.mod import Name` style imports of a member: drop the last part once
+        if len(parts) > 1:
+            return [f for path, f in self._by_stem.get(parts[-2], ()) if path[-(len(parts) - 1):] == parts[:-1]][:1]
+        return []
+
+    def _resolve_namespace(self, parts: tuple[str, ...]) -> list[str]:
+        """
+        Java package / C# namespace: every file in the directory matching the
+        longest suffix of the name. Namespaces often carry a company prefix that
+        is not on disk, so at least two trailing components must match
+        (or the whole name, if it is a single component).
+        """
+        best, best_len = None, 0
+        for dir_parts in self._by_dir.get(parts[-1], ()):
+            n = 0
+            while n < len(parts) and n < len(dir_parts) and dir_parts[-1 - n] == parts[-1 - n]:
+                n += 1
+            if n > best_len:
+                best, best_len = dir_parts, n
+        if best is None or best_len < min(2, len(parts)):
+            return []
+        return list(self._dir_files[best])
+
+    def _resolve_python_relative(self, module: str, source_file: str) -> list[str]:
+        level = len(module) - len(module.lstrip("."))
+        base = os.path.dirname(os.path.normpath(source_file))
+        for _ in range(level - 1):
+            base = os.path.dirname(base)
+        rest = module[level:].split(".") if module[level:] else []
+        target = os.path.join(base, *rest)
+        for candidate in (target + ".py", os.path.join(target, "__init__.py")):
+            if candidate in self._paths:
+                return [self._paths[candidate]]
+        return []
+
+    def _resolve_js(self, module: str, source_file: str) -> list[str]:
+        if not module.startswith("."):
+            return []  # node_modules / bare package specifier
+        target = os.path.normpath(os.path.join(os.path.dirname(source_file), module))
+        candidates = [target] + [target + ext for ext in JS_EXTENSIONS]
+        candidates += [os.path.join(target, "index" + ext) for ext in JS_EXTENSIONS]
+        for candidate in candidates:
+            if candidate in self._paths:
+                return [self._paths[candidate]]
+        return []
+
+    @staticmethod
+    def _closest(matches: list[str]) -> list[str]:
+        # Several files share the dotted suffix (e.g. duplicated modules): prefer the shortest path
+        return [min(matches, key=len)]
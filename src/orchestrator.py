@@ -1,7 +1,8 @@
 ﻿import asyncio
+import os
 import yaml
 import uuid
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from loguru import logger
 
 # Config & Core Modules
@@ -14,13 +15,131 @@ from src.exceptions import RepositoryError, LLMError
 
 # Database Layer
 from src.db.config import SessionLocal
-from src.db.repository import GraphRepository
+from src.db.repository import GraphRepository, FingerprintRepository, GraphBatchWriter, WorkItemRepository, BusinessRuleRepository
 from src.db.models import Project, AnalysisRun
 
 # Static Analysis (The Indexer)
 # Note: Ensure src/static_analysis.py exists with a StaticAnalyzer class
 from src.static_analysis import StaticAnalyzer 
 from src.reporting import ReportGenerator 
+from src.incremental import IncrementalPlanner
+from src.module_index import ModuleIndex
+from src.graph_snapshot import GraphSnapshot
+from src.parse_artifacts import ParseArtifactStore
+from src.parser_registry import parser_registry
+from src.rate_limiter import rate_limiter
+from src.embedding_stage import EmbeddingStage
+from src.pipeline import AnalysisPipeline, store_index_result
+
+def _open_artifact_store(repo_manager: RepoManager) -> ParseArtifactStore:
+    return ParseArtifactStore(
+        settings.parse_artifact_dir, repo_manager,
+        max_bytes=settings.parse_artifact_max_mb * 1024 * 1024,
+        max_age_seconds=settings.parse_artifact_max_age_days * 86400,
+    )
+
+def log_llm_stats(mcp_server: RepoMCPServer):
+    if mcp_server.cache:
+        mcp_server.cache.flush()  # Buffered LRU access times
+        mcp_server.cache.log_stats()
+    rate_limiter.log_stats()
+    if hasattr(mcp_server.llm, "log_stats"):
+        mcp_server.llm.log_stats()  # Per-backend calls/failovers (LLMRouter)
+    if mcp_server.packing_stats["packed_calls"]:
+        packed = mcp_server.packing_stats
+        logger.info(f"Chunk packing: {packed['packed_chunks']} small chunks sent in {packed['packed_calls']} calls")
+    for project_id, triage in mcp_server.triage_stats.items():
+        triage.log(project_id)
+    mcp_server.cascade_stats.log()  # Per-tier latency and escalation rate
+
+async def embed_missing(db_session):
+    """Embedding stage: backfills rule/summary vectors in large batches (never fails the run)."""
+    if not settings.embeddings_enabled:
+        return
+    logger.info("--- EMBEDDINGS ---")
+    try:
+        await EmbeddingStage(db_session).run()
+    except Exception as e:
+        logger.error(f"Embedding stage failed (rows stay NULL and are retried next run): {e}")
+
+async def generate_reports(active_runs: List[Tuple[str, str]], kb_manager: KnowledgeBaseManager,
+                           report_generator: ReportGenerator):
+    """PHASE 4: one report per run, scoped to the run's analyzed and carried-forward files
+    (its work items, joined in SQL). Runs are reported concurrently (report_concurrent_projects at a time)."""
+    for _, rid in active_runs:
+        await kb_manager.update_run_status(rid, "REPORTING")
+
+    logger.info("--- PHASE 4: REPORT GENERATION ---")
+    slots = asyncio.Semaphore(settings.report_concurrent_projects)
+
+    async def report_run(proj_name: str, rid: str):
+        async with slots:
+            try:
+                # Centralized, safe report generation
+                await report_generator.generate_report_safe(rid, proj_name)
+                
+                # Mark as completed
+                await kb_manager.update_run_status(rid, "COMPLETED")
+                
+            except Exception as e:
+                logger.error(f"Failed to generate report for {proj_name}: {e}")
+                await kb_manager.update_run_status(rid, "FAILED")
+
+    await asyncio.gather(*[report_run(proj_name, rid) for proj_name, rid in active_runs])
+
+async def analyze_files(files: List[Tuple[str, str, str, str, Optional[dict]]], graph_snapshot: GraphSnapshot,
+                        mcp_server: RepoMCPServer, kb_manager: KnowledgeBaseManager) -> int:
+    """
+    PHASE 3 over (project_id, file_path, language, run_id, fingerprint) tuples.
+    Each file's work item is marked DONE only after its rules are stored.
+    Returns the number of files analyzed successfully.
+    """
+    # Concurrency Control
+    # LLM calls are bounded globally inside mcp_server (max_concurrent_jobs);
+    # this only caps how many files are open/in-flight at once.
+    sem = asyncio.Semaphore(settings.max_concurrent_files)
+
+    async def process_file_bounded(pid: str, fpath: str, lng: str, rid: str, fingerprint: Optional[dict]):
+        async with sem:
+            try:
+                # 1. GRAPH LOOKUP: Get Context specifically for this file
+                # This replaces the old "all files list"
+                smart_context = graph_snapshot.get_context(fpath)
+                
+                # 2. LLM CALL: Extract Rules
+                result = await mcp_server.extract_business_rules_from_file(
+                    file_path=fpath, 
+                    language=lng, 
+                    context=smart_context,
+                    project_id=pid,
+                    on_progress=kb_manager.progress_callback(rid, fpath)
+                )
+                
+                # 3. STORAGE: Queue Rules (+ fingerprint and DONE checkpoint) for the write-behind sink
+                if result.get("status") == "success":
+                    written = await kb_manager.submit_result(result, rid, pid, fingerprint)
+                else:
+                    logger.warning(f"LLM extraction failed for {fpath}: {result.get('error')}")
+                    await kb_manager.mark_failed(rid, fpath, result.get("error"))
+                    return False
+
+            except Exception as e:
+                logger.error(f"Critical failure processing {fpath}: {e}")
+                try:
+                    await kb_manager.mark_failed(rid, fpath, str(e))
+                except Exception:
+                    pass  # Still PENDING, so resume picks it up either way
+                return False
+
+        # The file slot is free while the batch holding this file is written
+        return await written
+
+    # Execute Parallel Tasks
+    tasks = [process_file_bounded(*item) for item in files]
+    
+    # Show progress bar if tqdm is desired, otherwise await gather
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return sum(1 for r in results if r is True)
 
 async def run_analysis():
     """
@@ -30,6 +149,10 @@ async def run_analysis():
     1. Discovery: Locate repositories and register projects in DB.
     2. Indexing: Parse code to build the Dependency Graph (Nodes/Edges).
     3. Analysis: Use LLM + Graph Context to extract business rules.
+    4. Reporting: One Markdown report per run.
+
+    With settings.orchestrator_mode == "pipeline", phases 1-3 run as one
+    streaming pipeline (see src/pipeline.py) instead.
     """
     
     # 0. System Initialization
@@ -37,6 +160,8 @@ async def run_analysis():
     logger.info("Initializing Orchestrator...")
     
     db_session = SessionLocal()
+    kb_manager = None
+    mcp_server = None
     
     try:
         # Load Configuration
@@ -49,16 +174,30 @@ async def run_analysis():
 
         # Initialize Managers
         repo_manager = RepoManager()
-        mcp_server = RepoMCPServer(repo_manager)
+        # One read + one tree-sitter parse per file, shared by Phase 2 and Phase 3
+        artifact_store = _open_artifact_store(repo_manager)
+        mcp_server = RepoMCPServer(repo_manager, artifacts=artifact_store)
         kb_manager = KnowledgeBaseManager() # Manages Business Rules storage
         graph_repo = GraphRepository(db_session) # Manages Dependency Graph
         # We need rule_repo directly in orchestrator to update status
-        from src.db.repository import BusinessRuleRepository
         rule_repo = BusinessRuleRepository(db_session)
+        fingerprint_repo = FingerprintRepository(db_session)
+        planner = IncrementalPlanner(fingerprint_repo)
+        work_repo = WorkItemRepository(db_session) # Checkpoints for `run.py resume`
         
-        static_analyzer = StaticAnalyzer(repo_manager) # Parses imports/signatures
+        static_analyzer = StaticAnalyzer(repo_manager, artifact_store) # Parses imports/signatures
         report_generator = ReportGenerator(db_session, mcp_server) # Phase 4
 
+        if settings.orchestrator_mode == "pipeline":
+            logger.info("--- PIPELINE: DISCOVERY -> INDEXING -> ANALYSIS (streaming) ---")
+            pipeline = AnalysisPipeline(db_session, repo_manager, artifact_store, static_analyzer, mcp_server, kb_manager)
+            await pipeline.run(config_data.get("codebases", []))
+            log_llm_stats(mcp_server)
+            parser_registry.log_stats()
+            await embed_missing(db_session)
+            await generate_reports(pipeline.active_runs, kb_manager, report_generator)
+            return
+
         # ---------------------------------------------------------
         # PHASE 1: DISCOVERY & REGISTRATION
         # ---------------------------------------------------------
@@ -67,6 +206,9 @@ async def run_analysis():
         # Structure: (project_id, file_path, language, run_id)
         active_files: List[Tuple[str, str, str, str]] = []
         active_runs: List[Tuple[str, str]] = [] # (project_name, run_id)
+        carried_files: List[Tuple[str, str]] = [] # (file_path, run_id) reused from earlier runs
+        pending_fingerprints = {} # file_path -> fingerprint, persisted after successful analysis
+        module_indexes = {} # project_id -> ModuleIndex (import string -> file paths)
         
         for cb_config in config_data.get("codebases", []):
             try:
@@ -94,15 +236,39 @@ async def run_analysis():
                 # D. List Files
                 files = list(repo_manager.list_source_files(local_path))
                 logger.info(f"Found {len(files)} source files in {metadata.id}")
-                
-                for f in files:
+
+                # Module index over ALL files, so changed files can link to unchanged ones
+                module_indexes[metadata.id] = ModuleIndex.build(local_path, files)
+
+                # E. Incremental Plan: only changed files go through Phase 2/3
+                plan = planner.plan(metadata.id, files, metadata.language)
+                fingerprint_repo.upsert_many(plan.refreshed)
+                for prev_run_id, unchanged in plan.unchanged.items():
+                    copied = rule_repo.carry_forward_rules(prev_run_id, run_id, unchanged)
+                    fingerprint_repo.move_to_run(metadata.id, unchanged, run_id)
+                    carried_files.extend((f, str(run_id)) for f in unchanged)
+                    logger.info(f"Carried forward {copied} rules for {len(unchanged)} unchanged files from run {prev_run_id}")
+                fingerprint_repo.delete_paths(metadata.id, plan.removed)
+                logger.info(f"{metadata.id}: {len(plan.changed)} changed, {plan.unchanged_count} unchanged, {len(plan.removed)} removed")
+
+                for f in plan.changed:
                     active_files.append((metadata.id, f, metadata.language, str(run_id)))
+                    pending_fingerprints[f] = plan.pending.get(f)
+
+                # F. Checkpoint: one work item per file, so a crashed run can be resumed
+                work_repo.add_items(
+                    [{"run_id": run_id, "file_path": f, "project_id": metadata.id, "language": metadata.language,
+                      "status": "PENDING", "fingerprint": plan.pending.get(f)} for f in plan.changed]
+                    + [{"run_id": run_id, "file_path": f, "project_id": metadata.id, "language": metadata.language,
+                        "status": "CARRIED"} for files in plan.unchanged.values() for f in files]
+                )
+                rule_repo.mark_discovered(run_id)
                     
             except Exception as e:
                 logger.error(f"Failed to initialize codebase {cb_config.get('name', 'Unknown')}: {e}")
                 continue
 
-        if not active_files:
+        if not active_files and not carried_files:
             logger.warning("No files found to process. Exiting.")
             return
 
@@ -112,34 +278,41 @@ async def run_analysis():
         logger.info(f"--- PHASE 2: INDEXING ({len(active_files)} files) ---")
         
         indexing_success_count = 0
-        
-        for proj_id, file_path, lang, _ in active_files: # Ignore run_id for indexing
+        # Buffers nodes/edges and writes them with set-based upserts every graph_batch_size rows
+        graph_writer = GraphBatchWriter(db_session, batch_size=settings.graph_batch_size)
+
+        def index_file(file_meta) -> bool:
             try:
-                # 1. Static Analysis (Fast, CPU-bound)
-                file_meta = static_analyzer.scan_file(file_path, lang)
-                
-                # 2. Store Summary (Node)
-                graph_repo.save_summary(
-                    file_path=file_path,
-                    summary=file_meta.summary_content,
-                    # Optional: Compute embedding here if static analyzer supports it
-                    embedding=None 
-                )
-                
-                # 3. Store Dependencies (Edges)
-                for imported_module in file_meta.imports:
-                    # Note: You might need a resolver logic here to map 'module' -> 'file_path'
-                    # For now, we store the raw import string or a resolved path if available
-                    graph_repo.add_dependency(
-                        source=file_path,
-                        target=imported_module, # e.g., "src.utils"
-                        type="import"
-                    )
-                
-                indexing_success_count += 1
+                # 2. Store Summary (Node) and Dependencies (Edges)
+                # Imports are resolved 'module' -> 'file_path' so edges join against CodeSummary
+                module_index = module_indexes[file_project[file_meta.file_path]]
+                store_index_result(graph_writer, module_index, artifact_store, file_meta)
+                return True
                 
             except Exception as e:
-                logger.warning(f"Indexing failed for {file_path}: {e}")
+                logger.warning(f"Indexing failed for {file_meta.file_path}: {e}")
+                return False
+
+        index_items = [(f, lang) for _, f, lang, _ in active_files] # Ignore run_id for indexing
+        file_project = {f: pid for pid, f, _, _ in active_files}
+        index_workers = settings.index_workers or os.cpu_count() or 1
+
+        if index_workers > 1 and len(index_items) > settings.index_batch_size:
+            # 1. Static Analysis (CPU-bound) on a process pool, stored as batches complete
+            logger.info(f"Indexing on {index_workers} worker processes (batch size {settings.index_batch_size})")
+            async for file_meta in static_analyzer.scan_files_parallel(index_items, index_workers, settings.index_batch_size):
+                indexing_success_count += index_file(file_meta)
+        else:
+            for file_path, lang in index_items:
+                # 1. Static Analysis (Fast, CPU-bound)
+                indexing_success_count += index_file(static_analyzer.scan_file(file_path, lang))
+
+        try:
+            graph_writer.flush()
+        except Exception as e:
+            logger.warning(f"Final graph flush failed: {e}")
+        logger.info(f"Graph writer stored {graph_writer.nodes_written} nodes and {graph_writer.edges_written} edges")
+        parser_registry.log_stats() # In-process parses only; pool workers keep their own registries
         
         logger.success(f"Indexing complete. Graph populated with {indexing_success_count} nodes.")
 
@@ -153,76 +326,135 @@ async def run_analysis():
         # PHASE 3: ANALYSIS (LLM + GRAPH RAG)
         # ---------------------------------------------------------
         logger.info("--- PHASE 3: SEMANTIC ANALYSIS ---")
-        
-        # Concurrency Control
-        sem = asyncio.Semaphore(settings.max_concurrent_jobs)
-
-        async def process_file_bounded(pid: str, fpath: str, lng: str, rid: str):
-            async with sem:
-                try:
-                    # 1. GRAPH LOOKUP: Get Context specifically for this file
-                    # This replaces the old "all files list"
-                    smart_context = graph_repo.get_smart_context(fpath)
-                    
-                    # 2. LLM CALL: Extract Rules
-                    result = await mcp_server.extract_business_rules_from_file(
-                        file_path=fpath, 
-                        language=lng, 
-                        context=smart_context
-                    )
-                    
-                    # 3. STORAGE: Save Rules
-                    if result.get("status") == "success":
-                        await kb_manager.store_findings(result, rid)
-                        return True
-                    else:
-                        logger.warning(f"LLM extraction failed for {fpath}: {result.get('error')}")
-                        return False
-
-                except Exception as e:
-                    logger.error(f"Critical failure processing {fpath}: {e}")
-                    return False
 
-        # Execute Parallel Tasks
-        tasks = [process_file_bounded(pid, f, l, rid) for pid, f, l, rid in active_files]
+        # Load the graph once; per-file context lookups are then in-process
+        graph_snapshot = GraphSnapshot.load(
+            graph_repo, [f for _, f, _, _ in active_files] + [f for f, _ in carried_files]
+        )
         
-        # Show progress bar if tqdm is desired, otherwise await gather
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        success_count = await analyze_files(
+            [(pid, f, lng, rid, pending_fingerprints.get(f)) for pid, f, lng, rid in active_files],
+            graph_snapshot, mcp_server, kb_manager
+        )
         
-        success_count = sum(1 for r in results if r is True)
         logger.success(f"Analysis Complete. Processed {success_count}/{len(active_files)} files successfully.")
+        log_llm_stats(mcp_server)
+        await embed_missing(db_session)
 
         # ---------------------------------------------------------
         # PHASE 4: REPORTING
         # ---------------------------------------------------------
-        for _, rid in active_runs:
-            rule_repo.update_run_status(rid, "REPORTING")
-
-        logger.info("--- PHASE 4: REPORT GENERATION ---")
-        
-        for proj_name, rid in active_runs:
-            try:
-                # Filter files for this specific run
-                run_files = [f for _, f, _, r in active_files if str(r) == rid]
-                if not run_files:
-                    logger.warning(f"No active files found for run {rid}, report may be incomplete.")
-                
-                # Centralized, safe report generation
-                await report_generator.generate_report_safe(rid, proj_name, run_files)
-                
-                # Mark as completed
-                rule_repo.update_run_status(rid, "COMPLETED")
-                
-            except Exception as e:
-                logger.error(f"Failed to generate report for {proj_name}: {e}")
-                rule_repo.update_run_status(rid, "FAILED")
+        await generate_reports(active_runs, kb_manager, report_generator)
 
     except Exception as e:
         logger.critical(f"Orchestrator crashed: {e}")
         raise
     finally:
+        if kb_manager:
+            await kb_manager.close()
+        if mcp_server:
+            await mcp_server.close()
         db_session.close()
 
+async def resume_analysis(run_id: str):
+    """
+    Resumes a crashed or interrupted run from its work items: only PENDING/FAILED
+    files are re-indexed and re-analyzed, then Phase 4 is run for the whole run.
+    Chunks answered before the crash are served from the LLM response cache.
+    """
+    logger.add("logs/orchestrator_{time:YYYYMMDD}.log", rotation="50 MB", retention="10 days")
+    db_session = SessionLocal()
+    kb_manager = None
+    mcp_server = None
+
+    try:
+        run = db_session.query(AnalysisRun).filter(AnalysisRun.run_id == run_id).first()
+        if not run:
+            logger.error(f"Run {run_id} not found.")
+            return
+        if run.status == "COMPLETED":
+            logger.info(f"Run {run_id} is already completed. Nothing to resume.")
+            return
+
+        project = db_session.query(Project).filter(Project.id == run.project_id).first()
+        project_name = project.name if project else run.project_id
+
+        work_repo = WorkItemRepository(db_session)
+        counts = work_repo.status_counts(run_id)
+        if run.discovered_at is None:
+            # Its work items cover only the files fed before the stop: resuming would skip the rest
+            logger.error(f"Run {run_id} stopped during discovery, so not every file has a work item; start a new run instead.")
+            return
+        items = work_repo.get_unfinished(run_id)
+        logger.info(f"Resuming run {run_id} ({project_name}, status {run.status}): {counts}; re-queuing {len(items)} files")
+
+        repo_manager = RepoManager()
+        artifact_store = _open_artifact_store(repo_manager)
+        mcp_server = RepoMCPServer(repo_manager, artifacts=artifact_store)
+        kb_manager = KnowledgeBaseManager()
+        graph_repo = GraphRepository(db_session)
+        rule_repo = BusinessRuleRepository(db_session)
+        static_analyzer = StaticAnalyzer(repo_manager, artifact_store)
+        report_generator = ReportGenerator(db_session, mcp_server)
+
+        if items:
+            file_paths = [i.file_path for i in items]
+            # Rules written just before the crash (before the item was marked DONE)
+            dropped = rule_repo.delete_rules_for_files(run_id, file_paths)
+            if dropped:
+                logger.info(f"Dropped {dropped} rules of unfinished files before re-analysis")
+
+            # Re-index the unfinished files: upserts are idempotent and this
+            # re-registers their chunk plans for Phase 3
+            rule_repo.update_run_status(run_id, "INDEXING")
+            module_index = _module_index_for_project(repo_manager, run.project_id)
+            if module_index:
+                with GraphBatchWriter(db_session, batch_size=settings.graph_batch_size) as graph_writer:
+                    for item in items:
+                        file_meta = static_analyzer.scan_file(item.file_path, item.language)
+                        try:
+                            store_index_result(graph_writer, module_index, artifact_store, file_meta)
+                        except Exception as e:
+                            logger.warning(f"Indexing failed for {item.file_path}: {e}")
+            else:
+                logger.warning(f"Project {run.project_id} not in config/codebases.yaml; reusing the stored graph")
+
+            rule_repo.update_run_status(run_id, "ANALYZING")
+            graph_snapshot = GraphSnapshot.load(graph_repo, file_paths)
+            success_count = await analyze_files(
+                [(i.project_id, i.file_path, i.language, run_id, i.fingerprint) for i in items],
+                graph_snapshot, mcp_server, kb_manager
+            )
+            logger.success(f"Resume analysis complete. Processed {success_count}/{len(items)} files successfully.")
+            log_llm_stats(mcp_server)
+            await embed_missing(db_session)
+
+        await generate_reports([(project_name, run_id)], kb_manager, report_generator)
+
+    except Exception as e:
+        logger.critical(f"Resume of run {run_id} crashed: {e}")
+        raise
+    finally:
+        if kb_manager:
+            await kb_manager.close()
+        if mcp_server:
+            await mcp_server.close()
+        db_session.close()
+
+def _module_index_for_project(repo_manager: RepoManager, project_id: str) -> Optional[ModuleIndex]:
+    """Rebuilds the import resolver for a configured project (None if it is not configured)."""
+    try:
+        with open("config/codebases.yaml") as f:
+            config_data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return None
+    for cb_config in config_data.get("codebases", []):
+        if cb_config.get("id") == project_id:
+            metadata = CodebaseMetadata(**cb_config)
+            local_path = repo_manager.ensure_local_repo(metadata.source)
+            return ModuleIndex.build(local_path, list(repo_manager.list_source_files(local_path)))
+    return None
+
 if __name__ == "__main__":
     try:
         asyncio.run(run_analysis())
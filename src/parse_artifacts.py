@@ -0,0 +1,149 @@
+# src/parse_artifacts.py
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import List, Optional
+from loguru import logger
+
+from src.chunking import UniversalChunker, CodeChunk
+from src.config import settings
+from src.repo_manager import RepoManager
+
+# Bump when the chunk plan format or chunking rules change
+PLAN_VERSION = "5"
+
+
+@dataclass
+class ParseArtifact:
+    """Everything derived from a single read + tree-sitter parse of a file."""
+    file_path: str
+    language: str
+    content_hash: str
+    source: str  # Full text, only materialised when parsed is False (regex/ast fallback needs it)
+    parsed: bool  # False when no tree-sitter grammar was available
+    chunks: List[CodeChunk] = field(default_factory=list)
+    definitions: List[str] = field(default_factory=list)
+    imports: List[str] = field(default_factory=list)
+
+
+class ParseArtifactStore:
+    """
+    Reads and parses each file once per run and shares the result between
+    Phase 2 (StaticAnalyzer) and Phase 3 (chunk extraction).
+
+    The chunk plan is persisted on disk keyed by content hash + language (and
+    the chunking settings), so it can be produced in an indexing worker
+    process and consumed later by the analysis coroutines without touching the
+    source file again.
+
+    Plans of edited files and of older PLAN_VERSIONs are never read again, so
+    a store given max_bytes / max_age_seconds prunes the directory when it is
+    created: plans unused for max_age_seconds go first, then the least
+    recently used until it fits in max_bytes (saving a plan marks it used).
+    Worker processes open the store without limits and never prune.
+    """
+
+    def __init__(self, cache_dir: Path, repo_manager: Optional[RepoManager] = None,
+                 max_bytes: int = 0, max_age_seconds: float = 0):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.repo_manager = repo_manager or RepoManager()
+        self._by_path: dict[str, str] = {}  # file_path -> plan key for this run
+        if max_bytes or max_age_seconds:
+            self.prune(max_bytes, max_age_seconds)
+
+    @staticmethod
+    def plan_key(content_hash: str, language: str) -> str:
+        # The chunking settings decide chunk boundaries, so a plan built under others is never reused
+        chunking = f"{settings.chunk_max_tokens}:{settings.token_estimate_scale}"
+        return hashlib.sha256(f"{PLAN_VERSION}:{chunking}:{language}:{content_hash}".encode()).hexdigest()
+
+    def _plan_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def build(self, file_path: str, language: str) -> ParseArtifact:
+        """Reads, hashes, parses and chunks the file, then persists its chunk plan."""
+        with self.repo_manager.open_source(file_path) as buffer:
+            content_hash = hashlib.sha256(buffer.data).hexdigest()
+
+            chunker = UniversalChunker(buffer, language_id=language)
+            chunks = chunker.chunk()
+            definitions, imports = chunker.outline()
+            parsed = chunker.tree is not None
+            source = "" if parsed else buffer.text()
+
+        artifact = ParseArtifact(
+            file_path=file_path,
+            language=language,
+            content_hash=content_hash,
+            source=source,
+            parsed=parsed,
+            chunks=chunks,
+            definitions=definitions,
+            imports=imports,
+        )
+        self.save(artifact)
+        return artifact
+
+    def save(self, artifact: ParseArtifact):
+        key = self.plan_key(artifact.content_hash, artifact.language)
+        path = self._plan_path(key)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"file_path": artifact.file_path, "chunks": [asdict(c) for c in artifact.chunks]}, f)
+            os.replace(tmp, path)  # Atomic: concurrent workers may write the same key
+        else:
+            try:
+                os.utime(path)  # Still in use: keeps it out of prune()
+            except OSError:
+                pass
+        self._by_path[artifact.file_path] = key
+
+    def remember(self, file_path: str, content_hash: str, language: str):
+        """Registers a plan built in another process (e.g. an indexing worker)."""
+        if content_hash:
+            self._by_path[file_path] = self.plan_key(content_hash, language)
+
+    def load_chunks(self, file_path: str) -> Optional[List[CodeChunk]]:
+        """Returns the chunk plan recorded for file_path in this run, or None."""
+        key = self._by_path.get(file_path)
+        if not key:
+            return None
+        try:
+            with open(self._plan_path(key), encoding="utf-8") as f:
+                data = json.load(f)
+            return [CodeChunk(**c) for c in data["chunks"]]
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.debug(f"No usable chunk plan for {file_path}: {e}")
+            return None
+
+    def prune(self, max_bytes: int, max_age_seconds: float):
+        """Drops plans (and stray temp files) unused for max_age_seconds, then LRU until under max_bytes."""
+        entries = []
+        for path in self.cache_dir.glob("*/*"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        cutoff = time.time() - max_age_seconds if max_age_seconds else None
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in sorted(entries, key=lambda e: e[0]):
+            if not ((cutoff and mtime < cutoff) or (max_bytes and total > max_bytes)):
+                break  # Oldest first: everything after this is newer and fits
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Parse artifact cache: pruned {removed} old chunk plans")
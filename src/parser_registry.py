@@ -0,0 +1,110 @@
+# src/parser_registry.py
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+import tree_sitter
+from loguru import logger
+
+# Grammar modules to try when tree_sitter_language_pack does not ship a language
+FALLBACK_MODULES = {
+    "c_sharp": "tree_sitter_c_sharp",
+    "javascript": "tree_sitter_javascript",
+}
+
+
+@dataclass
+class RegistryStats:
+    load_seconds: dict = field(default_factory=dict)  # language -> grammar load time
+    failed: set = field(default_factory=set)
+    parsers_created: int = 0
+    parser_reuses: int = 0
+
+
+class ParserRegistry:
+    """
+    Process-wide cache of tree-sitter grammars and parsers.
+
+    Each grammar is loaded once per process (guarded by a lock); parsers are
+    kept per thread, because a tree_sitter.Parser must not be used from two
+    threads at once. Failed languages are remembered so the fallback imports
+    are not retried for every file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._languages: dict[str, Optional[tree_sitter.Language]] = {}
+        self._local = threading.local()
+        self.stats = RegistryStats()
+
+    def get_language(self, language_id: str) -> Optional[tree_sitter.Language]:
+        if language_id in self._languages:
+            return self._languages[language_id]
+
+        with self._lock:
+            if language_id not in self._languages:  # Another thread may have loaded it
+                start = time.perf_counter()
+                language = self._load(language_id)
+                self._languages[language_id] = language
+                if language is not None:
+                    self.stats.load_seconds[language_id] = time.perf_counter() - start
+                else:
+                    self.stats.failed.add(language_id)
+        return self._languages[language_id]
+
+    def get_parser(self, language_id: str) -> Optional[tree_sitter.Parser]:
+        parsers = getattr(self._local, "parsers", None)
+        if parsers is None:
+            parsers = self._local.parsers = {}
+
+        parser = parsers.get(language_id)
+        if parser is not None:
+            self.stats.parser_reuses += 1
+            return parser
+
+        language = self.get_language(language_id)
+        if language is None:
+            return None
+        parser = parsers[language_id] = tree_sitter.Parser(language)
+        self.stats.parsers_created += 1
+        return parser
+
+    def _load(self, language_id: str) -> Optional[tree_sitter.Language]:
+        try:
+            from tree_sitter_language_pack import get_language
+            return get_language(language_id)
+        except Exception as e:
+            module_name = FALLBACK_MODULES.get(language_id)
+            if not module_name:
+                logger.warning(f"Could not load parser for {language_id}: {e}")
+                return None
+
+        # Fallback: Try manual import for specific languages
+        try:
+            module = __import__(module_name)
+            return tree_sitter.Language(module.language())
+        except Exception as fallback_error:
+            logger.warning(f"Could not load parser for {language_id} (Fallback also failed): {fallback_error}")
+            return None
+
+    def metrics(self) -> dict:
+        s = self.stats
+        return {
+            "languages_loaded": sorted(s.load_seconds),
+            "languages_failed": sorted(s.failed),
+            "grammar_load_seconds": round(sum(s.load_seconds.values()), 4),
+            "parsers_created": s.parsers_created,
+            "parser_reuses": s.parser_reuses,
+        }
+
+    def log_stats(self):
+        m = self.metrics()
+        logger.info(
+            f"Parser registry: {len(m['languages_loaded'])} grammars loaded in {m['grammar_load_seconds']:.3f}s, "
+            f"{m['parsers_created']} parsers created, {m['parser_reuses']} reuses"
+            + (f", unavailable: {', '.join(m['languages_failed'])}" if m["languages_failed"] else "")
+        )
+
+
+# One registry per process (indexing workers each get their own)
+parser_registry = ParserRegistry()
@@ -0,0 +1,377 @@
+# src/pipeline.py
+import asyncio
+import os
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+from loguru import logger
+
+from src.config import settings
+from src.models import CodebaseMetadata
+from src.db.models import Project, AnalysisRun
+from src.db.repository import (
+    BusinessRuleRepository, FingerprintRepository, GraphBatchWriter, GraphRepository, WorkItemRepository
+)
+from src.db.async_repository import AsyncGraphRepository
+from src.graph_snapshot import GraphSnapshot
+from src.incremental import IncrementalPlanner, refresh_row
+from src.module_index import ModuleIndex
+from src.parse_artifacts import ParseArtifactStore
+
+_DONE = object()  # End-of-stream marker, one per downstream worker
+_FEED_BATCH = 100  # Files classified and checkpointed per work-item insert
+
+
+def store_index_result(graph_writer: GraphBatchWriter, module_index: ModuleIndex,
+                       artifact_store: Optional[ParseArtifactStore], file_meta) -> None:
+    """
+    Writes one file's node (summary) and edges (resolved imports) through the
+    batch writer. Imports outside the project are kept as 'external' edges to
+    the raw module name.
+    """
+    if artifact_store:
+        # Worker processes build chunk plans on disk; record which one belongs to this file
+        artifact_store.remember(file_meta.file_path, file_meta.content_hash, file_meta.language)
+
+    graph_writer.add_summary(file_path=file_meta.file_path, summary=file_meta.summary_content, embedding=None)
+
+    for imported_module in file_meta.imports:
+        resolved = module_index.resolve(imported_module, file_meta.file_path)
+        if resolved.external:
+            graph_writer.add_dependency(source=file_meta.file_path, target=resolved.module, type="external")
+            continue
+        for target in resolved.targets:
+            graph_writer.add_dependency(source=file_meta.file_path, target=target, type="import")
+
+
+@dataclass(slots=True)
+class FileTask:
+    project_id: str
+    file_path: str
+    language: str
+    run_id: str
+    fingerprint: Optional[dict] = None  # Persisted once the file's rules are stored
+    result: Optional[dict] = None
+
+
+@dataclass
+class PipelineStats:
+    queued: int = 0
+    carried: int = 0
+    indexed: int = 0
+    analyzed: int = 0
+    succeeded: int = 0
+    rules_saved: int = 0
+    first_rules_after: Optional[float] = None  # Seconds from start until the first rules were stored
+
+
+class AnalysisPipeline:
+    """
+    Streaming alternative to the phase barriers in run_analysis.
+
+    Discovery -> indexing -> analysis -> persistence run concurrently as stages
+    joined by bounded queues, each stage with a fixed number of workers. A full
+    queue blocks the stage feeding it, so only about `pipeline_queue_size` files
+    per stage are in flight regardless of repository size, and rules are stored
+    while discovery is still walking the tree.
+
+    Trade-off: a file's graph context only includes dependencies that were
+    indexed before it was analyzed.
+
+    The synchronous session is only used from one dedicated thread (see _db),
+    so its queries never block the stages sharing the event loop.
+    """
+
+    def __init__(self, db_session, repo_manager, artifact_store, static_analyzer, mcp_server, kb_manager):
+        self.db = db_session
+        self.repo_manager = repo_manager
+        self.artifact_store = artifact_store
+        self.static_analyzer = static_analyzer
+        self.mcp_server = mcp_server
+        self.kb_manager = kb_manager
+
+        self.graph_repo = GraphRepository(db_session)
+        self.rule_repo = BusinessRuleRepository(db_session)
+        self.fingerprint_repo = FingerprintRepository(db_session)
+        self.planner = IncrementalPlanner(self.fingerprint_repo)
+        self.work_repo = WorkItemRepository(db_session)  # Checkpoints for `run.py resume`
+        # Flushed by the index stage on the DB thread (see _flush_graph), never from add_*()
+        self.graph_writer = GraphBatchWriter(db_session, batch_size=settings.graph_batch_size, auto_flush=False)
+        self._db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-db")
+
+        self.module_indexes: dict[str, ModuleIndex] = {}
+        self.active_runs: list[tuple[str, str]] = []  # (project_name, run_id)
+        self.stats = PipelineStats()
+        self._started = 0.0
+
+    async def run(self, codebases: list[dict]):
+        queue_size = settings.pipeline_queue_size
+        index_q = asyncio.Queue(maxsize=queue_size)
+        analyze_q = asyncio.Queue(maxsize=queue_size)
+        persist_q = asyncio.Queue(maxsize=queue_size)
+
+        index_workers = settings.index_workers or os.cpu_count() or 1
+        analyze_workers = settings.max_concurrent_files
+        logger.info(
+            f"Pipeline: {index_workers} index workers, {analyze_workers} analysis workers, "
+            f"queue size {queue_size}"
+        )
+
+        try:
+            self._started = time.perf_counter()
+            pool = self.static_analyzer.worker_pool(index_workers) if index_workers > 1 else None
+            try:
+                stages = [
+                    asyncio.ensure_future(self._stage(
+                        [self._discover(codebases, index_q)], index_q, index_workers)),
+                    asyncio.ensure_future(self._stage(
+                        [self._index_worker(index_q, analyze_q, pool) for _ in range(index_workers)],
+                        analyze_q, analyze_workers)),
+                    asyncio.ensure_future(self._stage(
+                        [self._analyze_worker(analyze_q, persist_q) for _ in range(analyze_workers)],
+                        persist_q, 1)),
+                    asyncio.ensure_future(self._stage([self._persist_worker(persist_q)])),
+                ]
+                try:
+                    await asyncio.gather(*stages)
+                except BaseException:
+                    # A failed stage would leave its neighbours blocked on their queues
+                    for stage in stages:
+                        stage.cancel()
+                    await asyncio.gather(*stages, return_exceptions=True)
+                    raise
+            finally:
+                if pool:
+                    pool.shutdown(cancel_futures=True)
+
+            await self._flush_graph()
+            s = self.stats
+            logger.info(f"Graph writer stored {self.graph_writer.nodes_written} nodes and {self.graph_writer.edges_written} edges")
+            logger.success(
+                f"Pipeline complete in {time.perf_counter() - self._started:.1f}s: {s.succeeded}/{s.queued} files analyzed, "
+                f"{s.rules_saved} rules stored, {s.carried} files carried forward"
+            )
+        finally:
+            # Non-daemon thread: left running it would outlive the pipeline
+            self._db_thread.shutdown(wait=True)
+
+    async def _db(self, fn, *args):
+        """Runs a synchronous session call on the pipeline's DB thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._db_thread, fn, *args)
+
+    async def _stage(self, workers: list, downstream: Optional[asyncio.Queue] = None, consumers: int = 0):
+        """Runs a stage's workers to completion, then tells each downstream worker to stop."""
+        await asyncio.gather(*workers)
+        for _ in range(consumers):
+            await downstream.put(_DONE)
+
+    # --- Stage 1: discovery & incremental planning ---
+
+    async def _discover(self, codebases: list[dict], index_q: asyncio.Queue):
+        for cb_config in codebases:
+            run_id = None
+            try:
+                metadata = CodebaseMetadata(**cb_config)
+                run_id = await self._db(self._register, metadata)
+
+                local_path = await asyncio.to_thread(self.repo_manager.ensure_local_repo, metadata.source)
+                files = await asyncio.to_thread(lambda: list(self.repo_manager.list_source_files(local_path)))
+                logger.info(f"Found {len(files)} source files in {metadata.id}")
+
+                # Module index over ALL files, so changed files can link to unchanged ones
+                self.module_indexes[metadata.id] = await asyncio.to_thread(ModuleIndex.build, local_path, files)
+
+                await self._feed(metadata, run_id, files, index_q)
+                await self._db(self.rule_repo.mark_discovered, run_id)
+                await self._db(self.rule_repo.update_run_status, run_id, "ANALYZING")
+
+            except Exception as e:
+                logger.error(f"Failed to initialize codebase {cb_config.get('name', 'Unknown')}: {e}")
+                if run_id:
+                    # No report for a run whose discovery failed
+                    self.active_runs = [r for r in self.active_runs if r[1] != run_id]
+                    try:
+                        await self._db(self.rule_repo.update_run_status, run_id, "FAILED")
+                    except Exception as status_error:
+                        logger.warning(f"Could not mark run {run_id} as failed: {status_error}")
+                continue
+
+    def _register(self, metadata: CodebaseMetadata) -> str:
+        project = self.db.query(Project).filter(Project.id == metadata.id).first()
+        if not project:
+            logger.info(f"Registering new project: {metadata.name}")
+            self.db.add(Project(id=metadata.id, name=metadata.name))
+            self.db.commit()
+
+        run_id = uuid.uuid4()
+        self.db.add(AnalysisRun(run_id=run_id, project_id=metadata.id, status="INDEXING"))
+        self.db.commit()
+        logger.info(f"Started Run {run_id} for {metadata.name}")
+        self.active_runs.append((metadata.name, str(run_id)))
+        return str(run_id)
+
+    async def _feed(self, metadata: CodebaseMetadata, run_id: str, files: list[str], index_q: asyncio.Queue):
+        """
+        Classifies files and queues the changed ones in small batches, each
+        checkpointed as work items before any of its files is queued.
+        """
+        pid = metadata.id
+        known = await self._db(self._load_known, pid)
+        unchanged = defaultdict(list)  # prior run_id -> files whose rules are carried forward
+        refreshed: list[dict] = []  # Touched-but-unmodified fingerprints, written with the carry-forward
+
+        for start in range(0, len(files), _FEED_BATCH):
+            group = files[start:start + _FEED_BATCH]
+            # Stat/hash reads files: one worker-thread hop per group keeps it off the loop
+            # (and off the session, which is the DB thread's)
+            decisions = await asyncio.to_thread(
+                lambda: [self.planner.classify(pid, f, metadata.language, known) for f in group]
+            )
+            batch: list[FileTask] = []
+            for fpath, (prev_run_id, fingerprint) in zip(group, decisions):
+                if prev_run_id:
+                    unchanged[prev_run_id].append(fpath)
+                    if fingerprint:
+                        refreshed.append(refresh_row(pid, fpath, fingerprint, prev_run_id))
+                else:
+                    batch.append(FileTask(pid, fpath, metadata.language, run_id, fingerprint))
+            if batch:
+                await self._queue_batch(batch, index_q)
+
+        await self._db(self.fingerprint_repo.upsert_many, refreshed)
+        for prev_run_id, paths in unchanged.items():
+            copied = await self._db(self._carry_forward, metadata, run_id, prev_run_id, paths)
+            self.stats.carried += len(paths)
+            logger.info(f"Carried forward {copied} rules for {len(paths)} unchanged files from run {prev_run_id}")
+
+        live = set(files)
+        await self._db(self.fingerprint_repo.delete_paths, pid, [p for p in known if p not in live])
+
+    def _load_known(self, project_id: str) -> dict:
+        known = self.planner.known(project_id)
+        # Detached, so later commits don't expire them into one refresh query per file
+        for fingerprint in known.values():
+            self.db.expunge(fingerprint)
+        return known
+
+    def _carry_forward(self, metadata: CodebaseMetadata, run_id: str, prev_run_id: str, paths: list[str]) -> int:
+        copied = self.rule_repo.carry_forward_rules(prev_run_id, run_id, paths)
+        self.fingerprint_repo.move_to_run(metadata.id, paths, run_id)
+        self.work_repo.add_items([
+            {"run_id": run_id, "file_path": f, "project_id": metadata.id, "language": metadata.language,
+             "status": "CARRIED"}
+            for f in paths
+        ])
+        return copied
+
+    async def _queue_batch(self, batch: list[FileTask], index_q: asyncio.Queue):
+        await self._db(self.work_repo.add_items, [
+            {"run_id": t.run_id, "file_path": t.file_path, "project_id": t.project_id,
+             "language": t.language, "status": "PENDING", "fingerprint": t.fingerprint}
+            for t in batch
+        ])
+        for task in batch:
+            self.stats.queued += 1
+            await index_q.put(task)
+
+    # --- Stage 2: indexing (graph nodes + edges) ---
+
+    async def _index_worker(self, index_q: asyncio.Queue, analyze_q: asyncio.Queue, pool):
+        while (task := await index_q.get()) is not _DONE:
+            try:
+                file_meta = await self.static_analyzer.scan_file_async(task.file_path, task.language, pool)
+                store_index_result(self.graph_writer, self.module_indexes[task.project_id], self.artifact_store, file_meta)
+                if self.graph_writer.pending >= self.graph_writer.batch_size:
+                    await self._flush_graph()
+                self.stats.indexed += 1
+            except Exception as e:
+                logger.warning(f"Indexing failed for {task.file_path}: {e}")
+            # Analyzed either way (as in phase mode); it just gets less graph context
+            await analyze_q.put(task)
+
+    # --- Stage 3: analysis (LLM + graph context) ---
+
+    async def _analyze_worker(self, analyze_q: asyncio.Queue, persist_q: asyncio.Queue):
+        while (task := await analyze_q.get()) is not _DONE:
+            try:
+                # Nodes/edges still buffered in the graph writer (including this file's) are merged in
+                snapshot = await self._neighbourhood(task.file_path)
+
+                task.result = await self.mcp_server.extract_business_rules_from_file(
+                    file_path=task.file_path,
+                    language=task.language,
+                    context=snapshot.get_context(task.file_path),
+                    project_id=task.project_id,
+                    on_progress=self.kb_manager.progress_callback(task.run_id, task.file_path)
+                )
+            except Exception as e:
+                logger.error(f"Critical failure processing {task.file_path}: {e}")
+                task.result = {"file_path": task.file_path, "status": "error", "error": str(e)}
+            await persist_q.put(task)
+
+    async def _neighbourhood(self, file_path: str) -> GraphSnapshot:
+        if not self.kb_manager.unit_of_work:
+            async def edges(files):
+                return await self._db(lambda: list(self.graph_repo.iter_internal_edges(files)))
+
+            async def summaries(files):
+                return await self._db(lambda: list(self.graph_repo.iter_summaries(files)))
+
+            return await GraphSnapshot.load_neighbourhood(edges, summaries, file_path, pending=self.graph_writer)
+        async with self.kb_manager.unit_of_work() as session:
+            repo = AsyncGraphRepository(session)
+            return await GraphSnapshot.load_neighbourhood(
+                repo.get_internal_edges, repo.get_summaries_for_files, file_path, pending=self.graph_writer)
+
+    async def _flush_graph(self):
+        # Taken on the loop, written on the DB thread; analysis still sees the rows meanwhile
+        batch = self.graph_writer.take()
+        try:
+            await self._db(self.graph_writer.write, batch)
+        finally:
+            self.graph_writer.release(batch)
+
+    # --- Stage 4: persistence ---
+
+    async def _persist_worker(self, persist_q: asyncio.Queue):
+        # Results are handed to the knowledge base's write-behind sink; this
+        # stage only waits when the sink applies backpressure
+        in_flight: set[asyncio.Future] = set()
+        while (task := await persist_q.get()) is not _DONE:
+            self.stats.analyzed += 1
+            result = task.result
+            try:
+                if result.get("status") != "success":
+                    logger.warning(f"LLM extraction failed for {task.file_path}: {result.get('error')}")
+                    await self.kb_manager.mark_failed(task.run_id, task.file_path, result.get("error"))
+                else:
+                    written = await self.kb_manager.submit_result(result, task.run_id, task.project_id, task.fingerprint)
+                    rule_count = len(result["findings"].get("business_rules", []))
+                    written.add_done_callback(lambda f, n=rule_count: self._on_written(f, n))
+                    in_flight.add(written)
+                    written.add_done_callback(in_flight.discard)
+            except Exception as e:
+                logger.error(f"Failed to persist results for {task.file_path}: {e}")
+
+            if self.stats.analyzed % 100 == 0:
+                s = self.stats
+                logger.info(f"Pipeline progress: {s.analyzed}/{s.queued} analyzed, {s.indexed} indexed, {s.rules_saved} rules")
+
+        # Write the tail of the buffer before the run is reported
+        await self.kb_manager.flush()
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    def _on_written(self, written: asyncio.Future, rule_count: int):
+        if not written.cancelled() and written.result():
+            self.stats.succeeded += 1
+            self._record_rules(rule_count)
+
+    def _record_rules(self, count: int):
+        if count and self.stats.first_rules_after is None:
+            self.stats.first_rules_after = time.perf_counter() - self._started
+            logger.info(f"First rules stored {self.stats.first_rules_after:.1f}s after start")
+        self.stats.rules_saved += count
@@ -0,0 +1,106 @@
+# src/rate_limiter.py
+import asyncio
+import time
+from dataclasses import dataclass
+from loguru import logger
+from src.config import settings
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity`, refills continuously."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0  # units per second
+        self.level = self.capacity
+        self._last = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._last) * self.rate)
+        self._last = now
+
+    def deficit(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it already is)."""
+        if not self.enabled:
+            return 0.0
+        # A single request larger than the whole bucket is admitted once it is full
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) / self.rate
+
+    def take(self, amount: float):
+        if self.enabled:
+            self.level -= min(amount, self.capacity)
+
+
+@dataclass
+class RateLimiterStats:
+    calls: int = 0
+    throttled_calls: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+
+class RateLimiter:
+    """
+    Proactive limiter for requests-per-minute and tokens-per-minute.
+    A call is admitted only when both buckets have room; waiters are served FIFO.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.stats = RateLimiterStats()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """
+        Waits until the call fits in both budgets and reserves it.
+        Returns the number of seconds spent waiting.
+        """
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                self.requests.refill()
+                self.tokens.refill()
+                wait = max(self.requests.deficit(1), self.tokens.deficit(tokens))
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    break
+                await asyncio.sleep(wait)
+
+        waited = time.monotonic() - start
+        self.stats.calls += 1
+        self.stats.total_wait += waited
+        self.stats.max_wait = max(self.stats.max_wait, waited)
+        if waited > 0.01:
+            self.stats.throttled_calls += 1
+            if waited > 5:
+                logger.debug(f"Rate limiter held call for {waited:.1f}s ({tokens:,} tokens)")
+        return waited
+
+    def wait_estimate(self, tokens: int = 0) -> float:
+        """Seconds a call of `tokens` would wait right now (nothing is reserved)."""
+        self.requests.refill()
+        self.tokens.refill()
+        return max(self.requests.deficit(1), self.tokens.deficit(tokens))
+
+    def log_stats(self):
+        s = self.stats
+        avg = s.total_wait / s.calls if s.calls else 0.0
+        logger.info(
+            f"Rate limiter: {s.calls} calls, {s.throttled_calls} throttled, "
+            f"waited {s.total_wait:.1f}s total (avg {avg:.2f}s, max {s.max_wait:.1f}s)"
+        )
+
+
+# Shared by every LLM call in the process
+rate_limiter = RateLimiter(settings.llm_requests_per_minute, settings.llm_tokens_per_minute)
+
+# Fast tier of the model cascade (its own per-model quota)
+fast_rate_limiter = RateLimiter(settings.cascade_requests_per_minute, settings.cascade_tokens_per_minute)
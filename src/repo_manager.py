@@ -4,6 +4,7 @@ import git
 import hashlib
 
 from loguru import logger
+from src.source_buffer import SourceBuffer
 
 class RepoManager:
     def __init__(self, config=None):
@@ -53,3 +54,7 @@ class RepoManager:
     def read_file(self, file_path: str) -> str:
         with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
             return f.read()
+
+    def open_source(self, file_path: str) -> SourceBuffer:
+        """Memory-maps the file; use as a context manager so the mapping is released."""
+        return SourceBuffer.open(file_path)
@@ -0,0 +1,272 @@
+# src/report_mapreduce.py
+import asyncio
+import datetime
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Iterable, Iterator, List, Optional
+from loguru import logger
+
+from src.config import settings
+from src.db.config import SessionLocal
+from src.db.repository import BusinessRuleRepository, GraphRepository
+from src.prompts import render_prompt
+from src.token_budget import token_estimator
+
+_SUMMARY_LOOKUP_BATCH = 500  # Files per summary query while streaming
+
+
+def estimate_text_tokens(text: str) -> int:
+    return token_estimator.count(text)
+
+
+def _rule_tokens(rule: dict) -> int:
+    return estimate_text_tokens(rule["title"]) + estimate_text_tokens(rule["description"]) + 8
+
+
+@dataclass
+class FileEntry:
+    file_path: str
+    summary: str = ""
+    rules: List[dict] = field(default_factory=list)  # {"title", "description"}
+    omitted: int = 0  # Rules dropped so a single file fits in one section
+
+    @property
+    def tokens(self) -> int:
+        return estimate_text_tokens(self.summary) + sum(_rule_tokens(r) for r in self.rules) + 16
+
+
+@dataclass
+class Section:
+    label: str  # Directory (relative to the project root) the files share
+    files: List[FileEntry]
+    tokens: int
+
+
+class MapReduceReporter:
+    """
+    Hierarchical Phase 4 for runs too large for one prompt.
+
+    Map: files are streamed from the DB in path order and cut into
+    directory-aligned sections of at most `section_tokens`; each section is
+    summarized by the LLM while the next ones are still being read.
+    Reduce: section summaries are merged in parallel rounds until they fit
+    one prompt, which then produces the final report.
+
+    Wall time grows with the number of rounds (logarithmic in section count)
+    and shrinks with LLM concurrency, instead of growing with total rules.
+    """
+
+    def __init__(self, mcp_server, section_tokens: int | None = None, concurrency: int | None = None):
+        self.mcp_server = mcp_server
+        self.section_tokens = section_tokens or settings.report_section_tokens
+        self.concurrency = concurrency or settings.report_map_concurrency
+        self.rule_count = 0
+        self.file_count = 0
+
+    async def generate(self, run_id: str, project_name: str, file_paths: Optional[List[str]] = None) -> str:
+        """Reports on file_paths, or (default) on every file of the run, streamed from the DB."""
+        # Own session: the rule stream stays open across awaits while other
+        # projects' reports commit on the shared session
+        session = SessionLocal()
+        try:
+            rule_repo = BusinessRuleRepository(session)
+            graph_repo = GraphRepository(session)
+            if file_paths:
+                paths = sorted(set(file_paths))
+                root = self._root(paths[0], paths[-1])
+            else:
+                # Scoped by join in SQL; the path list itself is never materialised
+                _, first, last = rule_repo.file_stats_for_run(run_id)
+                paths = rule_repo.iter_file_paths_for_run(run_id)
+                root = self._root(first, last)
+
+            # 1. MAP: summarize sections as they are cut from the stream (bounded in-flight)
+            slots = asyncio.Semaphore(self.concurrency)
+            tasks = []
+            entries = self._file_entries(rule_repo, graph_repo, run_id, paths)
+            for section in self._sections(entries, root):
+                await slots.acquire()
+                tasks.append(asyncio.create_task(self._map(section, project_name, slots)))
+            logger.info(f"Report map: {len(tasks)} sections from {self.file_count} files / {self.rule_count} rules")
+            sections = list(await asyncio.gather(*tasks))
+
+            if file_paths:
+                edges = graph_repo.iter_internal_edges(paths)
+            else:
+                edges = ((source, target) for source, target, _ in graph_repo.iter_dependencies_for_run(run_id, internal_only=True))
+            module_dependencies = self._module_dependencies(edges, root)
+        finally:
+            session.close()
+
+        # 2. REDUCE: merge until the summaries fit one prompt
+        sections = await self._reduce(sections, project_name)
+
+        prompt = render_prompt(
+            "generate_final_report_mapreduce",
+            project_name=project_name,
+            date=datetime.date.today().isoformat(),
+            file_count=self.file_count,
+            rule_count=self.rule_count,
+            sections=sections,
+            module_dependencies=module_dependencies,
+        )
+        return await self.mcp_server.generate_text(prompt, system="You are an expert technical writer.")
+
+    # --- Streaming input ---
+
+    @staticmethod
+    def _root(first: Optional[str], last: Optional[str]) -> str:
+        if not first or not last:
+            return ""
+        try:
+            # Paths are sorted, so the first and last share the common prefix of all
+            return os.path.commonpath([os.path.dirname(first), os.path.dirname(last)])
+        except ValueError:
+            return ""  # Different drives
+
+    def _file_entries(self, rule_repo, graph_repo, run_id: str, paths: Iterable[str]) -> Iterator[FileEntry]:
+        """Joins the run's files (sorted) with its rules (streamed in the same order) and their summaries."""
+        window = []
+        for path, rules in self._merge(paths, groupby(rule_repo.iter_rules_for_report(run_id), key=lambda r: r.file_path)):
+            window.append(FileEntry(path, rules=[{"title": r.title or "", "description": r.description or ""} for r in rules]))
+            if len(window) >= _SUMMARY_LOOKUP_BATCH:
+                yield from self._with_summaries(graph_repo, window)
+                window = []
+        yield from self._with_summaries(graph_repo, window)
+
+    @staticmethod
+    def _merge(paths: Iterable[str], rule_groups: Iterable) -> Iterator[tuple]:
+        """Union of two path-sorted streams: (path, rules) for every file, with or without rules."""
+        rule_groups = iter(rule_groups)
+        nxt = next(rule_groups, None)
+        for path in paths:
+            while nxt is not None and nxt[0] < path:
+                yield nxt[0], list(nxt[1])
+                nxt = next(rule_groups, None)
+            if nxt is not None and nxt[0] == path:
+                yield path, list(nxt[1])
+                nxt = next(rule_groups, None)
+            else:
+                yield path, []
+        while nxt is not None:
+            yield nxt[0], list(nxt[1])
+            nxt = next(rule_groups, None)
+
+    def _with_summaries(self, graph_repo, window: List[FileEntry]) -> Iterator[FileEntry]:
+        if not window:
+            return
+        summaries = dict(graph_repo.iter_summaries([e.file_path for e in window]))
+        for entry in window:
+            entry.summary = summaries.get(entry.file_path) or ""
+            if entry.rules or entry.summary:
+                self.file_count += 1
+                self.rule_count += len(entry.rules)
+                yield entry
+
+    def _sections(self, entries: Iterable[FileEntry], root: str) -> Iterator[Section]:
+        """
+        Greedy, directory-aligned cuts: a section closes when the next file
+        would exceed the budget, or at a directory change once it is half full.
+        """
+        budget = self.section_tokens
+        current, tokens, current_dir = [], 0, None
+        for entry in entries:
+            self._fit(entry)
+            directory = os.path.dirname(entry.file_path)
+            cost = entry.tokens
+            if current and (tokens + cost > budget or (directory != current_dir and tokens >= budget // 2)):
+                yield self._section(current, tokens, root)
+                current, tokens = [], 0
+            current.append(entry)
+            tokens += cost
+            current_dir = directory
+        if current:
+            yield self._section(current, tokens, root)
+
+    def _fit(self, entry: FileEntry):
+        """Trims a single oversized file's rules so it fits in one section."""
+        if entry.tokens <= self.section_tokens:
+            return
+        entry.summary = entry.summary[:self.section_tokens]  # Characters, i.e. ~1/4 of the token budget
+        kept, used = [], estimate_text_tokens(entry.summary) + 16
+        for rule in entry.rules:
+            cost = _rule_tokens(rule)
+            if used + cost > self.section_tokens:
+                break
+            kept.append(rule)
+            used += cost
+        entry.omitted = len(entry.rules) - len(kept)
+        entry.rules = kept
+
+    @staticmethod
+    def _relative(path: str, root: str) -> str:
+        rel = os.path.relpath(path, root) if root else path
+        return "." if rel in ("", ".") else rel.replace(os.sep, "/")
+
+    def _section(self, files: List[FileEntry], tokens: int, root: str) -> Section:
+        try:
+            common = os.path.commonpath([os.path.dirname(f.file_path) for f in files])
+        except ValueError:
+            common = ""
+        return Section(label=self._relative(common, root), files=files, tokens=tokens)
+
+    # --- LLM steps ---
+
+    async def _map(self, section: Section, project_name: str, slots: asyncio.Semaphore) -> dict:
+        try:
+            prompt = render_prompt("report_map_section", project_name=project_name, section=section.label, files=section.files)
+            content = await self.mcp_server.generate_text(prompt, system="You are an expert software architect.")
+            return {"section": section.label, "content": content}
+        finally:
+            slots.release()
+
+    async def _reduce(self, sections: List[dict], project_name: str) -> List[dict]:
+        level = 0
+        while len(sections) > 1 and sum(estimate_text_tokens(s["content"]) for s in sections) > self.section_tokens:
+            groups = self._group(sections)
+            if len(groups) >= len(sections):
+                break  # Every summary is already budget-sized on its own; nothing left to merge
+            level += 1
+            logger.info(f"Report reduce round {level}: {len(sections)} summaries -> {len(groups)}")
+            sections = list(await asyncio.gather(*[self._merge_group(g, project_name) for g in groups]))
+        return sections
+
+    def _group(self, sections: List[dict]) -> List[List[dict]]:
+        """Consecutive (i.e. path-adjacent) summaries packed up to the budget, at least two per group."""
+        groups, current, tokens = [], [], 0
+        for s in sections:
+            cost = estimate_text_tokens(s["content"])
+            if len(current) >= 2 and tokens + cost > self.section_tokens:
+                groups.append(current)
+                current, tokens = [], 0
+            current.append(s)
+            tokens += cost
+        if current:
+            if len(current) == 1 and groups:
+                groups[-1].append(current[0])
+            else:
+                groups.append(current)
+        return groups
+
+    async def _merge_group(self, group: List[dict], project_name: str) -> dict:
+        if len(group) == 1:
+            return group[0]
+        prompt = render_prompt("report_reduce_sections", project_name=project_name, sections=group)
+        content = await self.mcp_server.generate_text(prompt, system="You are an expert software architect.")
+        labels = [s["section"] for s in group]
+        label = labels[0] if len(set(labels)) == 1 else f"{labels[0]} … {labels[-1]}"
+        return {"section": label, "content": content}
+
+    def _module_dependencies(self, edges: Iterable[tuple], root: str) -> List[dict]:
+        """File-level import edges rolled up to directory pairs, most-used first."""
+        counts = Counter()
+        for source, target in edges:
+            src_dir, dst_dir = os.path.dirname(source), os.path.dirname(target)
+            if src_dir != dst_dir:
+                counts[(src_dir, dst_dir)] += 1
+        return [
+            {"source": self._relative(s, root), "target": self._relative(t, root), "count": n}
+            for (s, t), n in counts.most_common(settings.report_module_edges)
+        ]
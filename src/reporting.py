@@ -3,6 +3,9 @@ import datetime
 from loguru import logger
 from src.db.repository import BusinessRuleRepository, GraphRepository
 from src.mcp_server import RepoMCPServer
+from src.config import settings
+from src.report_mapreduce import MapReduceReporter
+from src.token_budget import token_estimator
 
 class ReportGenerator:
     def __init__(self, db_session, mcp_server: RepoMCPServer):
@@ -11,19 +14,24 @@ class ReportGenerator:
         self.rule_repo = BusinessRuleRepository(db_session)
         self.graph_repo = GraphRepository(db_session)
 
-    def estimate_tokens(self, context_data: dict) -> float:
+    def estimate_tokens(self, context_data: dict) -> int:
         import json
-        dump = json.dumps(context_data)
-        return len(dump) / 4.0
+        return token_estimator.count(json.dumps(context_data))
 
-    async def prepare_report_context(self, run_id: str, project_name: str, file_paths: list[str]) -> dict:
+    async def prepare_report_context(self, run_id: str, project_name: str, file_paths: list[str] | None = None) -> dict:
         """
         Gathers data and prepares context dict.
+        Reads are streamed column projections; without file_paths the run's
+        files are scoped by a join in SQL instead of a literal path list.
         """
         # 1. Gather Data (Scoped to this run/files)
-        rules = self.rule_repo.get_all_rules(run_id)
-        summaries = self.graph_repo.get_summaries_for_files(file_paths)
-        dependencies = self.graph_repo.get_dependencies_for_files(file_paths)
+        rules = self.rule_repo.iter_rules_for_report(run_id)
+        if file_paths:
+            summaries = self.graph_repo.iter_summaries(file_paths)
+            dependencies = self.graph_repo.get_dependencies_for_files(file_paths)
+        else:
+            summaries = self.graph_repo.iter_summaries_for_run(run_id)
+            dependencies = self.graph_repo.iter_dependencies_for_run(run_id, limit=200)
 
         # 2. Prepare Context
         return {
@@ -37,42 +45,49 @@ class ReportGenerator:
     async def generate_report_safe(self, run_id: str, project_name: str, file_paths: list[str] = None) -> str:
         """
         Centralized method to generate a report with full safety checks:
-        - Auto-discovers files if not provided
+        - Scopes to file_paths, or to every file of the run (joined in SQL) when not provided
+        - Uses map-reduce when the run is too large for one prompt
         - Prepares context
-        - Estimates tokens and throttles if needed
+        - Estimates tokens (quota is enforced by the shared rate limiter)
         - Generates and saves report
         """
-        # 1. Resolve Files
-        if not file_paths:
-            logger.info("No file list provided. Looking up files from run history...")
-            file_paths = self.rule_repo.get_file_paths_for_run(run_id)
-            if not file_paths:
-                logger.warning(f"No files found for Run ID {run_id}. Report might be empty.")
+        # 1. Resolve Scope
+        file_count = len(file_paths) if file_paths else self.rule_repo.file_stats_for_run(run_id)[0]
+        if not file_count:
+            logger.warning(f"No files found for Run ID {run_id}. Report might be empty.")
 
-        # 2. Prepare Context
+        # 2. Large runs: summarize sections in parallel, then reduce
+        if self.use_map_reduce(run_id, file_count):
+            logger.info(f"Generating map-reduce report for {project_name}")
+            content = await MapReduceReporter(self.mcp_server).generate(run_id, project_name, file_paths)
+            return self.save_report(content, run_id, project_name)
+
+        # 3. Prepare Context
         context = await self.prepare_report_context(run_id, project_name, file_paths)
 
-        # 3. Token Estimation & Safe Throttling
+        # 4. Token Estimation
+        # Throttling is handled by the shared rate limiter in front of every LLM call
         est_tokens = self.estimate_tokens(context)
         logger.info(f"Estimated Request Size: {est_tokens:,.0f} tokens")
-        
-        # Throttling Logic (Quota: 2M/min)
-        if est_tokens > 200000: # Threshold: 200k tokens
-            # Calculate wait time: (Tokens / 1.5M) * 60s
-            # We use 1.5M as a conservative denominator to be safe
-            wait_time = max((est_tokens / 1_500_000) * 60, 60)
-            logger.warning(f"Large payload detected ({est_tokens:,.0f} tokens). Cooling down for {wait_time:.1f}s...")
-            import asyncio
-            await asyncio.sleep(wait_time)
 
-        # 4. Generate & Save
+        # 5. Generate & Save
         return await self.generate_and_save_report(context, run_id, project_name)
 
+    def use_map_reduce(self, run_id: str, file_count: int) -> bool:
+        if settings.report_mode != "auto":
+            return settings.report_mode == "map_reduce"
+        # Estimated from SQL aggregates, without loading the rules
+        rule_count, chars = self.rule_repo.report_size(run_id)
+        estimate = token_estimator.from_chars(chars) + 25 * rule_count + 60 * file_count
+        return estimate > settings.report_section_tokens
+
     async def generate_and_save_report(self, context_data: dict, run_id: str, project_name: str):
-        # 5. Generate
+        # 6. Generate
         content = await self.mcp_server.generate_project_summary(context_data)
-        
-        # 6. Save
+        return self.save_report(content, run_id, project_name)
+
+    def save_report(self, content: str, run_id: str, project_name: str) -> str:
+        # 7. Save
         output_dir = "reports"
         os.makedirs(output_dir, exist_ok=True)
         
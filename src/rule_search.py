@@ -0,0 +1,61 @@
+# src/rule_search.py
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from src.db.repository import BusinessRuleRepository
+
+
+@dataclass
+class RuleSearchHit:
+    rule_id: str
+    run_id: str
+    project_id: Optional[str]
+    file_path: str
+    title: str
+    snippet: str  # Description excerpt with matches wrapped in **
+    rank: float
+
+
+@dataclass
+class RuleSearchPage:
+    query: str
+    page: int
+    page_size: int
+    hits: List[RuleSearchHit] = field(default_factory=list)
+    has_more: bool = False
+
+
+class RuleSearch:
+    """
+    Paginated full-text search over extracted business rules.
+
+    Queries use web-search syntax ("discount -coupon", "\"free shipping\"", "a or b").
+    Only one page is materialised; has_more is found by fetching one extra row
+    instead of counting every match.
+    """
+    MAX_PAGE_SIZE = 200
+
+    def __init__(self, db_session):
+        self.repo = BusinessRuleRepository(db_session)
+
+    def search(self, query: str, project_id: str | None = None, run_id: str | None = None,
+               file_prefix: str | None = None, page: int = 1, page_size: int = 20) -> RuleSearchPage:
+        page = max(page, 1)
+        page_size = min(max(page_size, 1), self.MAX_PAGE_SIZE)
+        result = RuleSearchPage(query=query, page=page, page_size=page_size)
+        if not query.strip():
+            return result
+
+        rows = self.repo.search_rules(
+            query, project_id=project_id, run_id=run_id, file_prefix=file_prefix,
+            limit=page_size + 1, offset=(page - 1) * page_size
+        )
+        result.has_more = len(rows) > page_size
+        result.hits = [
+            RuleSearchHit(
+                rule_id=str(r.rule_id), run_id=str(r.run_id), project_id=r.project_id, file_path=r.file_path,
+                title=r.title or "", snippet=r.snippet or "", rank=float(r.rank)
+            )
+            for r in rows[:page_size]
+        ]
+        return result
@@ -0,0 +1,173 @@
+# src/rule_sink.py
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+from loguru import logger
+
+
+@dataclass
+class PendingFile:
+    """One analyzed file waiting to be persisted: its rules plus what marks it DONE."""
+    run_id: str
+    file_path: str
+    rules: list
+    project_id: Optional[str] = None
+    fingerprint: Optional[dict] = None
+    done: Optional[asyncio.Future] = field(default=None, repr=False)  # -> True once durably written
+
+    @property
+    def rows(self) -> int:
+        return max(len(self.rules), 1)  # A file without rules still costs a checkpoint row
+
+
+@dataclass
+class RuleSinkStats:
+    files: int = 0
+    rules: int = 0
+    flushes: int = 0
+    failed_files: int = 0
+    flush_seconds: float = 0.0
+    backpressure_waits: int = 0
+
+
+class RuleSink:
+    """
+    Write-behind buffer for Phase 3 results.
+
+    Files from all workers are collected and written in batches (one bulk
+    load + one transaction per batch) when `flush_rows` rows are buffered or
+    every `flush_interval` seconds. Submitters get a future that resolves once
+    their file is durably written, so callers keep "DONE only after the rules
+    are stored". When `max_pending_rows` rows are buffered or being written,
+    submit() waits: a slow database slows the producers down instead of
+    growing memory.
+
+    `write_batch(files)` does the actual writes and raises on failure; a failed
+    batch is retried file by file so one bad row only fails its own file, which
+    is then passed to `on_failed`.
+    """
+
+    def __init__(self, write_batch: Callable[[List[PendingFile]], Awaitable[None]],
+                 on_failed: Optional[Callable[[PendingFile], Awaitable[None]]] = None,
+                 flush_rows: int = 5000, flush_interval: float = 2.0, max_pending_rows: int = 50_000):
+        self.write_batch = write_batch
+        self.on_failed = on_failed
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_pending_rows = max(max_pending_rows, flush_rows)
+        self.stats = RuleSinkStats()
+
+        self._buffer: List[PendingFile] = []
+        self._buffered_rows = 0
+        self._writing_rows = 0
+        self._space: Optional[asyncio.Condition] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes: set = set()
+
+    async def submit(self, item: PendingFile) -> asyncio.Future:
+        """Buffers a file (waiting while the sink is full) and returns its completion future."""
+        self._start()
+        async with self._space:
+            if not self._has_room(item):
+                self.stats.backpressure_waits += 1
+                await self._space.wait_for(lambda: self._has_room(item))
+
+        item.done = asyncio.get_running_loop().create_future()
+        self._buffer.append(item)
+        self._buffered_rows += item.rows
+        if self._buffered_rows >= self.flush_rows:
+            self._flush_soon()
+        return item.done
+
+    def _has_room(self, item: PendingFile) -> bool:
+        pending = self._buffered_rows + self._writing_rows
+        # An oversized file is still admitted once the sink is empty
+        return pending + item.rows <= self.max_pending_rows or pending == 0
+
+    def _start(self):
+        if self._space is None:
+            self._space = asyncio.Condition()
+            self._flush_lock = asyncio.Lock()
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.ensure_future(self._tick())
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffer:
+                # Own task: cancelling the timer on close() must not interrupt a write
+                self._flush_soon()
+
+    def _flush_soon(self):
+        task = asyncio.ensure_future(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        """Writes everything buffered so far (batches are written one at a time, in order)."""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            batch, self._buffer = self._buffer, []
+            rows, self._buffered_rows = self._buffered_rows, 0
+            if not batch:
+                return
+            self._writing_rows += rows
+            start = time.perf_counter()
+            try:
+                await self._write(batch)
+            finally:
+                self._writing_rows -= rows
+                self.stats.flushes += 1
+                self.stats.flush_seconds += time.perf_counter() - start
+                async with self._space:
+                    self._space.notify_all()
+
+    async def _write(self, batch: List[PendingFile]):
+        try:
+            await self.write_batch(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                await self._fail(batch[0], e)
+                return
+            logger.warning(f"Rule batch of {len(batch)} files failed ({e}); retrying file by file")
+            for item in batch:
+                await self._write([item])
+            return
+        for item in batch:
+            self.stats.files += 1
+            self.stats.rules += len(item.rules)
+            if not item.done.done():
+                item.done.set_result(True)
+
+    async def _fail(self, item: PendingFile, error: Exception):
+        logger.error(f"Failed to save rules for {item.file_path}: {error}")
+        self.stats.failed_files += 1
+        try:
+            if self.on_failed:
+                await self.on_failed(item)
+        except Exception as e:
+            logger.warning(f"Could not record failure of {item.file_path}: {e}")
+        finally:
+            if not item.done.done():
+                item.done.set_result(False)
+
+    async def close(self):
+        """Stops the interval timer and writes whatever is still buffered."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+
+    def log_stats(self):
+        s = self.stats
+        if not s.flushes:
+            return
+        logger.info(
+            f"Rule sink: {s.rules} rules for {s.files} files in {s.flushes} batches "
+            f"({s.flush_seconds:.1f}s writing, {s.backpressure_waits} backpressure waits, {s.failed_files} failed files)"
+        )
@@ -0,0 +1,81 @@
+# src/source_buffer.py
+import mmap
+import numpy as np
+
+
+class SourceBuffer:
+    """
+    Read-only view of a source file's bytes, backed by mmap when opened from disk.
+
+    - No full `str` copy is made unless text() is asked for the whole file.
+    - Line starts are indexed once (vectorised newline scan), so mapping a byte
+      offset to a line number is a binary search instead of counting '\\n's.
+    - slice() returns a zero-copy memoryview.
+    """
+
+    def __init__(self, data, _file=None, _mmap=None):
+        self.data = data  # bytes or mmap: anything supporting the buffer protocol
+        self._file = _file
+        self._mmap = _mmap
+        self._line_starts = None
+
+    @classmethod
+    def open(cls, file_path: str) -> "SourceBuffer":
+        f = open(file_path, "rb")
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            f.close()
+            return cls(b"")
+        except BaseException:
+            f.close()
+            raise
+        return cls(mm, _file=f, _mmap=mm)
+
+    @classmethod
+    def from_text(cls, text: str) -> "SourceBuffer":
+        return cls(text.encode("utf8"))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def line_starts(self) -> np.ndarray:
+        """Byte offset at which each line starts (line 1 starts at 0), as an int64 array."""
+        if self._line_starts is None:
+            starts = np.zeros(1, dtype=np.int64)
+            if len(self.data):
+                newlines = np.flatnonzero(np.frombuffer(self.data, dtype=np.uint8) == 0x0A)
+                starts = np.concatenate((starts, newlines.astype(np.int64) + 1))
+            self._line_starts = starts
+        return self._line_starts
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_starts)
+
+    def line_of(self, byte_offset: int) -> int:
+        """1-based line number containing byte_offset (O(log n))."""
+        return int(np.searchsorted(self.line_starts, byte_offset, side="right"))
+
+    def slice(self, start: int, end: int) -> memoryview:
+        return memoryview(self.data)[start:end]
+
+    def text(self, start: int = 0, end: int | None = None) -> str:
+        end = len(self.data) if end is None else end
+        return str(self.slice(start, end), "utf8", errors="ignore")
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,9 +1,13 @@
 import re
 import ast
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass, field
-from typing import List, Set, Optional
+from typing import AsyncIterator, List, Set, Optional, Tuple
 from loguru import logger
 from src.repo_manager import RepoManager
+from src.parse_artifacts import ParseArtifactStore
 
 @dataclass
 class FileMetadata:
@@ -13,22 +17,47 @@ class FileMetadata:
     imports: Set[str] = field(default_factory=set)
     definitions: List[str] = field(default_factory=list)
     summary_content: str = ""
+    content_hash: str = ""  # Key of the shared parse artifact (empty if none was built)
+
+# 1. Regex for Imports
+# Matches: import X; import X.*; from X import Y; using X; import "x"; from "x"; require("x")
+# (Java `package X;` is a declaration, not a dependency, so it is not collected.)
+IMPORT_PATTERNS = [
+    re.compile(r'^\s*import\s+(?:static\s+)?([\w\.]+?)(?:\.\*)?\s*;'),     # Java
+    re.compile(r'^\s*import\s+([\w\.]+)\s*(?:$|as\s|,)'),                 # Python
+    re.compile(r'^\s*import\s+["\']([^"\']+)["\']'),                       # JS side-effect / Go
+    re.compile(r'^\s*from\s+(\.*[\w\.]*)\s+import'),                        # Python
+    re.compile(r'^\s*using\s+([\w\.]+);'),                                # C#
+    re.compile(r'\bfrom\s+["\']([^"\']+)["\']'),                           # JS/TS ES modules
+    re.compile(r'\brequire\(\s*["\']([^"\']+)["\']\s*\)'),                 # CommonJS
+]
 
 class StaticAnalyzer:
-    def __init__(self, repo_manager: RepoManager):
+    def __init__(self, repo_manager: RepoManager, artifacts: Optional[ParseArtifactStore] = None):
         self.repo_manager = repo_manager
+        self.artifacts = artifacts
 
     def scan_file(self, file_path: str, language: str) -> FileMetadata:
         """
         Main entry point. Reads file and delegates to language-specific parsers.
+        With an artifact store, the file is read and tree-sitter-parsed once and
+        the chunk plan is kept for Phase 3.
         """
         meta = FileMetadata(file_path=file_path, language=language)
         
         try:
-            code = self.repo_manager.read_file(file_path)
+            if self.artifacts:
+                artifact = self.artifacts.build(file_path, language)
+                meta.content_hash = artifact.content_hash
+                code = artifact.source
+            else:
+                artifact = None
+                code = self.repo_manager.read_file(file_path)
             
             # 1. Extract Imports & Definitions
-            if language == "python":
+            if artifact and artifact.parsed:
+                self._analyze_outline(artifact.definitions, artifact.imports, meta)
+            elif language == "python":
                 self._analyze_python(code, meta)
             else:
                 self._analyze_generic(code, meta)
@@ -43,6 +72,57 @@ class StaticAnalyzer:
             
         return meta
 
+    async def scan_files_parallel(self, items: List[Tuple[str, str]], workers: int, batch_size: int) -> AsyncIterator[FileMetadata]:
+        """
+        Scans (file_path, language) pairs on a process pool, yielding results
+        batch by batch as they complete. A batch the pool cannot scan is
+        re-scanned in-process so every file still produces exactly one FileMetadata.
+        """
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+        with self.worker_pool(workers) as pool:
+            async def run_batch(batch):
+                metas = await pool.scan(batch)
+                return metas if metas is not None else await self._scan_in_process(batch)
+
+            for next_done in asyncio.as_completed([run_batch(b) for b in batches]):
+                for meta in await next_done:
+                    yield meta
+
+    def worker_pool(self, workers: int) -> "ScanWorkerPool":
+        """Process pool whose workers each build their own analyzer over the same artifact dir."""
+        return ScanWorkerPool(workers, self.artifacts.cache_dir if self.artifacts else None)
+
+    async def scan_file_async(self, file_path: str, language: str, pool: Optional["ScanWorkerPool"] = None) -> FileMetadata:
+        """
+        Scans one file without blocking the event loop: on `pool` when given
+        (falling back to in-process if the pool cannot scan it), else on a thread.
+        """
+        batch = [(file_path, language)]
+        metas = await pool.scan(batch) if pool is not None else None
+        if metas is None:
+            metas = await self._scan_in_process(batch)
+        return metas[0]
+
+    async def _scan_in_process(self, batch: List[Tuple[str, str]]) -> List[FileMetadata]:
+        # Parsing is CPU-bound; a thread keeps it off the event loop
+        return await asyncio.to_thread(lambda: [_compact(self.scan_file(f, lang)) for f, lang in batch])
+
+    def _analyze_outline(self, definitions: List[str], import_statements: List[str], meta: FileMetadata):
+        """Builds metadata from the shared tree-sitter outline (no second parse)."""
+        meta.definitions.extend(definitions)
+        for statement in import_statements:
+            for line in statement.splitlines():
+                # Python `import a, b as c`: one module per comma-separated name
+                simple = re.match(r'^\s*import\s+([\w\.]+(?:\s+as\s+\w+)?(?:\s*,\s*[\w\.]+(?:\s+as\s+\w+)?)+)\s*$', line)
+                if simple and meta.language == "python":
+                    meta.imports.update(part.split()[0] for part in simple.group(1).split(","))
+                    continue
+                for pattern in IMPORT_PATTERNS:
+                    match = pattern.search(line)
+                    if match:
+                        meta.imports.add(match.group(1))
+
     def _analyze_python(self, code: str, meta: FileMetadata):
         """Uses Python's built-in AST for perfect accuracy."""
         try:
@@ -54,8 +134,9 @@ class StaticAnalyzer:
                     for alias in node.names:
                         meta.imports.add(alias.name)
                 elif isinstance(node, ast.ImportFrom):
-                    if node.module:
-                        meta.imports.add(node.module)
+                    # Keep relative imports relative ("..utils") so the module index can resolve them
+                    if node.module or node.level:
+                        meta.imports.add("." * node.level + (node.module or ""))
 
                 # B. Extract Definitions (Classes & Functions)
                 if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
@@ -83,19 +164,10 @@ class StaticAnalyzer:
         Regex-based fallback for JS, Java, C#, etc.
         Not perfect, but sufficient for a 'Global Context' graph.
         """
-        # 1. Regex for Imports
-        # Matches: import X; from X import Y; using X; package X;
-        import_patterns = [
-            r'^\s*import\s+["\']?([\w\-\./]+)["\']?',          # JS/Python/Go
-            r'^\s*from\s+([\w\.]+)\s+import',                   # Python
-            r'^\s*using\s+([\w\.]+);',                          # C#
-            r'^\s*package\s+([\w\.]+);',                        # Java
-        ]
-        
         for line in code.splitlines():
             # Check Imports
-            for pattern in import_patterns:
-                match = re.search(pattern, line)
+            for pattern in IMPORT_PATTERNS:
+                match = pattern.search(line)
                 if match:
                     meta.imports.add(match.group(1))
             
@@ -117,4 +189,86 @@ class StaticAnalyzer:
             if len(meta.definitions) > 20:
                 lines.append("  - ... (more)")
                 
-        return "\n".join(lines)
\ No newline at end of file
+        return "\n".join(lines)
+
+
+# --- Process pool workers (module level so they can be pickled) ---
+
+_worker_analyzer: Optional[StaticAnalyzer] = None
+
+def _init_worker(artifact_dir=None):
+    global _worker_analyzer
+    repo_manager = RepoManager()
+    artifacts = ParseArtifactStore(artifact_dir, repo_manager) if artifact_dir else None
+    _worker_analyzer = StaticAnalyzer(repo_manager, artifacts)
+
+def _compact(meta: FileMetadata) -> FileMetadata:
+    # Definitions are already rendered into summary_content; don't ship them back
+    meta.definitions = []
+    return meta
+
+def _scan_batch(batch: List[Tuple[str, str]]) -> List[FileMetadata]:
+    return [_compact(_worker_analyzer.scan_file(f, lang)) for f, lang in batch]
+
+
+class ScanWorkerPool:
+    """
+    ProcessPoolExecutor for scan batches that survives dying workers.
+
+    A crashed worker breaks the whole executor: every batch in flight fails
+    with BrokenProcessPool. In-flight batches are capped at twice the worker
+    count so one crash only takes those down. The first batch to see the
+    break replaces the executor (at most `max_restarts` times) and each
+    failed batch is retried once on the new one. Once restarts run out the
+    pool stops taking work and scan() returns None, so callers scan in-process.
+    """
+
+    def __init__(self, workers: int, artifact_dir=None, max_restarts: int = 2):
+        self.workers = workers
+        self.artifact_dir = artifact_dir
+        self.restarts_left = max_restarts
+        self._in_flight = asyncio.Semaphore(2 * workers)
+        self._executor: Optional[ProcessPoolExecutor] = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.artifact_dir,))
+
+    async def scan(self, batch: List[Tuple[str, str]]) -> Optional[List[FileMetadata]]:
+        """The batch's FileMetadata, or None when it has to be scanned in-process."""
+        for _ in range(2):
+            async with self._in_flight:
+                executor = self._executor  # Read after the wait: it may have been replaced meanwhile
+                if executor is None:
+                    return None
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(executor, _scan_batch, batch)
+                except BrokenProcessPool:
+                    self._replace(executor)  # Before releasing the slot, so no waiter picks up the dead one
+                except Exception as e:
+                    logger.warning(f"Index worker failed on a batch of {len(batch)} files ({e}); scanning in-process")
+                    return None
+        logger.warning(f"Index workers died twice on a batch of {len(batch)} files; scanning in-process")
+        return None
+
+    def _replace(self, broken: ProcessPoolExecutor):
+        if self._executor is not broken:
+            return  # Another batch already replaced it
+        broken.shutdown(wait=False, cancel_futures=True)
+        if self.restarts_left > 0:
+            self.restarts_left -= 1
+            logger.warning("Index worker died; restarting the process pool")
+            self._executor = self._new_executor()
+        else:
+            logger.warning("Index workers keep dying; scanning the remaining files in-process")
+            self._executor = None
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
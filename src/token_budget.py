@@ -0,0 +1,160 @@
+# src/token_budget.py
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Sequence
+from loguru import logger
+
+from src.config import settings
+
+# Runs a subword tokenizer treats alike: words, single digits, whitespace, punctuation
+_PIECES = re.compile(r"[A-Za-z]+|\d|\s+|[^\sA-Za-z\d]")
+_WORD_CHARS_PER_TOKEN = 6  # Long identifiers split into several subwords
+_AVG_CHARS_PER_TOKEN = 4.0  # Only for sizes known as a character count (SQL aggregates)
+_TRIMMED = "[... trimmed to fit the prompt budget]"
+_CACHE_MAX_CHARS = 32_768  # Larger texts (report dumps) are counted but not kept alive by the cache
+
+
+def _raw_count(text: str) -> int:
+    """Uncalibrated token count."""
+    return _cached_count(text) if len(text) <= _CACHE_MAX_CHARS else _count_pieces(text)
+
+
+@lru_cache(maxsize=16_384)
+def _cached_count(text: str) -> int:
+    # The same chunks, headers and summaries are measured repeatedly (packing, budgets, rate limiter)
+    return _count_pieces(text)
+
+
+def _count_pieces(text: str) -> int:
+    count = 0
+    for piece in _PIECES.findall(text):
+        first = piece[0]
+        if first.isalpha():
+            count += 1 + (len(piece) - 1) // _WORD_CHARS_PER_TOKEN
+        elif first.isspace():
+            # A single space merges into the next word; newlines/indentation cost one token
+            count += 0 if piece == " " else 1
+        else:
+            count += 1
+    return count
+
+
+class TokenEstimator:
+    """
+    Local token estimator: counts word/digit/punctuation/whitespace pieces and
+    multiplies by a calibration scale.
+
+    The scale starts at settings.token_estimate_scale and follows the prompt
+    token counts the provider reports (see observe()), so estimates converge
+    on the real tokenizer without a network round trip per count.
+    """
+
+    def __init__(self, scale: float = 1.0, smoothing: float = 0.1):
+        self.scale = scale
+        self.smoothing = smoothing
+        self.observations = 0
+
+    def count(self, text: str | None) -> int:
+        if not text:
+            return 0
+        return math.ceil(_raw_count(text) * self.scale)
+
+    def count_all(self, texts: Sequence[str | None]) -> int:
+        return sum(self.count(t) for t in texts)
+
+    def from_chars(self, chars: int) -> int:
+        """Estimate for text known only by its length."""
+        return math.ceil(chars / _AVG_CHARS_PER_TOKEN * self.scale)
+
+    def observe(self, texts: Sequence[str | None], actual_tokens: int):
+        """Calibrates against the provider's count for a prompt made of `texts`."""
+        raw = sum(_raw_count(t) for t in texts if t)
+        if raw < 50 or not actual_tokens:
+            return  # Too small to say anything about the ratio
+        ratio = min(max(actual_tokens / raw, 0.5), 2.0)
+        # First observation replaces the default; later ones are smoothed
+        alpha = 1.0 if self.observations == 0 else self.smoothing
+        self.scale += alpha * (ratio - self.scale)
+        self.observations += 1
+        if self.observations in (1, 10, 100):
+            logger.debug(f"Token estimator calibrated to scale {self.scale:.3f} after {self.observations} prompts")
+
+
+@dataclass
+class PromptPart:
+    """One variable section of a prompt. Lower priority is trimmed first."""
+    name: str
+    text: str
+    priority: int
+    separator: str = "\n"  # Trimming granularity: whole lines, or "\n\n" for whole paragraphs
+
+
+class PromptBudget:
+    """
+    Fits prompt parts into a token budget.
+
+    Parts are trimmed lowest priority first (ties: the later part first), keeping
+    their leading units, since builders put the most relevant material at the
+    top (imports, direct dependencies). A single unit too large to keep whole is
+    cut by characters.
+    """
+
+    def __init__(self, budget: int, estimator: "TokenEstimator | None" = None):
+        self.budget = budget
+        self.estimator = estimator or token_estimator
+
+    def fit(self, parts: List[PromptPart], reserved: int = 0) -> List[str]:
+        """Returns the (possibly trimmed) text of each part, in input order. `reserved` covers the fixed prompt."""
+        texts = [p.text for p in parts]
+        if not self.budget:
+            return texts
+
+        costs = [self.estimator.count(t) for t in texts]
+        excess = reserved + sum(costs) - self.budget
+        if excess <= 0:
+            return texts
+
+        order = sorted(range(len(parts)), key=lambda i: (parts[i].priority, -i))
+        for i in order:
+            if excess <= 0:
+                break
+            if not texts[i]:
+                continue
+            keep = costs[i] - excess
+            texts[i] = self._trim(texts[i], parts[i].separator, keep) if keep > 0 else ""
+            new_cost = self.estimator.count(texts[i])
+            excess -= costs[i] - new_cost
+            logger.debug(f"Prompt budget: trimmed {parts[i].name} from {costs[i]:,} to {new_cost:,} tokens")
+
+        if excess > 0:
+            logger.warning(f"Prompt still {excess:,} tokens over its {self.budget:,} budget after trimming")
+        return texts
+
+    def _trim(self, text: str, separator: str, max_tokens: int) -> str:
+        limit = max_tokens - self.estimator.count(_TRIMMED) - 1
+        units = text.split(separator)
+        kept, used = [], 0
+        for unit in units:
+            cost = self.estimator.count(unit) + 1
+            if used + cost > limit:
+                break
+            kept.append(unit)
+            used += cost
+        if not kept:
+            # A single oversized unit (e.g. one huge line): cut it proportionally by characters
+            first = units[0]
+            chars = int(len(first) * limit / max(self.estimator.count(first), 1))
+            if chars <= 0:
+                return ""
+            kept = [first[:chars]]
+        return separator.join(kept) + separator + _TRIMMED
+
+
+# Shared by every prompt builder in the process; calibrated by the LLM client
+token_estimator = TokenEstimator(settings.token_estimate_scale)
+
+# Never calibrated: chunk boundaries and packs must not drift between runs,
+# or chunk plans and cached LLM responses would stop matching
+plan_estimator = TokenEstimator(settings.token_estimate_scale)
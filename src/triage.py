@@ -0,0 +1,115 @@
+# src/triage.py
+import re
+from dataclasses import dataclass
+from typing import Callable
+from loguru import logger
+
+# Control flow, across the tree-sitter grammars in UniversalChunker.LANGUAGE_CONFIG
+_BRANCH_NODES = {
+    "if_statement", "elif_clause", "conditional_expression", "ternary_expression",
+    "switch_statement", "switch_expression", "switch_block_statement_group", "switch_section", "switch_case",
+    "expression_switch_statement", "type_switch_statement", "expression_case", "type_case", "case_clause",
+    "match_statement", "for_statement", "for_in_statement", "enhanced_for_statement", "foreach_statement",
+    "while_statement", "do_statement", "catch_clause", "except_clause", "select_statement",
+}
+_THROW_NODES = {"throw_statement", "throw_expression", "raise_statement", "assert_statement"}
+_CALL_NODES = {"call", "call_expression", "method_invocation", "invocation_expression"}
+# Operators only count inside these (so Java generics' `<`/`>` or `for x in` do not)
+_OPERATOR_PARENTS = {
+    "binary_expression", "binary_operator", "comparison_operator", "boolean_operator",
+    "augmented_assignment", "augmented_assignment_expression", "assignment_expression", "assignment_statement",
+}
+_ARITHMETIC = {"+", "-", "*", "/", "%", "**", "//", "+=", "-=", "*=", "/=", "%="}
+_COMPARISON = {"==", "!=", "<", ">", "<=", ">=", "===", "!==", "is", "in"}
+_BOOLEAN = {"&&", "||", "and", "or", "??"}
+
+# Persistence and validation calls: save(), repo.persist(), validateOrder(), Objects.requireNonNull()...
+_API_CALL = re.compile(
+    r"^(save|persist|insert|update|delete|remove|merge|upsert|commit|rollback|execute|exec|store"
+    r"|validate|verify|check|assert|require|ensure|is_?valid)",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class TriageSignals:
+    """Business-logic signals counted in one chunk's AST."""
+    branches: int = 0
+    comparisons: int = 0
+    arithmetic: int = 0
+    throws: int = 0
+    api_calls: int = 0
+
+    @property
+    def score(self) -> int:
+        # Decisions, raised errors and persistence/validation calls weigh more than a lone operator
+        return 2 * (self.branches + self.throws + self.api_calls) + self.comparisons + self.arithmetic
+
+
+def score_node(node, text_of: Callable[[int, int], str]) -> TriageSignals:
+    """Counts signals in the subtree of a tree-sitter node; text_of(start_byte, end_byte) decodes source."""
+    signals = TriageSignals()
+    stack = [(node, None)]
+    while stack:
+        current, parent = stack.pop()
+        kind = current.type
+        if kind in _BRANCH_NODES:
+            signals.branches += 1
+        elif kind in _THROW_NODES:
+            signals.throws += 1
+        elif kind in _CALL_NODES:
+            if _API_CALL.match(_callee(current, text_of)):
+                signals.api_calls += 1
+        elif not current.is_named and parent is not None and parent.type in _OPERATOR_PARENTS:
+            if kind in _BOOLEAN:
+                signals.branches += 1
+            elif kind in _COMPARISON:
+                signals.comparisons += 1
+            elif kind in _ARITHMETIC and not _is_string_concat(parent):
+                signals.arithmetic += 1
+        stack.extend((child, current) for child in current.children)
+    return signals
+
+
+def _callee(call, text_of) -> str:
+    """Last segment of the called name: `self.repo.save(x)` -> `save`."""
+    target = call.child_by_field_name("name") or call.child_by_field_name("function")
+    if target is None:
+        return ""
+    # Long receivers (chained builders, lambdas) only need their tail
+    text = text_of(max(target.start_byte, target.end_byte - 200), target.end_byte)
+    return text.rsplit(".", 1)[-1].strip()
+
+
+def _is_string_concat(expression) -> bool:
+    # "Order(" + id + ")" in toString/__repr__ is formatting, not arithmetic
+    return any("string" in child.type for child in expression.children)
+
+
+def is_trivial(chunk, threshold: int) -> bool:
+    """Scored below the threshold. Unscored chunks (fallback slices, old plans) are never trivial."""
+    score = getattr(chunk, "triage_score", None)
+    return score is not None and score < threshold
+
+
+@dataclass
+class TriageStats:
+    chunks: int = 0
+    trivial: int = 0
+    skipped: int = 0  # "skip": never sent to the LLM
+    batched: int = 0  # "batch": trivial chunks too large for normal packing, packed anyway
+    calls_planned: int = 0
+    calls_without_triage: int = 0
+
+    @property
+    def calls_saved(self) -> int:
+        return self.calls_without_triage - self.calls_planned
+
+    def log(self, label: str):
+        if not self.chunks:
+            return
+        logger.info(
+            f"Triage [{label}]: {self.trivial}/{self.chunks} chunks trivial "
+            f"({self.skipped} skipped, {self.batched} batched); "
+            f"{self.calls_planned} LLM calls instead of {self.calls_without_triage} ({self.calls_saved} saved)"
+        )
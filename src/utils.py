@@ -5,6 +5,21 @@ import random
 
 import re
 
+def is_rate_limit_error(exc: Exception) -> bool:
+    """429 / quota / RESOURCE_EXHAUSTED, whichever client raised it."""
+    error_msg = str(exc).lower()
+    return "429" in error_msg or "quota" in error_msg or "exhausted" in error_msg
+
+def requested_retry_delay(exc: Exception) -> float | None:
+    """Seconds from a 'Please retry in 41.246s' message, if the API sent one."""
+    match = re.search(r"retry in\s+([\d\.]+)\s*s", str(exc).lower())
+    if match:
+        try:
+            return float(match.group(1))
+        except ValueError:
+            pass
+    return None
+
 def retry_async(max_retries: int = 5, base_delay: float = 2.0, max_delay: float = 120.0):
     """
     Robust retry decorator with exponential backoff and smart rate limit handling.
@@ -25,20 +40,15 @@ def retry_async(max_retries: int = 5, base_delay: float = 2.0, max_delay: float
                     if attempt == max_retries:
                         break
                     
-                    error_msg = str(e).lower()
-                    
                     # 1. Check for Rate Limit (429 / Resource Exhausted)
-                    if "429" in error_msg or "quota" in error_msg or "exhausted" in error_msg:
+                    if is_rate_limit_error(e):
                         wait_time = 30.0 # Default fallback
                         
                         # Try to parse exact wait time: "Please retry in 41.246s"
-                        match = re.search(r"retry in\s+([\d\.]+)\s*s", error_msg)
-                        if match:
-                            try:
-                                wait_time = float(match.group(1)) + 5.0 # Add 5s buffer
-                                logger.warning(f"Rate Limit: API requested wait of {match.group(1)}s. Sleeping {wait_time:.1f}s...")
-                            except ValueError:
-                                pass
+                        requested = requested_retry_delay(e)
+                        if requested is not None:
+                            wait_time = requested + 5.0 # Add 5s buffer
+                            logger.warning(f"Rate Limit: API requested wait of {requested}s. Sleeping {wait_time:.1f}s...")
                         else:
                             # Fallback jitter
                             wait_time = wait_time + random.uniform(5, 15)